@@ -24,6 +24,8 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 #
+import struct
+
 ###################################################################################
 
 
@@ -107,6 +109,28 @@ class Erase:
 ###################################################################################
 
 
+class Overflow:
+    """
+        Packet buffer overflow policy
+    """
+    DropOldest = 0x00   # Keep the most recent packets
+    DropNewest = 0x01   # Keep the oldest packets
+    Block = 0x02        # Direct reads wait for the consumer, the receive thread drops the newest
+
+###################################################################################
+
+
+class CommandStatus:
+    """
+        Outcome of a command, see NebCommandResult
+    """
+    Success = 0x00          # Acknowledged (and answered, when a response was expected)
+    ErrorResponse = 0x01    # The device answered with an error packet
+    Timeout = 0x02          # No acknowledge or response within the retry policy
+
+###################################################################################
+
+
 class Commands:
     """
         Neblina commands for various subsystem
@@ -297,3 +321,30 @@ class Formatting:
         SetLED = "<B {0}s {1}s"  # Number of LEDs, LED Index x LEDs, LED Value x LEDs
         EEPROM = "<H 8s 6s"  # Page number, 8 bytes R/W Data
         SetDataPortState = "<B B"  # Port ID, Open/Close
+
+    class Struct:
+        """
+            Precompiled struct.Struct of every fixed layout above, filled in by compileFormatting.
+            e.g. Formatting.Struct.Data.IMU.unpack_from(packetString, 4)
+        """
+
+        class Data:
+            pass
+
+        class CommandData:
+            pass
+
+###################################################################################
+
+
+def compileFormatting(layouts, structs):
+    """
+        Precompile the layouts (a class of format strings) into structs.
+        Layouts containing a {} placeholder (LED commands) are built at runtime.
+    """
+    for name, layout in vars(layouts).items():
+        if not name.startswith('__') and '{' not in layout:
+            setattr(structs, name, struct.Struct(layout))
+
+compileFormatting(Formatting.Data, Formatting.Struct.Data)
+compileFormatting(Formatting.CommandData, Formatting.Struct.CommandData)
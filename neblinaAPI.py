@@ -28,9 +28,10 @@
 import logging
 
 from neblina import *
-from neblinaCore import NeblinaCore
+from neblinaCore import NeblinaCore, printPacketCount
 from neblinaData import *
 from neblinaError import *
+from neblinaState import NebDeviceState, getLEDKey
 from neblinaUtilities import NebUtilities
 
 ###################################################################################
@@ -50,12 +51,15 @@ class NeblinaAPI(object):
             :param interface: Neblina communication interface. See Neblina.Interface.
         """
         self.core = NeblinaCore(interface)
+        # Last acknowledged configuration, to skip the commands re-applying it
+        self.state = NebDeviceState()
 
     def close(self):
         """
             Close communication with Neblina.
         """
         self.core.close()
+        self.state.invalidate()
 
     def open(self, address):
         """
@@ -63,6 +67,7 @@ class NeblinaAPI(object):
 
             :param address: Neblina address to reach. It can be UART
         """
+        self.state.invalidate()
         self.core.open(address)
 
     def isOpened(self):
@@ -73,6 +78,147 @@ class NeblinaAPI(object):
         """
         return self.core.isOpened()
 
+    def setDelegate(self, delegate):
+        """
+            Set the delegate receiving the streaming data.
+
+            :param delegate: NeblinaDelegate instance.
+        """
+        self.core.setDelegate(delegate)
+
+    def startReceiving(self):
+        """
+            Start receiving in the background.
+            Streaming data is then pushed to the delegate handlers (handleIMU,
+            handleEulerAngle, ...) instead of being polled with getIMU & co.
+        """
+        self.core.startReceiving()
+
+    def stopReceiving(self):
+        """
+            Stop receiving in the background.
+        """
+        self.core.stopReceiving()
+
+    def sendCommands(self, packets, timeout=3):
+        """
+            Send several commands back-to-back, then wait for all their acknowledges.
+            Takes about one round-trip instead of one per command, e.g.
+
+                api.sendCommands([NebCommandPacket(SubSystem.Motion, Commands.Motion.Downsample, 40),
+                                  NebCommandPacket(SubSystem.Motion, Commands.Motion.IMU, True)])
+
+            :param packets: NebCommandPacket instances.
+            :param timeout: Maximum time to wait (in seconds) for all acknowledges.
+            :return: Acknowledge packets, in the order of packets. None for a missing acknowledge.
+        """
+        commands = [(packet.header.subSystem, packet.header.command) for packet in packets]
+        # Not tracked by the state shadow
+        for subSystem, command in commands:
+            self.state.invalidateCommand(subSystem, command)
+        self.core.sendCommands(packets)
+        return self.core.waitForAcks(commands, timeout)
+
+    def applySetting(self, subSystem, command, value, key=None, **kwargs):
+        """
+            Send a configuration command, unless the device is known to hold value
+            already (see state). The value is forgotten until the command is
+            acknowledged, so a failure never leaves a stale state behind.
+
+            :param value: Value of the setting, sent as the enable flag.
+            :param key: NebDeviceState key of the setting, (subSystem, command) if None.
+            :return: Acknowledge packet, None if the command was not sent.
+        """
+        if key is None:
+            key = (subSystem, command)
+        if self.state.isApplied(key, value):
+            self.state.elidedCount += 1
+            logging.debug('Subsystem {0} command {1} already applied, not sent.'.format(subSystem, command))
+            return None
+        self.state.invalidate(key)
+        packet = self.core.request(subSystem, command, value, **kwargs)
+        self.state.update(key, value)
+        return packet
+
+    def invalidateState(self):
+        """
+            Forget the device configuration, so that the next settings are all sent.
+            Needed when the device was reset or configured behind this API's back.
+        """
+        self.state.invalidate()
+
+    def setRetryPolicy(self, subSystem, command, policy):
+        """
+            Set how long to wait for a command, and how often to resend it, e.g.
+
+                api.setRetryPolicy(SubSystem.EEPROM, Commands.EEPROM.Read, RetryPolicy(timeout=1, retries=5))
+
+            The commands in NonIdempotentCommands are never resent, whatever their policy.
+
+            :param policy: RetryPolicy instance, None to restore the default one.
+        """
+        self.core.setRetryPolicy(subSystem, command, policy)
+
+    def setStreamBuffer(self, command, capacity, overflow=Overflow.DropOldest):
+        """
+            Bound the packets kept for a motion stream until retrieved (getIMU & co).
+
+            :param command: Commands.Motion streaming command, e.g. Commands.Motion.IMU.
+            :param capacity: Maximum number of packets kept.
+            :param overflow: Overflow.DropOldest, Overflow.DropNewest or Overflow.Block.
+                             Block only waits when the device is read directly by a waiter,
+                             the receive thread drops the newest rather than stall the other streams.
+            :return: NebPacketBuffer instance, with its overflowCount and highWaterMark.
+        """
+        return self.core.setPacketBuffer(SubSystem.Motion, command, capacity, overflow)
+
+    def getStreamBuffer(self, command):
+        """
+            Retrieve the buffer of a motion stream, for its statistics.
+
+            :param command: Commands.Motion streaming command, e.g. Commands.Motion.IMU.
+            :return: NebPacketBuffer instance, None if nothing was buffered yet.
+        """
+        return self.core.getPacketBuffer(SubSystem.Motion, command)
+
+    def getTelemetry(self):
+        """
+            Retrieve the link-quality and throughput counters: packets and bytes
+            received, CRC errors, invalid/unknown packets, SLIP errors, queue
+            depths, drops and acknowledge round-trip histogram. Cheap enough to
+            poll, the receive path is not blocked.
+
+                previous = api.getTelemetry()
+                ...
+                telemetry = api.getTelemetry()
+                packetRate, byteRate, streamRates = telemetry.rates(previous)
+
+            :return: NebTelemetrySnapshot instance.
+        """
+        return self.core.getTelemetry()
+
+    def resetTelemetry(self):
+        """
+            Reset the counters of getTelemetry.
+        """
+        self.core.telemetry.reset()
+
+    def getSampleLoss(self, command=None):
+        """
+            Retrieve the samples lost by the link, detected from the timestamp
+            cadence of the periodic streams (expected period from setDownsample,
+            estimated otherwise). The packets the host drops are not included,
+            see getTelemetry().droppedPacketCount.
+
+            :param command: Commands.Motion streaming command, None for all streams.
+            :return: Dictionary of sampleCount, missingCount, lossRatio, gapCount, gapDuration,
+                     longestGap (in microseconds), longestBurst, burstHistogram... By command if command is None.
+        """
+        sampleLoss = self.core.getSampleLoss()
+        if command is None:
+            return sampleLoss
+        return sampleLoss.get(command)
+
     def getBatteryLevel(self):
         """
             Retrieve battery level.
@@ -87,9 +233,7 @@ class NeblinaAPI(object):
 
             :return: Temperature (in Celsius)
         """
-        self.core.sendCommand(SubSystem.Power, Commands.Power.GetTemperature, True)
-        packet = self.core.waitForAck(SubSystem.Power, Commands.Power.GetTemperature)
-        packet = self.core.waitForPacket(PacketType.RegularResponse, SubSystem.Power, Commands.Power.GetTemperature)
+        packet = self.core.request(SubSystem.Power, Commands.Power.GetTemperature, response=True)
         return packet.data.temperature
 
     def setDataPortState(self, interface, state):
@@ -100,9 +244,8 @@ class NeblinaAPI(object):
             :param state: True, to open data port. False, to close data port.
         """
         assert(type(state) is bool)
-        self.core.sendCommand(SubSystem.Debug, Commands.Debug.InterfaceState, state, interface=interface)
         logging.debug('Waiting for the module to set data port state...')
-        packet = self.core.waitForAck(SubSystem.Debug, Commands.Debug.InterfaceState)
+        self.core.request(SubSystem.Debug, Commands.Debug.InterfaceState, state, interface=interface)
         logging.debug('Module has change its data port state')
 
     def setInterface(self, interface=Interface.BLE):
@@ -110,20 +253,11 @@ class NeblinaAPI(object):
             Set communication interface.
 
             :param interface: Neblina.Interface to used.
+            :raise CommandTimeoutError: The unit is not responding, even after the retries.
         """
-        self.core.sendCommand(SubSystem.Debug, Commands.Debug.SetInterface, interface)
         logging.debug('Waiting for the module to switch its interface...')
-        packet = self.core.waitForAck(SubSystem.Debug, Commands.Debug.SetInterface)
+        self.core.request(SubSystem.Debug, Commands.Debug.SetInterface, interface)
         logging.debug("Module has switched its interface.")
-        numTries = 0
-        while (packet == None):
-            numTries += 1
-            if numTries > 5:
-                logging.error('The unit is not responding. Exiting...')
-                exit()
-            logging.warning('Trying again...')
-            self.core.sendCommand(SubSystem.Debug, Commands.Debug.SetInterface, interface)
-            packet = self.core.waitForAck(SubSystem.Debug, Commands.Debug.SetInterface)
 
     def getMotionStatus(self):
         """
@@ -131,9 +265,8 @@ class NeblinaAPI(object):
 
             :return: MotionStatusData instance.
         """
-        self.core.sendCommand(SubSystem.Debug, Commands.Debug.MotAndFlashRecState)
-        self.core.waitForAck(SubSystem.Debug, Commands.Debug.MotAndFlashRecState)
-        packet = self.core.waitForPacket(PacketType.RegularResponse, SubSystem.Debug, Commands.Debug.MotAndFlashRecState)
+        packet = self.core.request(SubSystem.Debug, Commands.Debug.MotAndFlashRecState, response=True)
+        self.state.seedMotionStatus(packet.data.motionStatus)
         return packet.data.motionStatus
 
     def getRecorderStatus(self):
@@ -142,9 +275,8 @@ class NeblinaAPI(object):
 
             :return: RecorderStatusData instance.
         """
-        self.core.sendCommand(SubSystem.Debug, Commands.Debug.MotAndFlashRecState)
-        self.core.waitForAck(SubSystem.Debug, Commands.Debug.MotAndFlashRecState)
-        packet = self.core.waitForPacket(PacketType.RegularResponse, SubSystem.Debug, Commands.Debug.MotAndFlashRecState)
+        packet = self.core.request(SubSystem.Debug, Commands.Debug.MotAndFlashRecState, response=True)
+        self.state.seedMotionStatus(packet.data.motionStatus)
         return packet.data.recorderStatus
 
     def setDownsample(self, factor):
@@ -157,10 +289,10 @@ class NeblinaAPI(object):
         """
         # Limit to factor of 20 and between 20 and 1000.
         assert factor % 20 == 0 and 20 <= factor <= 1000
-        self.core.sendCommand(SubSystem.Motion, Commands.Motion.Downsample, factor)
         logging.debug('Sending downsample command. Waiting for acknowledge.')
-        self.core.waitForAck(SubSystem.Motion, Commands.Motion.Downsample)
-        logging.debug('Acknowledgment received.')
+        if self.applySetting(SubSystem.Motion, Commands.Motion.Downsample, factor):
+            logging.debug('Acknowledgment received.')
+            self.core.setStreamPeriod(factor * 1000)
 
     def setAccelerometerRange(self, factor):
         """
@@ -170,24 +302,38 @@ class NeblinaAPI(object):
         """
         # Limit factor to 2, 4, 8 and 16
         assert factor == 2 or factor == 4 or factor == 8 or factor == 16
-        self.core.sendCommand(SubSystem.Motion, Commands.Motion.AccRange, factor)
-        self.core.waitForAck(SubSystem.Motion, Commands.Motion.AccRange)
+        self.applySetting(SubSystem.Motion, Commands.Motion.AccRange, factor)
 
     def resetTimestamp(self):
         """
-            Reset timestamp
+            Reset timestamp. Also restarts the timestamp unwrapping and the clock
+            synchronization, with the device timestamp 0 at the middle of the
+            command round-trip.
+        """
+        clockSync = self.core.clockSync
+        sendTime = clockSync.clock()
+        self.core.request(SubSystem.Motion, Commands.Motion.ResetTimeStamp, True)
+        self.core.resetTimestamps((sendTime + clockSync.clock()) / 2)
+
+    def getHostTime(self, timestamp):
+        """
+            Estimate when a device timestamp happened on the host clock (time.monotonic),
+            to align the samples with other sensors. The estimate improves as
+            packets stream in, see NebClockSync.
+
+            :param timestamp: Device timestamp of a data object (in microseconds).
+            :return: Host time (in seconds), None if nothing was received yet.
         """
-        self.core.sendCommand(SubSystem.Motion, Commands.Motion.ResetTimeStamp, True)
-        self.core.waitForAck(SubSystem.Motion, Commands.Motion.ResetTimeStamp)
+        return self.core.clockSync.toHostTime(timestamp)
 
     def streamDisableAll(self):
         """
             Disable all streaming.
         """
-        self.core.sendCommand(SubSystem.Motion, Commands.Motion.DisableStreaming, True)
         logging.debug("Sending disable streaming command. Waiting for acknowledge.")
-        self.core.waitForAck(SubSystem.Motion, Commands.Motion.DisableStreaming)
+        self.core.request(SubSystem.Motion, Commands.Motion.DisableStreaming, True)
         logging.debug("Acknowledgment received.")
+        self.state.disableStreams()
 
     def getEulerAngle(self):
         """
@@ -328,21 +474,27 @@ class NeblinaAPI(object):
             :param state: True, to start recording. False, to stop recording.
         :return:
         """
-        self.core.sendCommand(SubSystem.Motion, Commands.Motion.TrajectoryRecStartStop, state)
         logging.debug("Sending recordTrajectory. Waiting for aknowledge.")
-        self.core.waitForAck(SubSystem.Motion, Commands.Motion.TrajectoryRecStartStop)
+        self.core.request(SubSystem.Motion, Commands.Motion.TrajectoryRecStartStop, state)
         logging.debug("Acknowledgment received.")
 
+    def setStreaming(self, command, state):
+        """
+            Start/Stop a motion stream. Not sent if the stream is known to be in that state already.
+
+            :param command: Commands.Motion streaming command, e.g. Commands.Motion.IMU.
+            :param state: True, to start streaming. False, to stop streaming.
+        """
+        self.applySetting(SubSystem.Motion, command, bool(state))
+
     def streamEulerAngle(self, state):
         """
             Start/Stop Euler Angle streaming.
 
             :param state: True, to start streaming. False, to stop streaming.
         """
-        self.core.sendCommand(SubSystem.Motion, Commands.Motion.EulerAngle, state)
         logging.debug("Sending streamEulerAngle. Waiting for acknowledge.")
-        self.core.waitForAck(SubSystem.Motion, Commands.Motion.EulerAngle)
-        logging.debug("Acknowledgment received.")
+        self.setStreaming(Commands.Motion.EulerAngle, state)
 
     def streamExternalForce(self, state):
         """
@@ -350,10 +502,8 @@ class NeblinaAPI(object):
 
             :param state: True, to start streaming. False, to stop streaming.
         """
-        self.core.sendCommand(SubSystem.Motion, Commands.Motion.ExtForce, state)
         logging.debug("Sending streamExternalForce. Waiting for acknowledge.")
-        self.core.waitForAck(SubSystem.Motion, Commands.Motion.ExtForce)
-        logging.debug("Acknowledgment received.")
+        self.setStreaming(Commands.Motion.ExtForce, state)
 
     def streamFingerGesture(self, state):
         """
@@ -361,10 +511,8 @@ class NeblinaAPI(object):
 
             :param state: True, to start streaming. False, to stop streaming.
         """
-        self.core.sendCommand(SubSystem.Motion, Commands.Motion.FingerGesture, state)
         logging.debug("Sending streamFingerGesture. Waiting for acknowledge.")
-        self.core.waitForAck(SubSystem.Motion, Commands.Motion.FingerGesture)
-        logging.debug("Acknowledgment received.")
+        self.setStreaming(Commands.Motion.FingerGesture, state)
 
     def streamIMU(self, state):
         """
@@ -372,10 +520,8 @@ class NeblinaAPI(object):
 
             :param state: True, to start streaming. False, to stop streaming.
         """
-        self.core.sendCommand(SubSystem.Motion, Commands.Motion.IMU, state)
         logging.debug("Sending streamIMU. Waiting for acknowledge.")
-        self.core.waitForAck(SubSystem.Motion, Commands.Motion.IMU)
-        logging.debug("Acknowledgment received.")
+        self.setStreaming(Commands.Motion.IMU, state)
 
     def streamMAG(self, state):
         """
@@ -383,10 +529,8 @@ class NeblinaAPI(object):
 
             :param state: True, to start streaming. False, to stop streaming.
         """
-        self.core.sendCommand(SubSystem.Motion, Commands.Motion.MAG, state)
         logging.debug("Sending streamMAG. Waiting for acknowledge.")
-        self.core.waitForAck(SubSystem.Motion, Commands.Motion.MAG)
-        logging.debug("Acknowledgment received.")
+        self.setStreaming(Commands.Motion.MAG, state)
 
     def streamMotionState(self, state):
         """
@@ -394,10 +538,8 @@ class NeblinaAPI(object):
 
             :param state: True, to start streaming. False, to stop streaming.
         """
-        self.core.sendCommand(SubSystem.Motion, Commands.Motion.MotionState, state)
         logging.debug("Sending streamMotionState. Waiting for acknowledge.")
-        self.core.waitForAck(SubSystem.Motion, Commands.Motion.MotionState)
-        logging.debug("Acknowledgment received.")
+        self.setStreaming(Commands.Motion.MotionState, state)
 
     def streamPedometer(self, state):
         """
@@ -405,10 +547,8 @@ class NeblinaAPI(object):
 
             :param state: True, to start streaming. False, to stop streaming.
         """
-        self.core.sendCommand(SubSystem.Motion, Commands.Motion.Pedometer, state)
         logging.debug("Sending streamPedometer. Waiting for acknowledge.")
-        self.core.waitForAck(SubSystem.Motion, Commands.Motion.Pedometer)
-        logging.debug("Acknowledgment received.")
+        self.setStreaming(Commands.Motion.Pedometer, state)
 
     def streamQuaternion(self, state):
         """
@@ -416,10 +556,8 @@ class NeblinaAPI(object):
 
             :param state: True, to start streaming. False, to stop streaming.
         """
-        self.core.sendCommand(SubSystem.Motion, Commands.Motion.Quaternion, state)
         logging.debug("Sending streamQuaternion. Waiting for acknowledge.")
-        self.core.waitForAck(SubSystem.Motion, Commands.Motion.Quaternion)
-        logging.debug("Acknowledgment received.")
+        self.setStreaming(Commands.Motion.Quaternion, state)
 
     def streamRotationInfo(self, state):
         """
@@ -427,10 +565,8 @@ class NeblinaAPI(object):
 
             :param state: True, to start streaming. False, to stop streaming.
         """
-        self.core.sendCommand(SubSystem.Motion, Commands.Motion.RotationInfo, state)
         logging.debug("Sending streamRotationInfo. Waiting for acknowledge.")
-        self.core.waitForAck(SubSystem.Motion, Commands.Motion.RotationInfo)
-        logging.debug("Acknowledgment received.")
+        self.setStreaming(Commands.Motion.RotationInfo, state)
 
     def streamSittingStanding(self, state):
         """
@@ -438,10 +574,8 @@ class NeblinaAPI(object):
 
             :param state: True, to start streaming. False, to stop streaming.
         """
-        self.core.sendCommand(SubSystem.Motion, Commands.Motion.SittingStanding, state)
         logging.debug("Sending streamSittingStanding. Waiting for acknowledge.")
-        self.core.waitForAck(SubSystem.Motion, Commands.Motion.SittingStanding)
-        logging.debug("Acknowledgment received.")
+        self.setStreaming(Commands.Motion.SittingStanding, state)
 
     def streamTrajectoryInfo(self, state):
         """
@@ -449,10 +583,8 @@ class NeblinaAPI(object):
 
             :param state: True, to start streaming. False, to stop streaming.
         """
-        self.core.sendCommand(SubSystem.Motion, Commands.Motion.TrajectoryInfo, state)
         logging.debug("Sending streamTrajectoryInfo. Waiting for acknowledge.")
-        self.core.waitForAck(SubSystem.Motion, Commands.Motion.TrajectoryInfo)
-        logging.debug("Acknowledgment received.")
+        self.setStreaming(Commands.Motion.TrajectoryInfo, state)
 
     def eepromRead(self, readPageNumber):
         """
@@ -462,11 +594,8 @@ class NeblinaAPI(object):
             :return: EEPROMReadData instance.
         """
         assert 0 <= readPageNumber <= 255
-        self.core.sendCommand(SubSystem.EEPROM, Commands.EEPROM.Read, pageNumber=readPageNumber)
-        logging.debug("Sending EEPROM Read command. Waiting for acknowledgment.")
-        packet = self.core.waitForAck(SubSystem.EEPROM, Commands.EEPROM.Read)
-        logging.debug("Acknowledge received.")
-        packet = self.core.waitForPacket(PacketType.RegularResponse, SubSystem.EEPROM, Commands.EEPROM.Read)
+        logging.debug("Sending EEPROM Read command. Waiting for the page.")
+        packet = self.core.request(SubSystem.EEPROM, Commands.EEPROM.Read, response=True, pageNumber=readPageNumber)
         logging.debug("EEPROM Read packet received.")
         return packet.data.dataBytes
 
@@ -478,9 +607,8 @@ class NeblinaAPI(object):
             :param dataString: 8-byte data string to write.
         """
         assert 0 <= writePageNumber <= 255
-        self.core.sendCommand(SubSystem.EEPROM, Commands.EEPROM.Write, \
-                         pageNumber=writePageNumber, dataBytes=dataString)
-        packet = self.core.waitForAck(SubSystem.EEPROM, Commands.EEPROM.Write)
+        self.core.request(SubSystem.EEPROM, Commands.EEPROM.Write, \
+                          pageNumber=writePageNumber, dataBytes=dataString)
 
     def getLED(self, index):
         """
@@ -490,10 +618,8 @@ class NeblinaAPI(object):
             :return: LEDGetValData instance.
         """
         assert 0 <= index <= 7
-        self.core.sendCommand(SubSystem.LED, Commands.LED.GetVal, ledIndices=[index])
-        packet = self.core.waitForPacket(PacketType.RegularResponse, SubSystem.LED, Commands.LED.GetVal)
-        if not packet:
-            return 0xF  # Return anything but 0x0 or 0x1
+        packet = self.core.request(SubSystem.LED, Commands.LED.GetVal, ack=False, response=True, ledIndices=[index])
+        self.state.seedLEDs(packet.data.ledState, [index])
         return packet.data.ledState[index]
 
     def setLED(self, ledIndex, ledValue):
@@ -505,9 +631,9 @@ class NeblinaAPI(object):
         """
         assert 0 <= ledIndex <= 7
         ledValues = [(ledIndex, ledValue)]
-        self.core.sendCommand(SubSystem.LED, Commands.LED.SetVal, ledValueTupleList=ledValues)
-        self.core.waitForAck(SubSystem.LED, Commands.LED.SetVal)
-        self.core.waitForPacket(PacketType.RegularResponse, SubSystem.LED, Commands.LED.GetVal)
+        if self.applySetting(SubSystem.LED, Commands.LED.SetVal, ledValue, getLEDKey(ledIndex),
+                             ledValueTupleList=ledValues):
+            self.core.waitForPacket(PacketType.RegularResponse, SubSystem.LED, Commands.LED.GetVal)
 
     def eraseStorage(self, eraseType=Erase.Quick):
         """
@@ -519,23 +645,18 @@ class NeblinaAPI(object):
         assert eraseType==Erase.Mass or eraseType==Erase.Quick
 
         # Step 1 - Initialization
-        self.core.sendCommand(SubSystem.Motion, Commands.Motion.DisableStreaming, True)
         logging.debug('Sending the DisableAllStreaming command, and waiting for a response...')
-
-        # Step 2 - wait for ack
-        self.core.waitForAck(SubSystem.Motion, Commands.Motion.DisableStreaming)
+        self.core.request(SubSystem.Motion, Commands.Motion.DisableStreaming, True)
         logging.debug('Acknowledge packet was received!')
+        self.state.disableStreams()
 
-        # Step 3 - erase the flash command
-        self.core.sendCommand(SubSystem.Storage, Commands.Storage.EraseAll, eraseType)
-        logging.debug('Sent the EraseAll command, and waiting for a response...')
-
-        # Step 4 - wait for ack
-        self.core.waitForAck(SubSystem.Storage, Commands.Storage.EraseAll)
+        # Step 2 - erase the flash command, never resent (see NonIdempotentCommands)
+        logging.debug('Sending the EraseAll command, and waiting for a response...')
+        self.core.request(SubSystem.Storage, Commands.Storage.EraseAll, eraseType)
         logging.debug("Acknowledge packet was received!")
         logging.info("Started erasing... This takes up to around 3 minutes...")
 
-        # Step 5 - wait for the completion notice
+        # Step 3 - wait for the completion notice
         self.core.waitForPacket(PacketType.RegularResponse, SubSystem.Storage, Commands.Storage.EraseAll, 300)
         logging.info('Flash erase has completed successfully!')
 
@@ -546,52 +667,75 @@ class NeblinaAPI(object):
             :param state: True, to start recording. False, to stop recording.
             :return: Recording session identifier.
         """
-        # Step 1 - Start recording
-        self.core.sendCommand(SubSystem.Storage, Commands.Storage.Record, state)
         if state:
             logging.debug('Sending the command to start the flash recorder, and waiting for a response...')
         else:
             logging.debug('Sending the command to stop the flash recorder, and waiting for a response...')
 
-        # Step 2 - wait for ack and the session number
-        self.core.waitForAck(SubSystem.Storage, Commands.Storage.Record)
-        logging.debug("Acknowledge received.")
-        packet = self.core.waitForPacket(PacketType.RegularResponse, SubSystem.Storage, Commands.Storage.Record)
-        if packet.header.packetType == PacketType.ErrorLogResp:
-            logging.warn("Flash is full, not recording.")
+        # Wait for ack and the session number, never resent (see NonIdempotentCommands)
+        result = self.core.execute(SubSystem.Storage, Commands.Storage.Record, state, response=True)
+        if result.status == CommandStatus.Timeout:
+            raise CommandTimeoutError(result)
+        packet = result.packet
+        if result.status == CommandStatus.ErrorResponse:
+            logging.warning("Flash is full, not recording.")
         else:
             logging.debug('Acknowledge packet was received with the session number {0}!'.format(packet.data.sessionID))
         sessionID = packet.data.sessionID
 
         return sessionID
 
-    def sessionPlayback(self, pbSessionID, dump=False):
+    def sessionPlayback(self, pbSessionID, dump=False, sink=None, progress=printPacketCount):
         """
             Playback a recorded session.
+            The packets are processed as they arrive, so memory use does not grow with the session.
 
             :param pbSessionID: Recorded session identifier.
             :param dump: True, to dump recorded data to file. False, to skip.
+            :param sink: Called with each NebResponsePacket received, None to skip.
+            :param progress: Called with the number of packets received so far, throttled. None to skip.
             :return: Number of data retrieved.
         """
-        self.core.sendCommand(SubSystem.Storage, Commands.Storage.Playback, True, sessionID=pbSessionID)
-        logging.debug('Sent the start playback command, waiting for response...')
-        # wait for confirmation
-        self.core.waitForAck(SubSystem.Storage, Commands.Storage.Playback)
-        packet = self.core.waitForPacket(PacketType.RegularResponse, SubSystem.Storage, Commands.Storage.Playback)
-        if packet.header.packetType == PacketType.ErrorLogResp:
+        logging.debug('Sending the start playback command, waiting for response...')
+        # wait for confirmation, never resent (see NonIdempotentCommands)
+        result = self.core.execute(SubSystem.Storage, Commands.Storage.Playback, True, response=True,
+                                   sessionID=pbSessionID)
+        if result.status == CommandStatus.Timeout:
+            raise CommandTimeoutError(result)
+        if result.status == CommandStatus.ErrorResponse:
             logging.error('Playback failed due to an invalid session number request!')
             return 0
         else:
-            pbSessionID = packet.data.sessionID
+            pbSessionID = result.packet.data.sessionID
             logging.info('Playback routine started from session number {0}'.format(pbSessionID))
-            packetList = self.core.storePacketsUntil(PacketType.RegularResponse, SubSystem.Storage,
-                                                     Commands.Storage.Playback)
+            packetCount = 0
+
+            def playbackPackets():
+                nonlocal packetCount
+                for packet in self.core.iterPacketsUntil(PacketType.RegularResponse, SubSystem.Storage,
+                                                         Commands.Storage.Playback, progress):
+                    packetCount += 1
+                    if sink:
+                        sink(packet)
+                    yield packet
+
+            self.core.setPlayback(True)
+            try:
+                if dump:
+                    logging.info('Saving dump file while receiving...')
+                    NebUtilities.saveFlashPlayback(pbSessionID, playbackPackets())
+                    logging.info('Dump file saving completed.')
+                else:
+                    for packet in playbackPackets():
+                        pass
+            except TimeoutError:
+                logging.error('Read timed out.')
+            except KeyboardInterrupt:
+                logging.error("KeyboardInterrupt.")
+            finally:
+                self.core.setPlayback(False)
             logging.info('Finished playback from session number {0}!'.format(pbSessionID))
-            if dump:
-                logging.info('Saving dump file. Waiting for completion...')
-                NebUtilities.saveFlashPlayback(pbSessionID, packetList)
-                logging.info('Dump file saving completed.')
-            return len(packetList)
+            return packetCount
 
     def getSessionCount(self):
         """
@@ -599,9 +743,7 @@ class NeblinaAPI(object):
 
             :return: Recorded session count.
         """
-        self.core.sendCommand(SubSystem.Storage, Commands.Storage.NumSessions)
-        packet = self.core.waitForAck(SubSystem.Storage, Commands.Storage.NumSessions)
-        packet = self.core.waitForPacket(PacketType.RegularResponse, SubSystem.Storage, Commands.Storage.NumSessions)
+        packet = self.core.request(SubSystem.Storage, Commands.Storage.NumSessions, response=True)
         return packet.data.numSessions
 
     def getSessionInfo(self, sessionID):
@@ -611,9 +753,7 @@ class NeblinaAPI(object):
             :param sessionID: Recorded session identifier
             :return: FlashSessionInfo instance.
         """
-        self.core.sendCommand(SubSystem.Storage, Commands.Storage.SessionInfo, sessionID=sessionID)
-        self.core.waitForAck(SubSystem.Storage, Commands.Storage.SessionInfo)
-        packet = self.core.waitForPacket(PacketType.RegularResponse, SubSystem.Storage, Commands.Storage.SessionInfo)
+        packet = self.core.request(SubSystem.Storage, Commands.Storage.SessionInfo, response=True, sessionID=sessionID)
         if packet.data.sessionLength == 0xFFFFFFFF:
             return None
         else:
@@ -625,17 +765,15 @@ class NeblinaAPI(object):
 
             :return: FirmwareVersionsData instance.
         """
-        self.core.sendCommand(SubSystem.Debug, Commands.Debug.FWVersions)
-        packet = self.core.waitForPacket(PacketType.RegularResponse, SubSystem.Debug, Commands.Debug.FWVersions)
+        packet = self.core.request(SubSystem.Debug, Commands.Debug.FWVersions, ack=False, response=True)
         return packet.data
 
     def debugUnitTestEnable(self, enable=True):
         """
             Debugging/Testing function only.
         """
-        self.core.sendCommand(SubSystem.Debug, Commands.Debug.StartUnitTestMotion, enable)
         logging.debug("Sending Start UnitTest Motion. Waiting for acknowledgment.")
-        self.core.waitForAck(SubSystem.Debug, Commands.Debug.StartUnitTestMotion)
+        self.core.request(SubSystem.Debug, Commands.Debug.StartUnitTestMotion, enable)
         logging.debug("Acknowledgment received")
 
     def debugUnitTestSendBytes(self, bytes):
@@ -0,0 +1,349 @@
+#!/usr/bin/env python
+###################################################################################
+#
+# Copyright (c)     2010-2016   Motsai
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###################################################################################
+
+import logging
+
+from neblina import *
+from neblinaAsyncCore import AsyncNeblinaCore
+from neblinaCore import PacketQueueSize
+
+###################################################################################
+
+
+class AsyncNeblinaAPI(object):
+    """
+        Neblina Application Programming Interface, for asyncio.
+
+        Same commands as NeblinaAPI, as coroutines:
+
+            api = AsyncNeblinaAPI()    # In a coroutine, or AsyncNeblinaAPI(loop)
+            api.open('/dev/ttyACM0')
+            temperature = await api.getTemperature()
+            async with api.stream(Commands.Motion.IMU) as samples:
+                async for imu in samples:
+                    ...
+    """
+
+    def __init__(self, loop=None):
+        """
+            Constructor
+
+            :param loop: asyncio event loop to use. The running loop if None,
+                         which requires being created from a coroutine.
+        """
+        self.core = AsyncNeblinaCore(loop)
+
+    def close(self):
+        """
+            Close communication with Neblina.
+        """
+        self.core.close()
+
+    def open(self, address):
+        """
+            Open communication with Neblina.
+
+            :param address: UART port of Neblina.
+        """
+        self.core.open(address)
+
+    def isOpened(self):
+        """
+            Is communication opened ?
+
+            :return: True, if communication opened. False, otherwise.
+        """
+        return self.core.isOpened()
+
+    def setDelegate(self, delegate):
+        """
+            Set the delegate receiving the streaming data nobody iterates on.
+
+            :param delegate: NeblinaDelegate instance.
+        """
+        self.core.setDelegate(delegate)
+
+    async def sendCommands(self, packets, timeout=3):
+        """
+            Send several commands back-to-back, then wait for all their acknowledges.
+
+            :param packets: NebCommandPacket instances.
+            :param timeout: Maximum time to wait (in seconds) for all acknowledges.
+            :return: Acknowledge packets, in the order of packets. None for a missing acknowledge.
+        """
+        return await self.core.sendCommands(packets, timeout)
+
+    async def getBatteryLevel(self):
+        """
+            Retrieve battery level.
+
+            :return: Battery Level (0-100%)
+        """
+        packet = await self.core.request(SubSystem.Power, Commands.Power.GetBatteryLevel, response=True)
+        return packet.data.batteryLevel
+
+    async def getTemperature(self):
+        """
+            Retrieve internal temperature
+
+            :return: Temperature (in Celsius)
+        """
+        packet = await self.core.request(SubSystem.Power, Commands.Power.GetTemperature, response=True)
+        return packet.data.temperature
+
+    async def getMotionStatus(self):
+        """
+            Retrieve current motion streaming status.
+
+            :return: MotionStatusData instance.
+        """
+        packet = await self.core.request(SubSystem.Debug, Commands.Debug.MotAndFlashRecState, response=True)
+        return packet.data.motionStatus
+
+    async def getRecorderStatus(self):
+        """
+            Retrieve current recording status
+
+            :return: RecorderStatusData instance.
+        """
+        packet = await self.core.request(SubSystem.Debug, Commands.Debug.MotAndFlashRecState, response=True)
+        return packet.data.recorderStatus
+
+    async def setDownsample(self, factor):
+        """
+            Set motion streaming downsampling.
+            Downsampling must be between 20 and 1000, and a multiple of 20.
+
+            :param factor:  Downsampling factor to use.
+        """
+        assert factor % 20 == 0 and 20 <= factor <= 1000
+        await self.core.request(SubSystem.Motion, Commands.Motion.Downsample, factor)
+
+    async def setAccelerometerRange(self, factor):
+        """
+            Set accelerometer range. Must be 2, 4, 8 or 16.
+
+            :param factor:  Accelerometer range to use.
+        """
+        assert factor == 2 or factor == 4 or factor == 8 or factor == 16
+        await self.core.request(SubSystem.Motion, Commands.Motion.AccRange, factor)
+
+    async def resetTimestamp(self):
+        """
+            Reset timestamp
+        """
+        await self.core.request(SubSystem.Motion, Commands.Motion.ResetTimeStamp, True)
+
+    async def streamDisableAll(self):
+        """
+            Disable all streaming.
+        """
+        await self.core.request(SubSystem.Motion, Commands.Motion.DisableStreaming, True)
+
+    async def setStreaming(self, command, state):
+        """
+            Start/Stop a motion stream.
+
+            :param command: Commands.Motion streaming command, e.g. Commands.Motion.IMU.
+            :param state: True, to start streaming. False, to stop streaming.
+        """
+        await self.core.request(SubSystem.Motion, command, state)
+
+    def stream(self, command, queueSize=PacketQueueSize):
+        """
+            Stream motion samples. Streaming is started on the first iteration,
+            and stopped when leaving the async with block (or on close()).
+
+            :param command: Commands.Motion streaming command, e.g. Commands.Motion.IMU.
+            :param queueSize: Samples kept when the consumer does not keep up.
+            :return: NeblinaStream instance, an asynchronous iterator of data objects.
+        """
+        return NeblinaStream(self.core, command, queueSize)
+
+    async def recordTrajectory(self, state):
+        """
+            Record trajectory information.
+
+            :param state: True, to start recording. False, to stop recording.
+        """
+        await self.core.request(SubSystem.Motion, Commands.Motion.TrajectoryRecStartStop, state)
+
+    async def eepromRead(self, readPageNumber):
+        """
+            Read a page from EEPROM
+
+            :param readPageNumber: EEPROM page number to read.
+            :return: EEPROMReadData instance.
+        """
+        assert 0 <= readPageNumber <= 255
+        packet = await self.core.request(SubSystem.EEPROM, Commands.EEPROM.Read, response=True,
+                                         pageNumber=readPageNumber)
+        return packet.data.dataBytes
+
+    async def eepromWrite(self, writePageNumber, dataString):
+        """
+            Write a page to EEPROM.
+
+            :param writePageNumber: EEPROM page number to write.
+            :param dataString: 8-byte data string to write.
+        """
+        assert 0 <= writePageNumber <= 255
+        await self.core.request(SubSystem.EEPROM, Commands.EEPROM.Write,
+                                pageNumber=writePageNumber, dataBytes=dataString)
+
+    async def getLED(self, index):
+        """
+            Retrieve LED state.
+
+            :param index: LED index to retrieve.
+            :return: LED state.
+        """
+        assert 0 <= index <= 7
+        future = self.core.expectPacket(PacketType.RegularResponse, SubSystem.LED, Commands.LED.GetVal)
+        self.core.sendCommand(SubSystem.LED, Commands.LED.GetVal, ledIndices=[index])
+        packet = await self.core.waitForFuture(future, 3)
+        return packet.data.ledState[index]
+
+    async def setLED(self, ledIndex, ledValue):
+        """
+            Set LED state.
+
+            :param ledIndex: LED index to use.
+            :param ledValue: LED state. True, open. False, close.
+        """
+        assert 0 <= ledIndex <= 7
+        await self.core.request(SubSystem.LED, Commands.LED.SetVal, ledValueTupleList=[(ledIndex, ledValue)])
+
+    async def eraseStorage(self, eraseType=Erase.Quick):
+        """
+            Erase storage.
+            Full erase can take up to 3 minute to complete.
+
+            :param eraseType: Erase Type. Quick or Full.
+        """
+        assert eraseType==Erase.Mass or eraseType==Erase.Quick
+        await self.core.request(SubSystem.Motion, Commands.Motion.DisableStreaming, True)
+        future = self.core.expectPacket(PacketType.RegularResponse, SubSystem.Storage, Commands.Storage.EraseAll)
+        try:
+            await self.core.request(SubSystem.Storage, Commands.Storage.EraseAll, eraseType)
+            logging.info("Started erasing... This takes up to around 3 minutes...")
+            await self.core.waitForFuture(future, 300)
+        finally:
+            self.core.cancelRequest(future)
+        logging.info('Flash erase has completed successfully!')
+
+    async def sessionRecord(self, state):
+        """
+            Start/Stop recording a session.
+
+            :param state: True, to start recording. False, to stop recording.
+            :return: Recording session identifier.
+        """
+        packet = await self.core.request(SubSystem.Storage, Commands.Storage.Record, state, response=True)
+        if packet.header.packetType == PacketType.ErrorLogResp:
+            logging.warning("Flash is full, not recording.")
+        return packet.data.sessionID
+
+    async def getSessionCount(self):
+        """
+            Retrieve number of session recording
+
+            :return: Recorded session count.
+        """
+        packet = await self.core.request(SubSystem.Storage, Commands.Storage.NumSessions, response=True)
+        return packet.data.numSessions
+
+    async def getSessionInfo(self, sessionID):
+        """
+            Retrieve a session information.
+
+            :param sessionID: Recorded session identifier
+            :return: FlashSessionInfo instance.
+        """
+        packet = await self.core.request(SubSystem.Storage, Commands.Storage.SessionInfo, response=True,
+                                         sessionID=sessionID)
+        if packet.data.sessionLength == 0xFFFFFFFF:
+            return None
+        return packet.data
+
+    async def getFirmwareVersions(self):
+        """
+            Retrieve firmware versions.
+
+            :return: FirmwareVersionsData instance.
+        """
+        future = self.core.expectPacket(PacketType.RegularResponse, SubSystem.Debug, Commands.Debug.FWVersions)
+        self.core.sendCommand(SubSystem.Debug, Commands.Debug.FWVersions)
+        packet = await self.core.waitForFuture(future, 3)
+        return packet.data
+
+###################################################################################
+
+
+class NeblinaStream(object):
+    """
+        Asynchronous iterator over the samples of a motion stream.
+        The samples are queued from the moment the stream is created.
+    """
+
+    def __init__(self, core, command, queueSize):
+        self.core = core
+        self.command = command
+        self.subscriber = core.subscribe(SubSystem.Motion, command, queueSize)
+        self.started = False
+        self.closed = False
+
+    async def start(self):
+        if not self.started:
+            self.started = True
+            await self.core.request(SubSystem.Motion, self.command, True)
+
+    async def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.core.unsubscribe(SubSystem.Motion, self.command, self.subscriber)
+        self.subscriber.close()
+        if self.started and self.core.isOpened():
+            await self.core.request(SubSystem.Motion, self.command, False)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await self.start()
+        sample = await self.subscriber.get()
+        if sample is None:
+            raise StopAsyncIteration
+        return sample
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, excType, excValue, traceback):
+        await self.close()
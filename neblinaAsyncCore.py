@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+###################################################################################
+#
+# Copyright (c)     2010-2016   Motsai
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###################################################################################
+
+import asyncio
+import collections
+import logging
+import serial
+
+from neblina import *
+from neblinaCommandPacket import NebCommandPacket
+from neblinaCore import DelegateHandlers, PacketQueueSize
+from neblinaError import *
+from neblinaResponsePacket import NebResponsePacket
+
+from pyslip import slip
+
+###################################################################################
+
+
+class AsyncNeblinaCore(object):
+    """
+        asyncio counterpart of NeblinaCore, UART only.
+
+        The serial port is read when the event loop reports its file descriptor
+        as readable, so any number of devices can be served from one thread.
+        Requires an event loop supporting add_reader (not the Windows proactor).
+    """
+
+    def __init__(self, loop=None):
+        """
+            :param loop: asyncio event loop to use. The running loop if None,
+                         which requires being created from a coroutine.
+        """
+        self.loop = loop or asyncio.get_running_loop()
+        self.sc = None
+        self.comslip = slip.slip()
+        self.decoder = slip.SlipDecoder()
+        self.delegate = None
+        self.handlers = {}
+        # Awaited packets, as (keys, future) tuples in request order
+        self.pendingRequests = []
+        # Stream subscribers by (subSystem, command)
+        self.streams = collections.defaultdict(list)
+        self.unknownPacketCount = 0
+        # Stream samples lost because a subscriber did not keep up
+        self.droppedPacketCount = 0
+
+    def open(self, address):
+        self.attach(serial.Serial(port=address, baudrate=500000, timeout=0))
+
+    def attach(self, stream):
+        """
+            Use an already opened serial port. The reads must not block.
+
+            :param stream: serial.Serial instance, opened with timeout=0.
+        """
+        self.sc = stream
+        self.sc.reset_input_buffer()
+        self.decoder.reset()
+        self.loop.add_reader(self.sc.fileno(), self.onReadable)
+
+    def close(self):
+        if self.sc:
+            self.loop.remove_reader(self.sc.fileno())
+            self.sc.close()
+            self.sc = None
+        for keys, future in self.pendingRequests:
+            if not future.done():
+                future.set_exception(ConnectionError('Neblina connection closed.'))
+        self.pendingRequests = []
+        for subscribers in self.streams.values():
+            for subscriber in subscribers:
+                subscriber.close()
+
+    def isOpened(self):
+        return self.sc is not None and self.sc.is_open
+
+    def setDelegate(self, delegate):
+        self.delegate = delegate
+        handlers = {}
+        if delegate:
+            for key, name in DelegateHandlers.items():
+                handler = getattr(delegate, name, None)
+                if handler:
+                    handlers[key] = handler
+        self.handlers = handlers
+
+    def onReadable(self):
+        try:
+            data = self.sc.read(max(self.sc.in_waiting, 1))
+        except serial.SerialException:
+            logging.error("Serial port error, closing : ", exc_info=True)
+            self.close()
+            return
+        self.dataReceived(data)
+
+    def dataReceived(self, data):
+        """
+            Decode the SLIP frames of raw bytes received from the device.
+        """
+        for frame in self.decoder.feed(data):
+            try:
+                packet = NebResponsePacket.fromString(frame, lazy=True)
+            except NotImplementedError as e:
+                logging.error("Dropped bad packet.")
+                continue
+            except InvalidPacketFormatError as e:
+                logging.error("InvalidPacketFormatError")
+                continue
+            except CRCError as e:
+                logging.error("CRCError : " + str(e))
+                continue
+            if packet is None:
+                self.unknownPacketCount += 1
+            else:
+                self.dispatchPacket(packet)
+
+    def dispatchPacket(self, packet):
+        """
+            Resolve the oldest request waiting for this packet. Otherwise, hand
+            a streaming packet to its subscribers, or else to the delegate.
+        """
+        header = packet.header
+        key = (header.packetType, header.subSystem, header.command)
+        for index, (keys, future) in enumerate(self.pendingRequests):
+            if key in keys and not future.done():
+                del self.pendingRequests[index]
+                future.set_result(packet)
+                return
+
+        if header.packetType == PacketType.RegularResponse:
+            subscribers = self.streams.get(key[1:])
+            if subscribers:
+                for subscriber in subscribers:
+                    subscriber.put(packet.data)
+                return
+            handler = self.handlers.get(key[1:])
+            if handler:
+                try:
+                    handler(packet.data)
+                except:
+                    logging.error("Delegate handler error : ", exc_info=True)
+
+    def expectPacket(self, packetType, subSystem, command):
+        """
+            Register a request for a packet, or the error packet of the same command.
+            Done before sending the command, so the response can not be missed.
+
+            :return: asyncio.Future resolved with the NebResponsePacket.
+        """
+        keys = ((packetType, subSystem, command), (PacketType.ErrorLogResp, subSystem, command))
+        future = self.loop.create_future()
+        self.pendingRequests.append((keys, future))
+        return future
+
+    async def waitForFuture(self, future, timeout):
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError
+        finally:
+            self.cancelRequest(future)
+
+    def cancelRequest(self, future):
+        future.cancel()
+        self.pendingRequests = [request for request in self.pendingRequests if request[1] is not future]
+
+    def sendCommand(self, subSystem, command, enable=True, **kwargs):
+        packet = NebCommandPacket(subSystem, command, enable, **kwargs)
+        self.comslip.sendPacketToStream(self.sc, packet.stringEncode())
+
+    async def request(self, subSystem, command, enable=True, response=False, timeout=3, **kwargs):
+        """
+            Send a command and wait for its acknowledge.
+
+            :param response: True, to also wait for the regular response packet.
+            :param timeout: Maximum time to wait (in seconds) for each packet.
+            :return: Response packet if requested, acknowledge packet otherwise.
+                The error packet, if the device answered with one instead.
+        """
+        futures = [self.expectPacket(PacketType.Ack, subSystem, command)]
+        if response:
+            futures.append(self.expectPacket(PacketType.RegularResponse, subSystem, command))
+        try:
+            self.sendCommand(subSystem, command, enable, **kwargs)
+            packet = await self.waitForFuture(futures[0], timeout)
+            # An error packet instead of the acknowledge is final, no response follows
+            if response and packet.header.packetType != PacketType.ErrorLogResp:
+                packet = await self.waitForFuture(futures[1], timeout)
+        finally:
+            # Also when the write failed, so that no later packet resolves them
+            for future in futures:
+                self.cancelRequest(future)
+        return packet
+
+    async def waitForPacket(self, packetType, subSystem, command, timeout=3):
+        return await self.waitForFuture(self.expectPacket(packetType, subSystem, command), timeout)
+
+    async def sendCommands(self, packets, timeout=3):
+        """
+            Send command packets back-to-back, then wait for all their acknowledges.
+
+            :return: Acknowledge packets, in the order of packets. None for a missing acknowledge.
+        """
+        futures = [self.expectPacket(PacketType.Ack, packet.header.subSystem, packet.header.command)
+                   for packet in packets]
+        try:
+            self.comslip.sendPacketsToStream(self.sc, [packet.stringEncode() for packet in packets])
+            done, pending = await asyncio.wait(futures, timeout=timeout)
+        finally:
+            for future in futures:
+                self.cancelRequest(future)
+        return [future.result() if future in done and not future.exception() else None
+                for future in futures]
+
+    def subscribe(self, subSystem, command, queueSize=PacketQueueSize):
+        subscriber = NeblinaSubscriber(self.loop, queueSize, self)
+        self.streams[(subSystem, command)].append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subSystem, command, subscriber):
+        subscribers = self.streams.get((subSystem, command))
+        if subscribers and subscriber in subscribers:
+            subscribers.remove(subscriber)
+
+###################################################################################
+
+
+class NeblinaSubscriber(object):
+    """
+        Bounded queue of stream samples. The oldest sample is dropped when the
+        consumer does not keep up, rather than growing without limit.
+    """
+
+    def __init__(self, loop, queueSize, core):
+        self.loop = loop
+        self.queueSize = queueSize
+        self.core = core
+        self.samples = collections.deque()
+        self.waiter = None
+        self.closed = False
+
+    def put(self, sample):
+        if len(self.samples) >= self.queueSize:
+            self.samples.popleft()
+            self.core.droppedPacketCount += 1
+        self.samples.append(sample)
+        self.wakeUp()
+
+    def close(self):
+        self.closed = True
+        self.wakeUp()
+
+    def wakeUp(self):
+        if self.waiter and not self.waiter.done():
+            self.waiter.set_result(None)
+
+    async def get(self):
+        """
+            :return: Next sample, or None once closed.
+        """
+        while not self.samples:
+            if self.closed:
+                return None
+            self.waiter = self.loop.create_future()
+            try:
+                await self.waiter
+            finally:
+                self.waiter = None
+        return self.samples.popleft()
@@ -27,8 +27,10 @@
 
 import logging
 import queue
+import time
 
-from neblinaCommunication import NeblinaCommunication
+from neblinaCommunication import NeblinaCommunication, ReceivePollTimeout
+from neblinaRetry import ConnectRetryPolicy
 
 try:
     from bluepy.btle import *
@@ -75,20 +77,27 @@ class NeblinaBLE(NeblinaCommunication):
         self.writeNeblinaCh = None
         self.readNeblinaCh = None
 
-    def connect(self):
+    def connect(self, policy=ConnectRetryPolicy):
+        """
+            :param policy: RetryPolicy of the attempts to connect.
+            :raise ConnectionError: Unable to connect, even after the retries.
+        """
         logging.debug("Opening BLE address : {0}".format(self.address))
         connected = False
         peripheral = None
-        count = 0
-        while not connected and count < 5:
-            count += 1
+        attempts = 0
+        while not connected:
+            attempts += 1
             try:
                 peripheral = Peripheral(self.address, "random")
                 connected = True
                 break
             except BTLEException as e:
-                logging.warning("Unable to connect to BLE device, retrying in 1 second.")
-            time.sleep(1)
+                if attempts > policy.retries:
+                    raise ConnectionError('Unable to connect to BLE device {0} : {1}'.format(self.address, e)) from e
+                delay = policy.getDelay(attempts)
+                logging.warning("Unable to connect to BLE device, retrying in {0:.1f} seconds.".format(delay))
+                time.sleep(delay)
 
         if connected:
             self.connected = True
@@ -124,13 +133,35 @@ class NeblinaBLE(NeblinaCommunication):
 
         return None
 
-    def receivePacket(self):
-        self.peripheral.waitForNotifications(0.01)
-        if not self.delegate.packets.empty():
-            data = self.delegate.packets.get(False)
-            return data
-        else:
-            return None
+    def receivePacket(self, timeout=ReceivePollTimeout):
+        """
+            :param timeout: Maximum time to wait (in seconds) for a packet, None to wait forever.
+                            By default, returns quickly for polling loops.
+        """
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+        # Block on the notification socket until a notification arrives
+        while self.delegate.packets.empty():
+            if timeout is None:
+                remaining = None
+            else:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+            self.peripheral.waitForNotifications(remaining)
+        return self.delegate.packets.get(False)
+
+    def fileno(self):
+        # Notifications come through the stdout pipe of the bluepy-helper process
+        return self.peripheral._helper.stdout.fileno()
+
+    def receiveAvailablePackets(self):
+        while self.peripheral.waitForNotifications(0):
+            pass
+        packets = []
+        while not self.delegate.packets.empty():
+            packets.append(self.delegate.packets.get(False))
+        return packets
 
     def sendPacket(self, packet):
         try:
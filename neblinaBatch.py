@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+###################################################################################
+#
+# Copyright (c)     2010-2016   Motsai
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###################################################################################
+
+from neblina import *
+from neblinaClock import NebTimestampUnwrapper, TimestampRange
+from neblinaUtilities import CRC8Table
+
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError("Unable to locate numpy. It is a required module to use neblinaBatch.")
+
+###################################################################################
+
+# Size of a regular Neblina packet: 4 bytes header + 16 bytes data
+PacketLength = 20
+
+CRC8TableArray = np.array(CRC8Table, dtype=np.uint8)
+
+# Field names of the fixed motion stream layouts, one entry per item of the
+# Formatting.Data layout. A tuple splits a repeated item in scalar fields,
+# None skips the item (garbage bytes).
+# The values are kept raw, i.e. Euler angles, walking direction and rpm are x10.
+BatchFields = {
+    Commands.Motion.IMU: (Formatting.Data.IMU, ('timestamp', 'accel', 'gyro')),
+    Commands.Motion.MAG: (Formatting.Data.MAG, ('timestamp', 'mag', 'accel')),
+    Commands.Motion.Quaternion: (Formatting.Data.Quaternion, ('timestamp', 'quaternions', None)),
+    Commands.Motion.EulerAngle: (Formatting.Data.Euler, ('timestamp', ('yaw', 'pitch', 'roll', 'demoHeading'), None)),
+    Commands.Motion.ExtForce: (Formatting.Data.ExternalForce, ('timestamp', 'externalForces', None)),
+    Commands.Motion.Pedometer: (Formatting.Data.Pedometer, ('timestamp', 'stepCount', 'stepsPerMinute', 'walkingDirection', None)),
+    Commands.Motion.RotationInfo: (Formatting.Data.RotationInfo, ('timestamp', 'rotationCount', 'rpm', None)),
+}
+
+# struct format character to NumPy type
+TypeCodes = {'b': 'i1', 'B': 'u1', 'h': 'i2', 'H': 'u2', 'i': 'i4', 'I': 'u4'}
+
+###################################################################################
+
+
+def stackFrames(packets, frameLength=PacketLength):
+    """
+        Stack packets in a 2-D uint8 array, one packet per row.
+
+        :param packets: List of packets, or a bytes-like object of concatenated packets.
+        :param frameLength: Number of bytes per packet.
+        :return: (frames, lengthMask), lengthMask is False for the packets that
+                 do not have frameLength bytes (their row is zero filled).
+    """
+    if isinstance(packets, np.ndarray):
+        frames = packets.reshape(-1, frameLength)
+        return frames, np.ones(len(frames), dtype=bool)
+    if isinstance(packets, (bytes, bytearray, memoryview)):
+        frames = np.frombuffer(packets, dtype=np.uint8).reshape(-1, frameLength)
+        return frames, np.ones(len(frames), dtype=bool)
+
+    lengthMask = np.array([len(packet) == frameLength for packet in packets], dtype=bool)
+    if lengthMask.all():
+        buffer = b''.join(packets)
+    else:
+        blank = bytes(frameLength)
+        buffer = b''.join([packet if valid else blank for packet, valid in zip(packets, lengthMask)])
+    frames = np.frombuffer(buffer, dtype=np.uint8).reshape(-1, frameLength)
+    return frames, lengthMask
+
+
+def crc8Batch(frames):
+    """
+        Compute the Neblina CRC (see NebUtilities.genNebCRC8) of every row of frames.
+
+        :param frames: 2-D uint8 array, one packet per row.
+        :return: uint8 array of the computed CRCs.
+    """
+    frames = np.asarray(frames, dtype=np.uint8)
+    crc = np.zeros(frames.shape[0], dtype=np.uint8)
+    for column in range(frames.shape[1]):
+        if column == 2:
+            # The CRC byte itself is computed as if it was 255
+            crc = CRC8TableArray[crc ^ 0xFF]
+        else:
+            crc = CRC8TableArray[crc ^ frames[:, column]]
+    return crc
+
+
+def validateCRCBatch(frames):
+    """
+        Verify the CRC of every row of frames in one vectorized pass.
+
+        :param frames: 2-D uint8 array, one packet per row (see stackFrames).
+        :return: Boolean array, True where the packet CRC is valid.
+    """
+    frames = np.asarray(frames, dtype=np.uint8)
+    return crc8Batch(frames) == frames[:, 2]
+
+
+def validatePackets(packets, frameLength=PacketLength):
+    """
+        Verify the CRC of a whole recording.
+
+        :param packets: List of packets, or a bytes-like object of concatenated packets.
+        :return: Boolean array, True where the packet has the expected length and a valid CRC.
+    """
+    frames, lengthMask = stackFrames(packets, frameLength)
+    return validateCRCBatch(frames) & lengthMask
+
+
+###################################################################################
+
+
+def buildDtype(layout, names):
+    """
+        Build the NumPy structured dtype equivalent to a little-endian struct layout.
+    """
+    assert layout.startswith('<')
+    items = layout[1:].split()
+    assert len(items) == len(names)
+    fieldNames = []
+    formats = []
+    offsets = []
+    offset = 0
+    for item, name in zip(items, names):
+        count = int(item[:-1]) if len(item) > 1 else 1
+        code = item[-1]
+        if code == 's':
+            offset += count
+            continue
+        fieldFormat = '<' + TypeCodes[code]
+        size = np.dtype(fieldFormat).itemsize
+        if isinstance(name, tuple):
+            assert len(name) == count
+            for fieldName in name:
+                fieldNames.append(fieldName)
+                formats.append(fieldFormat)
+                offsets.append(offset)
+                offset += size
+        else:
+            fieldNames.append(name)
+            formats.append(fieldFormat if count == 1 else '({0},){1}'.format(count, fieldFormat))
+            offsets.append(offset)
+            offset += count * size
+    return np.dtype({'names': fieldNames, 'formats': formats, 'offsets': offsets, 'itemsize': offset})
+
+BatchDtypes = {command: buildDtype(layout, names) for command, (layout, names) in BatchFields.items()}
+
+
+def commandMask(frames, subSystem, command, packetType=PacketType.RegularResponse):
+    """
+        :param frames: 2-D uint8 array, one packet per row (see stackFrames).
+        :return: Boolean array, True where the packet header matches.
+    """
+    ctrlByte = subSystem | (packetType << BitPosition.PacketType)
+    return (frames[:, 0] == ctrlByte) & (frames[:, 3] == command)
+
+
+def decodeBatch(frames, command, validate=True):
+    """
+        Decode all the packets of a motion stream at once, without building
+        one Python object per sample.
+
+        :param frames: List of packets, bytes-like object of concatenated packets
+                       or 2-D uint8 array (see stackFrames). Packets of other
+                       streams are skipped.
+        :param command: Commands.Motion streaming command (see BatchFields).
+        :param validate: True, to also skip the packets with an invalid CRC.
+        :return: NumPy structured array, one row per sample.
+    """
+    dtype = BatchDtypes[command]
+    frames, lengthMask = stackFrames(frames)
+    mask = lengthMask & commandMask(frames, SubSystem.Motion, command)
+    if validate:
+        mask &= validateCRCBatch(frames)
+    headerLength = 4
+    data = frames[mask, headerLength:headerLength + dtype.itemsize]
+    return np.frombuffer(data.tobytes(), dtype=dtype)
+
+
+def unwrapTimestamps(timestamps, unwrapper=None):
+    """
+        Extend the 32-bit timestamps of a stream to monotonic 64-bit values,
+        e.g. samples['timestamp'] of a session longer than ~71 minutes.
+        Gives the same values as NebTimestampUnwrapper.unwrap on each timestamp.
+
+        :param timestamps: Timestamps of one stream, in arrival order.
+        :param unwrapper: NebTimestampUnwrapper instance continuing from the previous
+                          batch of the stream (updated), None for a standalone batch.
+        :return: int64 array.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    if len(timestamps) == 0:
+        return timestamps
+    if unwrapper is None:
+        unwrapper = NebTimestampUnwrapper()
+    state = (unwrapper.lastTimestamp, unwrapper.wrapOffset)
+    halfRange = TimestampRange // 2
+    # Same rule as NebTimestampUnwrapper: forward for a large backward jump,
+    # back for a large forward jump (late packet)
+    steps = np.diff(timestamps)
+    wraps = np.empty(len(timestamps), dtype=np.int64)
+    wraps[0] = (unwrapper.unwrap(int(timestamps[0])) - int(timestamps[0])) // TimestampRange
+    np.cumsum((steps < -halfRange).astype(np.int64) - (steps > halfRange), out=wraps[1:])
+    wraps[1:] += wraps[0]
+    # Never back before the first wraparound (the value >= TimestampRange guard of expand()),
+    # the large forward jump is then the latest timestamp
+    wraps -= np.minimum(np.minimum.accumulate(wraps), 0)
+    unwrapped = timestamps + wraps * TimestampRange
+
+    # The steps are taken from the previous timestamp, NebTimestampUnwrapper from the latest one.
+    # Both agree unless a timestamp jumps by about half the range, then unwrap one at a time.
+    latest = unwrapped[:-1].copy()
+    if len(latest):
+        latest[0] = unwrapper.wrapOffset + unwrapper.lastTimestamp
+    jumps = unwrapped[1:] - np.maximum.accumulate(latest)
+    if not ((np.abs(jumps) < halfRange) | ((jumps > halfRange) & (unwrapped[1:] < TimestampRange))).all():
+        unwrapper.lastTimestamp, unwrapper.wrapOffset = state
+        return np.array([unwrapper.unwrap(int(timestamp)) for timestamp in timestamps], dtype=np.int64)
+
+    latest = int(np.argmax(unwrapped))
+    if unwrapped[latest] > unwrapper.wrapOffset + unwrapper.lastTimestamp:
+        unwrapper.lastTimestamp = int(timestamps[latest])
+        unwrapper.wrapOffset = int(unwrapped[latest]) - unwrapper.lastTimestamp
+    return unwrapped
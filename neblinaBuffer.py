@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+###################################################################################
+#
+# Copyright (c)     2010-2016   Motsai
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###################################################################################
+
+import collections
+
+from neblina import *
+
+###################################################################################
+
+
+class NebPacketBuffer(object):
+    """
+        Bounded FIFO of packets with an overflow policy, see Overflow.
+        Not thread-safe by itself, NeblinaCore guards it with its packetCondition.
+        Overflow.Block is implemented by the producer, which waits for room
+        before calling push. Otherwise, push drops the newest as DropNewest.
+    """
+    __slots__ = ('items', 'capacity', 'overflow', 'overflowCount', 'highWaterMark')
+
+    def __init__(self, capacity, overflow=Overflow.DropOldest):
+        assert capacity > 0
+        self.items = collections.deque()
+        self.capacity = capacity
+        self.overflow = overflow
+        # Packets dropped because the buffer was full
+        self.overflowCount = 0
+        # Largest number of packets held at once
+        self.highWaterMark = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def isFull(self):
+        return len(self.items) >= self.capacity
+
+    def push(self, item):
+        """
+            :return: True if item was stored, False if it was dropped.
+        """
+        items = self.items
+        if len(items) >= self.capacity:
+            self.overflowCount += 1
+            if self.overflow == Overflow.DropOldest:
+                items.popleft()
+            else:
+                return False
+        items.append(item)
+        if len(items) > self.highWaterMark:
+            self.highWaterMark = len(items)
+        return True
+
+    def peek(self):
+        return self.items[0]
+
+    def pop(self):
+        return self.items.popleft()
+
+    def clear(self):
+        self.items.clear()
+
+    def resize(self, capacity, overflow=None):
+        """
+            Change the capacity (and the policy), dropping the oldest packets that no longer fit.
+        """
+        assert capacity > 0
+        self.capacity = capacity
+        if overflow is not None:
+            self.overflow = overflow
+        while len(self.items) > capacity:
+            self.items.popleft()
+            self.overflowCount += 1
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+###################################################################################
+#
+# Copyright (c)     2010-2016   Motsai
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###################################################################################
+
+import collections
+import time
+
+###################################################################################
+
+# Host time (in seconds) covered by each point of the fit
+ClockSyncBlockDuration = 1.0
+# Points kept for the fit, i.e. the drift is followed over about that many blocks
+ClockSyncBlockCount = 64
+
+# Device timestamps are 32-bit microsecond counters
+TimestampRange = 1 << 32
+
+###################################################################################
+
+
+class NebTimestampUnwrapper(object):
+    """
+        Extends the 32-bit microsecond timestamps of a stream, which wrap every
+        ~71.6 minutes, to monotonic 64-bit values. Each timestamp is placed in
+        the wraparound closest to the latest one, so a backward jump of more
+        than half the range is a wraparound and a late packet from before the
+        wraparound stays before it. One instance per device and stream.
+    """
+    __slots__ = ('lastTimestamp', 'wrapOffset')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """
+            Start over, e.g. after the device timestamp was reset.
+        """
+        self.lastTimestamp = None
+        self.wrapOffset = 0
+
+    def unwrap(self, timestamp):
+        """
+            :param timestamp: Next 32-bit timestamp of the stream.
+            :return: 64-bit timestamp.
+        """
+        value = self.expand(timestamp)
+        if self.lastTimestamp is None or value > self.wrapOffset + self.lastTimestamp:
+            self.wrapOffset = value - timestamp
+            self.lastTimestamp = timestamp
+        return value
+
+    def expand(self, timestamp):
+        """
+            Extend any 32-bit timestamp, choosing the wraparound closest to the
+            stream. Does not change the state, unlike unwrap().
+        """
+        if self.lastTimestamp is None:
+            return timestamp
+        value = self.wrapOffset + timestamp
+        last = self.wrapOffset + self.lastTimestamp
+        if value - last > TimestampRange // 2 and value >= TimestampRange:
+            value -= TimestampRange
+        elif last - value > TimestampRange // 2:
+            value += TimestampRange
+        return value
+
+###################################################################################
+
+
+class NebClockSync(object):
+    """
+        Maps the device timestamps (32-bit, in microseconds) to host time:
+
+            hostTime = offset + deviceTime * (1 + drift)
+
+        Every packet gives a (device time, arrival time) point. The arrival is
+        late by a variable transport delay but never early, so only the point
+        with the smallest delay of each block of ClockSyncBlockDuration seconds
+        is kept (the lower envelope). The line is then fitted on the last
+        ClockSyncBlockCount envelope points with the Theil-Sen estimator, which
+        ignores the blocks delayed as a whole (e.g. a BLE connection event
+        missed).
+
+        update() is O(1), the fit only runs when a block closes.
+    """
+
+    def __init__(self, clock=time.monotonic, blockDuration=ClockSyncBlockDuration, blockCount=ClockSyncBlockCount):
+        """
+            :param clock: Host clock, the arrival times and the estimates are in its time base.
+        """
+        self.clock = clock
+        self.blockDuration = blockDuration
+        self.blockCount = blockCount
+        self.reset()
+
+    def reset(self, hostTime=None):
+        """
+            Forget the model, e.g. after the device timestamp was reset.
+
+            :param hostTime: Host time at which the device timestamp was 0, if known.
+        """
+        # Lower envelope points, (deviceTime, hostTime - deviceTime)
+        self.points = collections.deque(maxlen=self.blockCount)
+        self.blockEnd = None
+        self.blockPoint = None
+        self.unwrapper = NebTimestampUnwrapper()
+        self.offset = None
+        self.drift = 0.0
+        self.sampleCount = 0
+        if hostTime is not None:
+            self.points.append((0.0, hostTime))
+            self.offset = hostTime
+
+    def isSynchronized(self):
+        return self.offset is not None
+
+    def update(self, timestamp, hostTime=None):
+        """
+            Add the arrival of a packet to the model.
+
+            :param timestamp: 32-bit device timestamp of the packet (in microseconds).
+            :param hostTime: Arrival time on the host clock, now if None.
+        """
+        if hostTime is None:
+            hostTime = self.clock()
+        deviceTime = self.unwrapper.unwrap(timestamp) * 1e-6
+        point = (deviceTime, hostTime - deviceTime)
+        self.sampleCount += 1
+        if self.blockPoint is None:
+            self.blockPoint = point
+            self.blockEnd = hostTime + self.blockDuration
+        elif point[1] < self.blockPoint[1]:
+            self.blockPoint = point
+        if not self.points and (self.offset is None or point[1] < self.offset):
+            # Coarse estimate until the first block closes
+            self.offset = point[1]
+        if hostTime >= self.blockEnd:
+            self.points.append(self.blockPoint)
+            self.blockPoint = None
+            self.fit()
+
+    def fit(self):
+        points = self.points
+        if len(points) == 1:
+            self.offset = points[0][1]
+            self.drift = 0.0
+            return
+        # Theil-Sen: median of the pairwise slopes, then median of the intercepts
+        slopes = []
+        for i in range(len(points)):
+            xi, yi = points[i]
+            for j in range(i + 1, len(points)):
+                xj, yj = points[j]
+                if xj != xi:
+                    slopes.append((yj - yi) / (xj - xi))
+        if not slopes:
+            return
+        slopes.sort()
+        drift = slopes[len(slopes) // 2]
+        intercepts = sorted([y - drift * x for x, y in points])
+        self.drift = drift
+        self.offset = intercepts[len(intercepts) // 2]
+
+    def toHostTime(self, timestamp):
+        """
+            Estimate the host time of a device timestamp.
+
+            :param timestamp: Device timestamp (in microseconds).
+            :return: Host time (in seconds, time base of clock), None before the first packet.
+        """
+        if self.offset is None:
+            return None
+        deviceTime = self.unwrapper.expand(timestamp) * 1e-6
+        return self.offset + deviceTime * (1.0 + self.drift)
+
+    def getDriftPPM(self):
+        """
+            :return: Drift of the device clock relative to the host clock, in parts per million.
+        """
+        return self.drift * 1e6
@@ -47,7 +47,7 @@ class NebCommandData(object):
 
     def encode(self):
         garbage = ('\000'*11).encode('utf-8')
-        commandDataString = struct.pack(Formatting.CommandData.Command,\
+        commandDataString = Formatting.Struct.CommandData.Command.pack(\
             self.timestamp, self.enable, garbage)
         return commandDataString
 
@@ -80,7 +80,7 @@ class NebFlashPlaybackCommandData(object):
         if self.openClose == 1:
             pass
         openCloseVal = 1 if self.openClose else 0
-        commandDataString = struct.pack(Formatting.CommandData.FlashSession,\
+        commandDataString = Formatting.Struct.CommandData.FlashSession.pack(\
             timestamp, openCloseVal, self.sessionID, garbage)
         return commandDataString
 
@@ -104,7 +104,7 @@ class NebFlashSessionInfoCommandData(object):
     def encode(self):
         garbage = ('\000'*10).encode('utf-8')
         timestamp = 0
-        commandDataString = struct.pack(Formatting.CommandData.FlashSessionInfo,\
+        commandDataString = Formatting.Struct.CommandData.FlashSessionInfo.pack(\
             timestamp, self.sessionID, garbage)
         return commandDataString
 
@@ -127,7 +127,7 @@ class NebUnitTestMotionDataCommandData(object):
         self.mag = mag
 
     def encode(self):
-        commandDataString = struct.pack(Formatting.CommandData.UnitTestMotion,\
+        commandDataString = Formatting.Struct.CommandData.UnitTestMotion.pack(\
             self.timestamp, self.accel[0], self.accel[1], self.accel[2],\
             self.gyro[0], self.gyro[1], self.gyro[2],\
             self.mag[0], self.mag[1], self.mag[2])
@@ -148,7 +148,7 @@ class NebAccRangeCommandData(NebCommandData):
     def encode(self):
         garbage = ('\000'*10).encode('utf-8')
         rangeCode = self.rangeCodes[self.enable]
-        commandDataString = struct.pack(Formatting.CommandData.AccRange,\
+        commandDataString = Formatting.Struct.CommandData.AccRange.pack(\
             self.timestamp, rangeCode, garbage)
         return commandDataString
 
@@ -165,7 +165,7 @@ class NebDownsampleCommandData(NebCommandData):
 
     def encode(self):
         garbage = ('\000'*10).encode('utf-8')
-        commandDataString = struct.pack(Formatting.CommandData.Downsample,\
+        commandDataString = Formatting.Struct.CommandData.Downsample.pack(\
             self.timestamp, self.enable, garbage)
         return commandDataString
 
@@ -256,7 +256,7 @@ class NebEEPROMCommandData(object):
 
     def encode(self):
         garbage = b'00'*6
-        commandDataString = struct.pack(Formatting.CommandData.EEPROM,\
+        commandDataString = Formatting.Struct.CommandData.EEPROM.pack(\
             self.pageNumber, self.dataBytes, garbage)
         return commandDataString
 
@@ -281,7 +281,7 @@ class NebDataPortState(object):
 
     def encode(self):
         openCloseVal = 1 if self.openClose else 0
-        commandDataString = struct.pack(Formatting.CommandData.SetDataPortState, \
+        commandDataString = Formatting.Struct.CommandData.SetDataPortState.pack(\
                                         self.portID, openCloseVal)
         return commandDataString
 
@@ -63,7 +63,7 @@ class NebCommandPacket(object):
             self.data = NebCommandData(enable)
         self.header = NebHeader(subSystem, PacketType.Command, commandType, length=len(self.data.encode()))
         # Perform CRC calculation
-        self.header.crc = nebUtilities.crc8(bytearray(self.header.encode() + self.data.encode()))
+        self.header.crc = nebUtilities.crc8(self.header.encode() + self.data.encode())
 
     def stringEncode(self):
         headerStringCode = self.header.encode()
@@ -25,6 +25,11 @@
 #
 ###################################################################################
 
+# Default wait of receivePacket (in seconds), short enough for polling loops
+ReceivePollTimeout = 0.01
+
+###################################################################################
+
 
 class NeblinaCommunication(object):
 
@@ -40,11 +45,34 @@ class NeblinaCommunication(object):
     def isConnected(self):
         raise NotImplementedError("isConnected not override in child.")
 
-    def receivePacket(self):
+    def receivePacket(self, timeout=ReceivePollTimeout):
+        """
+            Wait for one packet up to timeout (in seconds, None to wait forever).
+
+            :return: The packet, None if none was received in time.
+        """
         raise NotImplementedError("receivedPacket not override in child.")
 
+    def fileno(self):
+        """
+            File descriptor that becomes readable when packets arrive, for select/selectors.
+        """
+        raise NotImplementedError("fileno not override in child.")
+
+    def receiveAvailablePackets(self):
+        """
+            Retrieve the packets already received, without waiting.
+
+            :return: List of packets, possibly empty.
+        """
+        raise NotImplementedError("receiveAvailablePackets not override in child.")
+
     def run(self):
         raise NotImplementedError("run not override in child.")
 
     def sendPacket(self, packet):
-        raise NotImplementedError("sendPacket not override in child.")
\ No newline at end of file
+        raise NotImplementedError("sendPacket not override in child.")
+
+    def sendPackets(self, packets):
+        for packet in packets:
+            self.sendPacket(packet)
\ No newline at end of file
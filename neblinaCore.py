@@ -25,14 +25,58 @@
 #
 ###################################################################################
 
+import collections
 import logging
+import struct
+import threading
 import time
 
 from neblina import *
+from neblinaBuffer import NebPacketBuffer
+from neblinaClock import NebClockSync, NebTimestampUnwrapper
 from neblinaCommandPacket import NebCommandPacket
 from neblinaDevice import NeblinaDevice
 from neblinaError import *
+from neblinaLoss import NebLossDetector, PeriodicStreams
 from neblinaResponsePacket import NebResponsePacket
+from neblinaRetry import DefaultRetryPolicies, DefaultRetryPolicy, NebCommandResult, NonIdempotentCommands
+from neblinaTelemetry import NebTelemetry
+from neblinaUtilities import NebUtilities
+
+###################################################################################
+
+# Control byte of the motion streams, whose data starts with the device timestamp
+MotionCtrlByte = (PacketType.RegularResponse << BitPosition.PacketType) | SubSystem.Motion
+TimestampStruct = struct.Struct('<I')
+
+# Delegate handler of each streaming command, see NeblinaDelegate
+DelegateHandlers = {
+    (SubSystem.Motion, Commands.Motion.EulerAngle): 'handleEulerAngle',
+    (SubSystem.Motion, Commands.Motion.ExtForce): 'handleExternalForce',
+    (SubSystem.Motion, Commands.Motion.FingerGesture): 'handleFingerGesture',
+    (SubSystem.Motion, Commands.Motion.IMU): 'handleIMU',
+    (SubSystem.Motion, Commands.Motion.MAG): 'handleMAG',
+    (SubSystem.Motion, Commands.Motion.MotionState): 'handleMotionState',
+    (SubSystem.Motion, Commands.Motion.Pedometer): 'handlePedometer',
+    (SubSystem.Motion, Commands.Motion.Quaternion): 'handleQuaternion',
+    (SubSystem.Motion, Commands.Motion.RotationInfo): 'handleRotationInfo',
+    (SubSystem.Motion, Commands.Motion.SittingStanding): 'handleSittingStanding',
+    (SubSystem.Motion, Commands.Motion.TrajectoryInfo): 'handleTrajectoryInfo',
+}
+
+# Packets kept for waitForPacket/storePacketsUntil, per packet type/subsystem/command
+PacketQueueSize = 1000
+PacketQueueTimeout = 0.1
+# Longest time the receive thread blocks on the device before checking for stopReceiving
+ReceiveLoopTimeout = 0.2
+# Longest time a direct read waits for room in an Overflow.Block buffer
+PacketBlockTimeout = 1.0
+# Minimum time (in seconds) between progress reports of iterPacketsUntil
+ProgressInterval = 0.5
+
+
+def printPacketCount(packetCount):
+    print('Received {0} packets'.format(packetCount), end="\r", flush=True)
 
 ###################################################################################
 
@@ -43,8 +87,42 @@ class NeblinaCore(object):
         self.delegate = None
         self.device = None
         self.interface = interface
+        self.telemetry = NebTelemetry()
+        # RetryPolicy of the commands sent with execute/request, by (subSystem, command)
+        self.retryPolicies = dict(DefaultRetryPolicies)
+        self.defaultRetryPolicy = DefaultRetryPolicy
+        # Device timestamp to host time model, fed with the arrival of the motion streams
+        self.clockSync = NebClockSync()
+        # NebTimestampUnwrapper of each motion stream, by command
+        self.timestampUnwrappers = {}
+        # NebLossDetector of each periodic motion stream, by command
+        self.lossDetectors = {}
+        # Expected interval between samples (in microseconds), from the downsample factor
+        self.streamPeriod = None
+        # Recorded packets are played back, see setPlayback
+        self.playback = False
+        self.liveTimestampUnwrappers = None
+        self.handlers = {}
+        # Packets not handed to the delegate, NebPacketBuffer by (packetType, subSystem, command).
+        # Each entry is a (sequence, packet) tuple to keep the arrival order.
+        self.packetQueues = {}
+        # Capacity and overflow policy of the buffers not configured with setPacketBuffer
+        self.packetQueueSize = PacketQueueSize
+        self.packetOverflow = Overflow.DropOldest
+        self.packetBlockTimeout = PacketBlockTimeout
+        self.packetSequence = 0
+        self.packetCondition = threading.Condition()
+        # Number of waiters by (packetType, subSystem, command), None to collect everything
+        self.pendingRequests = collections.Counter()
+        # Packets lost because nobody retrieved them before their buffer filled up
+        self.droppedPacketCount = 0
+        self.receiveThread = None
+        self.receiveStop = threading.Event()
+        # Object reading the device instead of the receive thread, e.g. NeblinaFleet
+        self.receiver = None
 
     def close(self):
+        self.stopReceiving()
         if self.device:
             self.device.disconnect()
 
@@ -58,9 +136,7 @@ class NeblinaCore(object):
     def getBatteryLevel(self):
         if self.device:
             if self.interface is Interface.UART:
-                self.sendCommand(SubSystem.Power, Commands.Power.GetBatteryLevel, True)
-                packet = self.waitForAck(SubSystem.Power, Commands.Power.GetBatteryLevel)
-                packet = self.waitForPacket(PacketType.RegularResponse, SubSystem.Power, Commands.Power.GetBatteryLevel)
+                packet = self.request(SubSystem.Power, Commands.Power.GetBatteryLevel, response=True)
                 return packet.data.batteryLevel
             else:
                 self.device.getBatteryLevel()
@@ -68,97 +144,523 @@ class NeblinaCore(object):
     def sendCommand(self, subSystem, command, enable=True, **kwargs):
         if self.device:
             packet = NebCommandPacket(subSystem, command, enable, **kwargs)
+            self.telemetry.commandSent(subSystem, command)
             self.device.sendPacket(packet.stringEncode())
 
+    def sendCommands(self, packets):
+        """
+            Send command packets back-to-back, without waiting for their acknowledge.
+
+            :param packets: NebCommandPacket instances.
+        """
+        if self.device:
+            for packet in packets:
+                self.telemetry.commandSent(packet.header.subSystem, packet.header.command)
+            self.device.sendPackets([packet.stringEncode() for packet in packets])
+
     def setDelegate(self, delegate):
         self.delegate = delegate
+        # Bind the handlers once, rather than looking them up for every packet
+        handlers = {}
+        if delegate:
+            for key, name in DelegateHandlers.items():
+                handler = getattr(delegate, name, None)
+                if handler:
+                    handlers[key] = handler
+        self.handlers = handlers
 
-    def storePacketsUntil(self, packetType, subSystem, command):
-        packetList = []
-        packet = None
-        while not packet or \
-                (not packet.isPacketValid(packetType, subSystem, command) and
-                 not packet.isPacketError()):
-            try:
-                if packet and packet.header.subSystem != SubSystem.Debug:
-                    packetList.append(packet)
-                    print('Received {0} packets'.format(len(packetList)), end="\r", flush=True)
-                bytes = self.device.receivePacket()
-                if bytes:
-                    packet = NebResponsePacket(bytes)
-                else:
-                    packet = None
-            except NotImplementedError as e:
-                logging.error("Dropped bad packet.")
-                packet = None
-                continue
-            except InvalidPacketFormatError as e:
-                logging.error("InvalidPacketFormatError.")
-                packet = None
-                continue
-            except CRCError as e:
-                logging.error("CRCError : " + str(e))
-                packet = None
-                continue
-            except KeyError as e:
-                logging.error("Tried creating a packet with an invalid subsystem or command : " + str(e))
-                packet = None
-                continue
-            except TimeoutError as e:
-                logging.error('Read timed out.')
-                return None
-            except KeyboardInterrupt as e:
-                logging.error("KeyboardInterrupt.")
-                return None
-            except:
-                packet = None
-                logging.error("Unexpected error : ", exc_info=True)
-                continue
-        return packetList
+    def storePacketsUntil(self, packetType, subSystem, command, progress=printPacketCount):
+        """
+            Retrieve all the packets received until the given packet (excluded) or an error packet.
+            See iterPacketsUntil to process them without keeping them all.
+
+            :return: NebResponsePacket list, None if interrupted.
+        """
+        try:
+            return list(self.iterPacketsUntil(packetType, subSystem, command, progress))
+        except TimeoutError as e:
+            logging.error('Read timed out.')
+            return None
+        except KeyboardInterrupt as e:
+            logging.error("KeyboardInterrupt.")
+            return None
+
+    def iterPacketsUntil(self, packetType, subSystem, command, progress=None,
+                         progressInterval=ProgressInterval, progressCount=None):
+        """
+            Yield the packets as they are received, until the given packet
+            (excluded) or an error packet. The Debug packets are skipped.
 
-    def waitForAck(self, subSystem, command):
-        ackPacket = self.waitForPacket(PacketType.Ack, subSystem, command)
+            :param progress: Called with the number of packets yielded so far, throttled.
+            :param progressInterval: Minimum time (in seconds) between progress calls.
+            :param progressCount: If given, number of packets between progress calls instead.
+        """
+        packetCount = 0
+        progressPacketCount = 0
+        progressTime = time.monotonic()
+        self.addPendingRequest(None)
+        try:
+            while True:
+                try:
+                    packet = self.receivePacket()
+                except (TimeoutError, KeyboardInterrupt):
+                    raise
+                except:
+                    logging.error("Unexpected error : ", exc_info=True)
+                    continue
+                if not packet:
+                    continue
+                if packet.isPacketValid(packetType, subSystem, command) or packet.isPacketError():
+                    break
+                if packet.header.subSystem == SubSystem.Debug:
+                    continue
+
+                packetCount += 1
+                yield packet
+
+                if progress:
+                    if progressCount:
+                        update = packetCount - progressPacketCount >= progressCount
+                    else:
+                        update = time.monotonic() - progressTime >= progressInterval
+                    if update:
+                        progressPacketCount = packetCount
+                        progressTime = time.monotonic()
+                        progress(packetCount)
+        finally:
+            self.removePendingRequest(None)
+        if progress and packetCount != progressPacketCount:
+            progress(packetCount)
+
+    def waitForAck(self, subSystem, command, timeout=3):
+        ackPacket = self.waitForPacket(PacketType.Ack, subSystem, command, timeout)
         return ackPacket
 
+    def waitForAcks(self, commands, timeout=3):
+        """
+            Wait for the acknowledge of several commands, in any arrival order.
+            The acknowledges received early are queued until their turn.
+
+            :param commands: (subSystem, command) tuples.
+            :param timeout: Maximum time to wait (in seconds) for all of them.
+            :return: Acknowledge packets, in the order of commands. None for a timed out one.
+        """
+        endTime = time.monotonic() + timeout
+        ackPackets = []
+        for subSystem, command in commands:
+            try:
+                ackPackets.append(self.waitForAck(subSystem, command, endTime - time.monotonic()))
+            except TimeoutError:
+                logging.warning("No acknowledge for subsystem {0} command {1}".format(subSystem, command))
+                ackPackets.append(None)
+        return ackPackets
+
     def waitForPacket(self, packetType, subSystem, command, timeout=3):
-        packet = None
-        currentTime = time.time()
-        while not packet or \
-                (not packet.isPacketValid(packetType, subSystem, command) and
-                 not packet.isPacketError()):
-            if time.time() - currentTime > timeout:
-                raise TimeoutError
+        """
+            Wait for a given packet, or the error packet of the same command.
+            The other packets received meanwhile are handed to the delegate or
+            queued for later, never discarded.
+
+            :raise TimeoutError: Nothing received within timeout (in seconds).
+        """
+        keys = ((packetType, subSystem, command), (PacketType.ErrorLogResp, subSystem, command))
+        endTime = time.monotonic() + timeout
+        self.addPendingRequest(keys[0])
+        try:
+            while True:
+                with self.packetCondition:
+                    packet = self.popPacket(keys)
+                    if packet:
+                        return packet
+                    remainingTime = endTime - time.monotonic()
+                    if remainingTime <= 0:
+                        raise TimeoutError
+                    if self.isReceiving():
+                        self.packetCondition.wait(remainingTime)
+                        continue
+
+                packet = self.readPacket(remainingTime)
+                if packet:
+                    self.dispatchPacket(packet)
+        finally:
+            self.removePendingRequest(keys[0])
+
+    def setRetryPolicy(self, subSystem, command, policy):
+        """
+            :param policy: RetryPolicy of the command, None to use defaultRetryPolicy.
+        """
+        if policy is None:
+            self.retryPolicies.pop((subSystem, command), None)
+        else:
+            self.retryPolicies[(subSystem, command)] = policy
+
+    def getRetryPolicy(self, subSystem, command):
+        return self.retryPolicies.get((subSystem, command), self.defaultRetryPolicy)
 
+    def execute(self, subSystem, command, enable=True, ack=True, response=False, policy=None, **kwargs):
+        """
+            Send a command and wait for its acknowledge and/or response, resending it
+            on a timeout as its RetryPolicy allows. An error response is final.
+            The commands in NonIdempotentCommands are never resent, the result of a
+            timeout is then marked ambiguous.
+
+            :param ack: True, to wait for the acknowledge packet.
+            :param response: True, to wait for the regular response packet.
+            :param policy: RetryPolicy to use instead of the one of the command.
+            :return: NebCommandResult instance.
+        """
+        if policy is None:
+            policy = self.getRetryPolicy(subSystem, command)
+        idempotent = (subSystem, command) not in NonIdempotentCommands
+        keys = [(PacketType.ErrorLogResp, subSystem, command)]
+        if ack:
+            keys.append((PacketType.Ack, subSystem, command))
+        if response:
+            keys.append((PacketType.RegularResponse, subSystem, command))
+        result = NebCommandResult(subSystem, command)
+        startTime = time.monotonic()
+        while True:
+            # Late answers to a previous attempt would be taken for answers to this one
+            self.discardPackets(keys)
+            result.attempts += 1
+            self.sendCommand(subSystem, command, enable, **kwargs)
             try:
-                bytes = self.device.receivePacket()
-                if bytes:
-                    packet = NebResponsePacket(bytes)
-                else:
-                    packet = None
-            except NotImplementedError as e:
-                logging.error("Dropped bad packet.")
-                packet = None
-                continue
-            except InvalidPacketFormatError as e:
-                logging.error("InvalidPacketFormatError")
-                packet = None
-                continue
-            except CRCError as e:
-                logging.error("CRCError : " + str(e))
                 packet = None
+                if ack:
+                    packet = self.waitForAck(subSystem, command, policy.timeout)
+                if response and (packet is None or packet.header.packetType != PacketType.ErrorLogResp):
+                    packet = self.waitForPacket(PacketType.RegularResponse, subSystem, command, policy.timeout)
+            except TimeoutError:
+                if not idempotent:
+                    result.ambiguous = True
+                    logging.error('Subsystem {0} command {1} timed out, not resent'.format(subSystem, command))
+                    break
+                if result.attempts > policy.retries:
+                    logging.error('Subsystem {0} command {1} timed out after {2} attempt(s)'
+                                  .format(subSystem, command, result.attempts))
+                    break
+                delay = policy.getDelay(result.attempts)
+                logging.warning('Subsystem {0} command {1} timed out, retrying in {2:.3f}s'
+                                .format(subSystem, command, delay))
+                time.sleep(delay)
                 continue
-            except KeyError as e:
-                logging.error("Tried creating a packet with an invalid subsystem or command : " + str(e))
-                packet = None
-                continue
-            except TimeoutError as e:
-                logging.error('Read timed out.')
-                return NebResponsePacket.createEmptyResponsePacket(subSystem, command)
-            except KeyboardInterrupt as e:
-                logging.error("KeyboardInterrupt.")
-                return NebResponsePacket.createEmptyResponsePacket(subSystem, command)
+            result.packet = packet
+            if packet.header.packetType == PacketType.ErrorLogResp:
+                result.status = CommandStatus.ErrorResponse
+            else:
+                result.status = CommandStatus.Success
+            break
+        result.elapsed = time.monotonic() - startTime
+        return result
+
+    def request(self, subSystem, command, enable=True, ack=True, response=False, policy=None, **kwargs):
+        """
+            Same as execute, raising on failure.
+
+            :return: Response packet if requested, acknowledge packet otherwise.
+            :raise CommandTimeoutError: No acknowledge or response, even after the retries.
+            :raise CommandError: The device answered with an error packet.
+        """
+        result = self.execute(subSystem, command, enable, ack, response, policy, **kwargs)
+        if result.status == CommandStatus.Timeout:
+            raise CommandTimeoutError(result)
+        if result.status != CommandStatus.Success:
+            raise CommandError(result)
+        return result.packet
+
+    def discardPackets(self, keys):
+        """
+            Drop the queued packets of the keys ((packetType, subSystem, command) tuples).
+        """
+        with self.packetCondition:
+            for key in keys:
+                packetQueue = self.packetQueues.get(key)
+                if packetQueue:
+                    packetQueue.clear()
+                    self.packetCondition.notify_all()
+
+    def addPendingRequest(self, key):
+        with self.packetCondition:
+            self.pendingRequests[key] += 1
+
+    def removePendingRequest(self, key):
+        with self.packetCondition:
+            self.pendingRequests[key] -= 1
+            if self.pendingRequests[key] <= 0:
+                del self.pendingRequests[key]
+
+    def popPacket(self, keys=None):
+        """
+            Remove the oldest queued packet matching one of the keys.
+            Must be called with packetCondition held.
+
+            :param keys: (packetType, subSystem, command) tuples, None for any packet.
+            :return: NebResponsePacket instance, or None.
+        """
+        oldestQueue = None
+        for key, packetQueue in self.packetQueues.items():
+            if packetQueue and (keys is None or key in keys):
+                if oldestQueue is None or packetQueue.peek()[0] < oldestQueue.peek()[0]:
+                    oldestQueue = packetQueue
+        if oldestQueue is None:
+            return None
+        if oldestQueue.overflow == Overflow.Block:
+            # Room for a waiter reading the device
+            self.packetCondition.notify_all()
+        return oldestQueue.pop()[1]
+
+    def setPacketBuffer(self, subSystem, command, capacity=PacketQueueSize, overflow=Overflow.DropOldest,
+                        packetType=PacketType.RegularResponse):
+        """
+            Configure the buffer of a packet type/subsystem/command, e.g. of a motion stream.
+
+            :param capacity: Maximum number of packets kept.
+            :param overflow: Overflow policy when full, see Overflow.
+            :return: NebPacketBuffer instance, for its overflowCount and highWaterMark.
+        """
+        with self.packetCondition:
+            key = (packetType, subSystem, command)
+            packetQueue = self.packetQueues.get(key)
+            if packetQueue is None:
+                packetQueue = self.packetQueues[key] = NebPacketBuffer(capacity, overflow)
+            else:
+                packetQueue.resize(capacity, overflow)
+            self.packetCondition.notify_all()
+            return packetQueue
+
+    def getPacketBuffer(self, subSystem, command, packetType=PacketType.RegularResponse):
+        """
+            :return: NebPacketBuffer instance, None if no such packet was buffered yet.
+        """
+        return self.packetQueues.get((packetType, subSystem, command))
+
+    def readPacket(self, timeout=None):
+        """
+            Read and decode one packet from the device, waiting for it up to timeout
+            (in seconds, None to wait forever).
+
+            :return: NebResponsePacket instance, or None if nothing valid was read.
+        """
+        bytes = self.device.receivePacket(timeout)
+        if not bytes:
+            return None
+        return self.decodePacket(bytes)
+
+    def decodePacket(self, bytes):
+        """
+            Decode one packet read from the device.
+
+            :return: NebResponsePacket instance, or None if it is not valid.
+        """
+        telemetry = self.telemetry
+        telemetry.frameCount += 1
+        telemetry.byteCount += len(bytes)
+        try:
+            packet = NebResponsePacket.fromString(bytes, lazy=True)
+            if packet is None:
+                # Unknown subsystem/command, dropped without decoding
+                telemetry.unknownPacketCount += 1
+                return None
+            header = packet.header
+            telemetry.packetCounts[(header.packetType, header.subSystem, header.command)] += 1
+            if bytes[0] == MotionCtrlByte and len(bytes) >= 8:
+                # Past the CRC check, a corrupted timestamp cannot poison the tracking
+                packet.deviceTimestamp, packet.hostTimestamp = self.trackTimestamp(bytes)
+            return packet
+        except NotImplementedError as e:
+            telemetry.invalidPacketCount += 1
+            logging.error("Dropped bad packet.")
+        except InvalidPacketFormatError as e:
+            telemetry.invalidPacketCount += 1
+            logging.error("InvalidPacketFormatError")
+        except CRCError as e:
+            telemetry.crcErrorCount += 1
+            logging.error("CRCError : " + str(e))
+        return None
+
+    def trackFrame(self, bytes):
+        """
+            Account for a motion packet decoded elsewhere (e.g. by NebDecodePool):
+            telemetry counters, and timestamp tracking if its CRC is valid. The CRC
+            errors are left to the decoder to count.
+        """
+        telemetry = self.telemetry
+        telemetry.frameCount += 1
+        telemetry.byteCount += len(bytes)
+        if len(bytes) >= 8 and bytes[0] == MotionCtrlByte and NebUtilities.genNebCRC8(bytes) == bytes[2]:
+            telemetry.packetCounts[(PacketType.RegularResponse, SubSystem.Motion, bytes[3])] += 1
+            self.trackTimestamp(bytes)
+
+    def trackTimestamp(self, bytes):
+        """
+            Unwrap the timestamp of a valid motion packet, and feed the loss
+            detection and clock synchronization with it.
+
+            :return: (64-bit device timestamp, host time estimate) of the packet.
+        """
+        # The timestamp is read from the raw bytes to keep the decoding lazy
+        timestamp = TimestampStruct.unpack_from(bytes, 4)[0]
+        command = bytes[3]
+        unwrapper = self.timestampUnwrappers.get(command)
+        if unwrapper is None:
+            unwrapper = self.timestampUnwrappers[command] = NebTimestampUnwrapper()
+        deviceTimestamp = unwrapper.unwrap(timestamp)
+        if self.playback:
+            return deviceTimestamp, None
+        if command in PeriodicStreams:
+            lossDetector = self.lossDetectors.get(command)
+            if lossDetector is None:
+                lossDetector = self.lossDetectors[command] = NebLossDetector(self.streamPeriod)
+            lossDetector.update(deviceTimestamp)
+        self.clockSync.update(timestamp)
+        return deviceTimestamp, self.clockSync.toHostTime(timestamp)
+
+    def setStreamPeriod(self, period):
+        """
+            Set the expected interval between the samples of the periodic streams,
+            for the loss detection. Restarts the detectors.
+
+            :param period: Interval (in microseconds), None to estimate it from the timestamps.
+        """
+        self.streamPeriod = period
+        for lossDetector in list(self.lossDetectors.values()):
+            lossDetector.setPeriod(period)
+
+    def getSampleLoss(self):
+        """
+            :return: NebLossDetector statistics by Commands.Motion streaming command.
+        """
+        return {command: lossDetector.getStatistics() for command, lossDetector in list(self.lossDetectors.items())}
+
+    def setPlayback(self, state):
+        """
+            While recorded packets are played back, their timestamps are unwrapped
+            on their own and kept out of the clock synchronization.
+        """
+        if state and not self.playback:
+            self.liveTimestampUnwrappers = self.timestampUnwrappers
+            self.timestampUnwrappers = {}
+        elif not state and self.playback:
+            self.timestampUnwrappers = self.liveTimestampUnwrappers
+            self.liveTimestampUnwrappers = None
+        self.playback = state
+
+    def resetTimestamps(self, hostTime=None):
+        """
+            Restart the timestamp unwrapping and the clock synchronization, for
+            timestamps restarting from 0 (resetTimestamp, session playback).
+
+            :param hostTime: Host time at which the device timestamp was 0, if known.
+        """
+        self.timestampUnwrappers = {}
+        self.lossDetectors = {}
+        self.clockSync.reset(hostTime)
+
+    def getTelemetry(self):
+        """
+            Snapshot the link-quality and throughput counters, without blocking the receive path.
+
+            :return: NebTelemetrySnapshot instance.
+        """
+        snapshot = self.telemetry.snapshot()
+        snapshot.droppedPacketCount = self.droppedPacketCount
+        snapshot.sampleLoss = self.getSampleLoss()
+        # The receive thread may add buffers meanwhile, list() copies atomically
+        snapshot.queueDepths = {key: len(packetQueue) for key, packetQueue in list(self.packetQueues.items())}
+        communication = getattr(self.device, 'communication', None)
+        comslip = getattr(communication, 'comslip', None)
+        if comslip:
+            decoder = comslip.decoder
+            snapshot.slip = {'frameCount': decoder.frameCount, 'oversizeCount': decoder.oversizeCount,
+                             'protocolErrorCount': decoder.protocolErrorCount, 'resyncCount': decoder.resyncCount}
+        return snapshot
+
+    def receivePacket(self, timeout=PacketQueueTimeout):
+        """
+            Retrieve the oldest packet that was not handed to the delegate.
+            Reads the device directly if nothing is queued, unless the receive
+            thread is running.
+
+            :param timeout: Maximum time to wait (in seconds) for a packet.
+            :return: NebResponsePacket instance, or None.
+        """
+        with self.packetCondition:
+            packet = self.popPacket()
+            if packet:
+                return packet
+            if self.isReceiving():
+                self.packetCondition.wait(max(timeout, 0))
+                return self.popPacket()
+        return self.readPacket(timeout)
+
+    def startReceiving(self):
+        """
+            Start the background receive thread. Streaming packets are then
+            dispatched to the delegate handlers as they arrive, and every other
+            packet is kept for waitForPacket/storePacketsUntil.
+        """
+        if self.isReceiving():
+            return
+        self.receiveStop.clear()
+        self.receiveThread = threading.Thread(target=self.receiveLoop, name='NeblinaReceive')
+        self.receiveThread.daemon = True
+        self.receiveThread.start()
+
+    def stopReceiving(self):
+        """
+            Stop the background receive thread.
+        """
+        thread = self.receiveThread
+        if thread:
+            self.receiveStop.set()
+            if thread is not threading.current_thread():
+                thread.join()
+            self.receiveThread = None
+
+    def isReceiving(self):
+        return self.receiveThread is not None or self.receiver is not None
+
+    def receiveLoop(self):
+        while not self.receiveStop.is_set() and self.isOpened():
+            try:
+                packet = self.readPacket(ReceiveLoopTimeout)
+            except KeyboardInterrupt:
+                break
             except:
-                packet = None
                 logging.error("Unexpected error : ", exc_info=True)
-                return NebResponsePacket.createEmptyResponsePacket(subSystem, command)
-        return packet
+                continue
+            if packet:
+                self.dispatchPacket(packet)
+
+    def dispatchPacket(self, packet):
+        """
+            Hand a streaming packet to its delegate handler, unless somebody
+            is waiting for it. Otherwise, queue it.
+        """
+        header = packet.header
+        key = (header.packetType, header.subSystem, header.command)
+        if header.packetType == PacketType.Ack:
+            self.telemetry.ackReceived(header.subSystem, header.command)
+        elif header.packetType == PacketType.RegularResponse \
+                and key not in self.pendingRequests and None not in self.pendingRequests:
+            handler = self.handlers.get(key[1:])
+            if handler:
+                try:
+                    handler(packet.data)
+                except:
+                    logging.error("Delegate handler error : ", exc_info=True)
+                return
+
+        with self.packetCondition:
+            packetQueue = self.packetQueues.get(key)
+            if packetQueue is None:
+                packetQueue = self.packetQueues[key] = NebPacketBuffer(self.packetQueueSize, self.packetOverflow)
+            if packetQueue.overflow == Overflow.Block and packetQueue.isFull() and not self.isReceiving():
+                # Waiter reading the device itself, only its thread waits for another consumer.
+                # The receive thread (or fleet) is shared by every stream and drops the newest instead.
+                self.packetCondition.wait_for(lambda: not packetQueue.isFull(), self.packetBlockTimeout)
+            self.packetSequence += 1
+            overflowCount = packetQueue.overflowCount
+            packetQueue.push((self.packetSequence, packet))
+            self.droppedPacketCount += packetQueue.overflowCount - overflowCount
+            self.packetCondition.notify_all()
@@ -36,7 +36,7 @@ from neblinaUtilities import NebUtilities as nebUtilities
 
 class AckData(object):
 
-    def __init__(self):
+    def __init__(self, dataString=None, offset=0):
         pass
 
     def __str__(self):
@@ -50,9 +50,9 @@ class BlankData(object):
     """ This object is for packet data
         containing no meaningful info in it.
     """
-    def __init__(self, dataString):
-        if len(dataString) > 0:
-            self.blankBytes = struct.unpack(Formatting.Data.Blank, dataString)
+    def __init__(self, dataString, offset=0):
+        if len(dataString) > offset:
+            self.blankBytes = Formatting.Struct.Data.Blank.unpack_from(dataString, offset)
         else:
             self.blankBytes = ('\000'*16).encode('utf-8')
 
@@ -61,7 +61,7 @@ class BlankData(object):
 
     def encode(self):
         garbage = ('\000'*16).encode('utf-8')
-        return struct.pack(Formatting.Data.Blank, garbage)
+        return Formatting.Struct.Data.Blank.pack(garbage)
 
 ###################################################################################
 
@@ -118,14 +118,14 @@ class MotAndFlashRecStateData(object):
         2:"Playback",
     }
 
-    def __init__(self, dataString):
+    def __init__(self, dataString, offset=0):
         self.motionStatus = MotionStatusData()
         self.recorderStatus = RecorderStatusData()
 
         self.timestamp, \
         motionEngineStatusBytes,\
         self.recorderStatus.status,\
-        garbage = struct.unpack(Formatting.Data.MotionAndFlash, dataString)
+        garbage = Formatting.Struct.Data.MotionAndFlash.unpack_from(dataString, offset)
 
         # Extract motion engine state
         self.motionStatus = MotionStatusData()
@@ -153,10 +153,10 @@ class EEPROMReadData(object):
         - Page number
         - 8 bytes R/W data
     """
-    def __init__(self, dataString):
+    def __init__(self, dataString, offset=0):
         self.pageNumber, \
         self.dataBytes,\
-        garbage = struct.unpack(Formatting.Data.EEPROMRead, dataString)
+        garbage = Formatting.Struct.Data.EEPROMRead.unpack_from(dataString, offset)
 
     def __str__(self):
         return "Page# {0} Data Bytes:{1} ".format(self.pageNumber, self.dataBytes)
@@ -172,11 +172,11 @@ class LEDGetValData(object):
         - LED Index (one for each LEDs)
         - LED Value (one for each LEDs)
     """
-    def __init__(self, dataString):
+    def __init__(self, dataString, offset=0):
         self.ledState = [0]*8
         self.ledState[0], self.ledState[1], self.ledState[2], \
         self.ledState[3], self.ledState[4], self.ledState[5], self.ledState[6], \
-        self.ledState[7] = struct.unpack(Formatting.Data.LEDGetVal, dataString)
+        self.ledState[7] = Formatting.Struct.Data.LEDGetVal.unpack_from(dataString, offset)
 
     def __str__(self):
         return "LED Values: {0}".format(self.ledState)
@@ -190,11 +190,11 @@ class BatteryLevelData(object):
         Formatting:
         - Battery level (%)
     """
-    def __init__(self, dataString):
+    def __init__(self, dataString, offset=0):
         # timestamp = 0
         timestamp, \
         self.batteryLevel,\
-        garbage = struct.unpack(Formatting.Data.BatteryLevel, dataString)
+        garbage = Formatting.Struct.Data.BatteryLevel.unpack_from(dataString, offset)
         self.batteryLevel = self.batteryLevel/10
 
     def __str__(self):
@@ -209,11 +209,11 @@ class TemperatureData(object):
         Formatting:
         - Temperature in Celsius (x100)
     """
-    def __init__(self, dataString):
+    def __init__(self, dataString, offset=0):
         # timestamp = 0
         self.timestamp, \
         self.temperature,\
-        garbage = struct.unpack(Formatting.Data.Temperature, dataString)
+        garbage = Formatting.Struct.Data.Temperature.unpack_from(dataString, offset)
         self.temperature = self.temperature/100
 
     def __str__(self):
@@ -221,7 +221,7 @@ class TemperatureData(object):
 
     def encode(self):
         garbage = ('\000'*10).encode('utf-8')
-        packetString = struct.pack(Formatting.Data.Temperature, self.timestamp,\
+        packetString = Formatting.Struct.Data.Temperature.pack(self.timestamp,\
         self.temperature, garbage)
         return packetString('utf-8')
 
@@ -236,11 +236,11 @@ class FlashSessionData(object):
         - Open/Close
         - Session ID
     """
-    def __init__(self, dataString):
+    def __init__(self, dataString, offset=0):
         timestamp,\
         openCloseByte,\
         self.sessionID,\
-        garbage = struct.unpack(Formatting.CommandData.FlashSession, dataString)
+        garbage = Formatting.Struct.CommandData.FlashSession.unpack_from(dataString, offset)
         # open = True, close = False
         self.openClose = (openCloseByte == 1)
 
@@ -259,10 +259,10 @@ class FlashSessionInfoData(object):
         - Timestamp
         - Session ID
     """
-    def __init__(self, dataString):
+    def __init__(self, dataString, offset=0):
         self.sessionLengthBytes,\
         self.sessionID,\
-        garbage = struct.unpack(Formatting.CommandData.FlashSessionInfo, dataString)
+        garbage = Formatting.Struct.CommandData.FlashSessionInfo.unpack_from(dataString, offset)
         if self.sessionLengthBytes > 0:
             self.sessionLength = self.sessionLengthBytes / 18
         else:
@@ -282,10 +282,10 @@ class FlashNumSessionsData(object):
         - Reserved
         - Number of sessions
     """
-    def __init__(self, dataString):
+    def __init__(self, dataString, offset=0):
         reserved,\
         self.numSessions,\
-        garbage = struct.unpack(Formatting.Data.FlashNumSessions, dataString)
+        garbage = Formatting.Struct.Data.FlashNumSessions.unpack_from(dataString, offset)
 
     def __str__(self):
         return "Number of sessions: {0}"\
@@ -320,19 +320,19 @@ class FirmwareVersionsData(object):
         return string
 
     @classmethod
-    def decode(cls, dataString):
+    def decode(cls, dataString, offset=0):
         mcuFWVersion = [0]*3
         bleFWVersion = [0]*3
 
         apiRelease,\
         mcuFWVersion[0], mcuFWVersion[1], mcuFWVersion[2],\
         bleFWVersion[0], bleFWVersion[1], bleFWVersion[2],\
-        deviceID = struct.unpack(Formatting.Data.FWVersions, dataString)
+        deviceID = Formatting.Struct.Data.FWVersions.unpack_from(dataString, offset)
 
         return cls(deviceID, apiRelease, mcuFWVersion, bleFWVersion)
 
     def encode(self):
-        packetString = struct.pack(Formatting.Data.FWVersions, self.apiRelease, \
+        packetString = Formatting.Struct.Data.FWVersions.pack(self.apiRelease, \
             self.mcuFWVersion[0], self.mcuFWVersion[1], self.mcuFWVersion[2],\
             self.bleFWVersion[0], self.bleFWVersion[1], self.bleFWVersion[2], self.deviceID)
         return packetString
@@ -371,7 +371,7 @@ class UnitTestMotionData(object):
         2: "Starts Moving",
     }
 
-    def __init__(self, dataString):
+    def __init__(self, dataString, offset=0):
         self.accel = [0]*3
         self.gyro = [0]*3
         self.mag = [0]*3
@@ -395,7 +395,7 @@ class UnitTestMotionData(object):
         self.timestamp, self.stepCount,\
         self.walkingDirection,\
         self.sitStand, self.sitTime, self.standTime,\
-        = struct.unpack(Formatting.Data.UnitTestMotion, dataString)
+        = Formatting.Struct.Data.UnitTestMotion.unpack_from(dataString, offset)
 
     def __str__(self):
         return "Motion: {0} \n\
@@ -432,7 +432,7 @@ class UnitTestMotionData(object):
             self.sitStand, self.sitTime, self.standTime)
 
     def encode(self):
-        packetBytes = struct.pack(Formatting.Data.UnitTestMotion,\
+        packetBytes = Formatting.Struct.Data.UnitTestMotion.pack(\
             self.startStop,\
             self.accel[0], self.accel[1], self.accel[2],\
             self.gyro[0], self.gyro[1], self.gyro[2],\
@@ -462,10 +462,12 @@ class MotionStateData(object):
         - Timestamp
         - Start/Stop
     """
-    def __init__(self, dataString):
+    __slots__ = ('timestamp', 'startStop')
+
+    def __init__(self, dataString, offset=0):
         self.timestamp,\
         startStopByte,\
-        garbage = struct.unpack(Formatting.Data.MotionState, dataString)
+        garbage = Formatting.Struct.Data.MotionState.unpack_from(dataString, offset)
         self.startStop = (startStopByte == 0)
 
     def __str__(self):
@@ -474,7 +476,7 @@ class MotionStateData(object):
 
     def encode(self):
         garbage = ('\000'*11).encode('utf-8')
-        packetString = struct.pack(Formatting.Data.MotionState, self.timestamp,\
+        packetString = Formatting.Struct.Data.MotionState.pack(self.timestamp,\
         self.startStop, garbage)
         return packetString
 
@@ -489,13 +491,12 @@ class ExternalForceData(object):
         - Timestamp
         - External forces (x,y,z)
     """
-    def __init__(self, dataString):
-        self.externalForces = [0]*3
-        self.timestamp,\
-        self.externalForces[0],\
-        self.externalForces[1],\
-        self.externalForces[2],\
-        garbage = struct.unpack(Formatting.Data.ExternalForce, dataString)
+    __slots__ = ('timestamp', 'externalForces')
+
+    def __init__(self, dataString, offset=0):
+        values = Formatting.Struct.Data.ExternalForce.unpack_from(dataString, offset)
+        self.timestamp = values[0]
+        self.externalForces = values[1:4]
 
     def __str__(self):
         return "{0}us: externalForces(x,y,z):({1},{2},{3})"\
@@ -504,7 +505,7 @@ class ExternalForceData(object):
 
     def encode(self):
         garbage = ('\000'*6).encode('utf-8')
-        packetString = struct.pack(Formatting.Data.ExternalForce, self.timestamp,\
+        packetString = Formatting.Struct.Data.ExternalForce.pack(self.timestamp,\
         self.externalForces[0], self.externalForces[1], self.externalForces[2], garbage)
         return packetString
 
@@ -525,15 +526,14 @@ class TrajectoryDistanceData(object):
         - Repeat count
         - Completion percentage (%)
     """
-    def __init__(self, dataString):
-        self.eulerAngleErrors = [0]*3
-        self.timestamp,\
-        self.eulerAngleErrors[0],\
-        self.eulerAngleErrors[1],\
-        self.eulerAngleErrors[2],\
-        self.count,\
-        self.progress,\
-        garbage = struct.unpack(Formatting.Data.TrajectoryDistance, dataString)
+    __slots__ = ('timestamp', 'eulerAngleErrors', 'count', 'progress')
+
+    def __init__(self, dataString, offset=0):
+        values = Formatting.Struct.Data.TrajectoryDistance.unpack_from(dataString, offset)
+        self.timestamp = values[0]
+        self.eulerAngleErrors = values[1:4]
+        self.count = values[4]
+        self.progress = values[5]
 
     def __str__(self):
         return "{0}us: eulerAngleErrors(yaw,pitch,roll):({1},{2},{3}), count:{4}, progress:{5}%"\
@@ -542,7 +542,7 @@ class TrajectoryDistanceData(object):
 
     def encode(self):
         garbage = ('\000'*3).encode('utf-8')
-        packetString = struct.pack(Formatting.Data.TrajectoryDistance, self.timestamp,\
+        packetString = Formatting.Struct.Data.TrajectoryDistance.pack(self.timestamp,\
         self.eulerAngleErrors[0], self.eulerAngleErrors[1], self.eulerAngleErrors[2], self.count, self.progress, garbage)
         return packetString
 
@@ -559,16 +559,18 @@ class PedometerData(object):
         - Steps per minute
         - Walking direction
     """
-    def __init__(self, dataString):
+    __slots__ = ('timestamp', 'stepCount', 'stepsPerMinute', 'walkingDirection')
+
+    def __init__(self, dataString, offset=0):
         self.timestamp,self.stepCount,\
         self.stepsPerMinute,\
         self.walkingDirection,\
-        garbage = struct.unpack(Formatting.Data.Pedometer, dataString)
+        garbage = Formatting.Struct.Data.Pedometer.unpack_from(dataString, offset)
         self.walkingDirection /= 10.0
 
     def encode(self):
         garbage = ('\000'*7).encode('utf-8')
-        packetString = struct.pack(Formatting.Data.Pedometer, self.timestamp,\
+        packetString = Formatting.Struct.Data.Pedometer.pack(self.timestamp,\
         self.stepCount, self.stepsPerMinute, int(self.walkingDirection*10), garbage)
         return packetString
 
@@ -592,10 +594,11 @@ class FingerGestureData(object):
         - Timestamp
         - Rotation count
     """
+    __slots__ = ('timestamp', 'gesture')
 
-    def __init__(self, dataString):
+    def __init__(self, dataString, offset=0):
         self.timestamp,self.gesture,\
-        garbage = struct.unpack(Formatting.Data.FingerGesture, dataString)
+        garbage = Formatting.Struct.Data.FingerGesture.unpack_from(dataString, offset)
 
     def __str__(self):
         if self.gesture==0:
@@ -617,7 +620,7 @@ class FingerGestureData(object):
 
     def encode(self):
         garbage = ('\000'*11).encode('utf-8')
-        packetString = struct.pack(Formatting.Data.FingerGesture, self.timestamp,\
+        packetString = Formatting.Struct.Data.FingerGesture.pack(self.timestamp,\
         self.gesture, garbage)
         return packetString
 
@@ -632,10 +635,12 @@ class RotationData(object):
         - Rotation count
         - Speed (RPM)
     """
-    def __init__(self, dataString):
+    __slots__ = ('timestamp', 'rotationCount', 'rpm')
+
+    def __init__(self, dataString, offset=0):
         self.timestamp,self.rotationCount,\
         self.rpm,\
-        garbage = struct.unpack(Formatting.Data.RotationInfo, dataString)
+        garbage = Formatting.Struct.Data.RotationInfo.unpack_from(dataString, offset)
         self.rpm = self.rpm/10.0
 
     def __str__(self):
@@ -645,7 +650,7 @@ class RotationData(object):
 
     def encode(self):
         garbage = ('\000'*6).encode('utf-8')
-        packetString = struct.pack(Formatting.Data.RotationInfo, self.timestamp,\
+        packetString = Formatting.Struct.Data.RotationInfo.pack(self.timestamp,\
         self.rotationCount, int(self.rpm*10), garbage)
         return packetString
 
@@ -664,18 +669,16 @@ class QuaternionData(object):
         - Timestamp
         - Quaternion (quat1,quat2,quat3,quat4)
     """
-    def __init__(self, dataString):
-        self.quaternions = [0]*4
-        self.timestamp,\
-        self.quaternions[0],\
-        self.quaternions[1],\
-        self.quaternions[2],\
-        self.quaternions[3],\
-        garbage = struct.unpack(Formatting.Data.Quaternion, dataString)
+    __slots__ = ('timestamp', 'quaternions')
+
+    def __init__(self, dataString, offset=0):
+        values = Formatting.Struct.Data.Quaternion.unpack_from(dataString, offset)
+        self.timestamp = values[0]
+        self.quaternions = values[1:5]
 
     def encode(self):
         garbage = ('\000'*4).encode('utf-8')
-        packetString = struct.pack(Formatting.Data.Quaternion, self.timestamp,\
+        packetString = Formatting.Struct.Data.Quaternion.pack(self.timestamp,\
         self.quaternions[0], self.quaternions[1],\
         self.quaternions[2], self.quaternions[3], garbage)
         return packetString
@@ -701,19 +704,15 @@ class IMUData(object):
         - Accelerometer (x,y,z)
         - Gyroscope (x,y,z)
     """
+    __slots__ = ('timestamp', 'accel', 'gyro')
+
     def __init__(self, timestamp, accel, gyro):
-        self.accel = [0]*3
-        self.gyro = [0]*3
         assert len(accel)==3
         assert len(gyro)==3
 
         self.timestamp = timestamp
-        self.accel[0] = int(accel[0])
-        self.accel[1] = int(accel[1])
-        self.accel[2] = int(accel[2])
-        self.gyro[0] = int(gyro[0])
-        self.gyro[1] = int(gyro[1])
-        self.gyro[2] = int(gyro[2])
+        self.accel = (int(accel[0]), int(accel[1]), int(accel[2]))
+        self.gyro = (int(gyro[0]), int(gyro[1]), int(gyro[2]))
 
     def __str__(self):
         return "{0}us: accelxyz:({1},{2},{3}) gyroxyz:({4},{5},{6})"\
@@ -722,20 +721,18 @@ class IMUData(object):
                 self.gyro[0], self.gyro[1], self.gyro[2])
 
     @classmethod
-    def decode(cls, dataString):
-        accel = [0]*3
-        gyro = [0]*3
-
-        timestamp, \
-        accel[0], accel[1], accel[2],\
-        gyro[0], gyro[1], gyro[2] \
-        = struct.unpack(Formatting.Data.IMU, dataString)
-
-        return cls(timestamp, accel, gyro)
+    def decode(cls, dataString, offset=0):
+        values = Formatting.Struct.Data.IMU.unpack_from(dataString, offset)
+        # The unpacked values are already ints, skip the checks of the constructor
+        data = cls.__new__(cls)
+        data.timestamp = values[0]
+        data.accel = values[1:4]
+        data.gyro = values[4:7]
+        return data
 
 
     def encode(self):
-        packetString = struct.pack(Formatting.Data.IMU,\
+        packetString = Formatting.Struct.Data.IMU.pack(\
             self.timestamp, self.accel[0], self.accel[1], self.accel[2],\
             self.gyro[0], self.gyro[1], self.gyro[2])
         return packetString
@@ -755,19 +752,15 @@ class MAGData(object):
         - Magnetometer (x,y,z)
         - Accelerometer (x,y,z)
     """
+    __slots__ = ('timestamp', 'mag', 'accel')
+
     def __init__(self, timestamp, mag, accel):
-        self.mag = [0]*3
-        self.accel = [0]*3
         assert len(mag) == 3
         assert len(accel) == 3
 
         self.timestamp = timestamp
-        self.mag[0] = int(mag[0])
-        self.mag[1] = int(mag[1])
-        self.mag[2] = int(mag[2])
-        self.accel[0] = int(accel[0])
-        self.accel[1] = int(accel[1])
-        self.accel[2] = int(accel[2])
+        self.mag = (int(mag[0]), int(mag[1]), int(mag[2]))
+        self.accel = (int(accel[0]), int(accel[1]), int(accel[2]))
 
     def __str__(self):
         return "{0}us: accelxyz:({1},{2},{3}) magxyz:({4},{5},{6})"\
@@ -776,19 +769,17 @@ class MAGData(object):
                 self.mag[0], self.mag[1], self.mag[2])
 
     @classmethod
-    def decode(cls, dataString):
-        mag = [0]*3
-        accel = [0]*3
-
-        timestamp, \
-        mag[0], mag[1], mag[2],\
-        accel[0], accel[1], accel[2] \
-        = struct.unpack(Formatting.Data.MAG, dataString)
-
-        return cls(timestamp, mag, accel)
+    def decode(cls, dataString, offset=0):
+        values = Formatting.Struct.Data.MAG.unpack_from(dataString, offset)
+        # The unpacked values are already ints, skip the checks of the constructor
+        data = cls.__new__(cls)
+        data.timestamp = values[0]
+        data.mag = values[1:4]
+        data.accel = values[4:7]
+        return data
 
     def encode(self):
-        packetString = struct.pack(Formatting.Data.MAG, \
+        packetString = Formatting.Struct.Data.MAG.pack(\
             self.timestamp, self.mag[0], self.mag[1], self.mag[2],\
             self.accel[0], self.accel[1], self.accel[2])
         return packetString
@@ -808,9 +799,11 @@ class EulerAngleData(object):
         - Timestamp
         - Euler angle (yaw,pitch,roll,heading)
     """
-    def __init__(self, dataString):
+    __slots__ = ('timestamp', 'yaw', 'pitch', 'roll', 'demoHeading')
+
+    def __init__(self, dataString, offset=0):
         self.timestamp, self.yaw, self.pitch, self.roll, self.demoHeading,\
-            garbage = struct.unpack(Formatting.Data.Euler, dataString)
+            garbage = Formatting.Struct.Data.Euler.unpack_from(dataString, offset)
         self.yaw = self.yaw/10.0
         self.pitch = self.pitch/10.0
         self.roll = self.roll/10.0
@@ -818,7 +811,7 @@ class EulerAngleData(object):
 
     def encode(self):
         garbage = ('\000'*4).encode('utf-8')
-        packetString = struct.pack(Formatting.Data.Euler, self.timestamp,\
+        packetString = Formatting.Struct.Data.Euler.pack(self.timestamp,\
             int(self.yaw*10), int(self.pitch*10), int(self.roll*10), int(self.demoHeading*10), garbage)
         return packetString
 
@@ -849,11 +842,11 @@ class DataPortStatusData(object):
             .format(self.portID, self.openClose)
 
     @classmethod
-    def decode(cls, dataString):
-        portID, openClose = struct.unpack(Formatting.CommandData.SetDataPortState, dataString)
+    def decode(cls, dataString, offset=0):
+        portID, openClose = Formatting.Struct.CommandData.SetDataPortState.unpack_from(dataString, offset)
         return cls(portID, openClose)
 
     def encode(self):
-        packetString = struct.pack(Formatting.CommandData.SetDataPortState, \
+        packetString = Formatting.Struct.CommandData.SetDataPortState.pack(\
                                    self.portID, self.openClose)
         return packetString
\ No newline at end of file
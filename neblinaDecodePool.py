@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+###################################################################################
+#
+# Copyright (c)     2010-2016   Motsai
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###################################################################################
+
+import collections
+import concurrent.futures
+import logging
+import threading
+import time
+
+from neblina import *
+import neblinaBatch
+from neblinaClock import NebTimestampUnwrapper
+
+import numpy as np
+
+###################################################################################
+
+# Frames sent to a worker process at once, to amortize the transfer between processes
+DecodeBatchSize = 512
+# Longest time (in seconds) a frame waits for its batch to fill up
+DecodeBatchLatency = 0.05
+
+MotionCtrlByte = (PacketType.RegularResponse << BitPosition.PacketType) | SubSystem.Motion
+
+
+def isBatchFrame(frame):
+    """
+        :return: True for a motion stream packet that neblinaBatch can decode.
+    """
+    return len(frame) == neblinaBatch.PacketLength and frame[0] == MotionCtrlByte \
+        and frame[3] in neblinaBatch.BatchDtypes
+
+###################################################################################
+
+
+class NebDecodedBatch(object):
+    """
+        Result of one decode job: the samples of each motion stream of a device,
+        as neblinaBatch structured arrays in arrival order.
+    """
+    __slots__ = ('deviceId', 'streams', 'timestamps', 'frameCount', 'crcErrorCount')
+
+    def __init__(self, deviceId, frameCount=0, crcErrorCount=0):
+        self.deviceId = deviceId
+        # Structured array by Commands.Motion streaming command
+        self.streams = {}
+        # 64-bit timestamps of each stream, filled in by NebDecodePool in arrival order
+        self.timestamps = {}
+        self.frameCount = frameCount
+        self.crcErrorCount = crcErrorCount
+
+
+def decodeFrames(deviceId, buffer):
+    """
+        Decode job, run in a worker process.
+
+        :param buffer: Concatenated motion stream packets (see isBatchFrame).
+        :return: NebDecodedBatch instance.
+    """
+    frames, lengthMask = neblinaBatch.stackFrames(buffer)
+    valid = neblinaBatch.validateCRCBatch(frames)
+    batch = NebDecodedBatch(deviceId, len(frames), len(frames) - int(valid.sum()))
+    frames = frames[valid]
+    for command in np.unique(frames[:, 3]):
+        command = int(command)
+        if command in neblinaBatch.BatchDtypes:
+            batch.streams[command] = neblinaBatch.decodeBatch(frames, command, validate=False)
+    return batch
+
+###################################################################################
+
+
+class NebDecodePool(object):
+    """
+        Optional decode stage for many devices on one host. The reader threads
+        only do the SLIP framing and push the motion stream packets; they are
+        sent in batches to a process pool which checks the CRCs and decodes
+        them with neblinaBatch, away from the GIL of the readers.
+
+            pool = NebDecodePool(handler)
+            pool.push('left', frame)     # from the reader thread
+            ...
+            pool.close()
+
+        handler(batch) receives the NebDecodedBatch of each device in the order
+        the packets were pushed, from the pool result thread.
+    """
+
+    def __init__(self, handler, workers=None, batchSize=DecodeBatchSize, latency=DecodeBatchLatency):
+        """
+            :param workers: Number of worker processes, the number of processors if None.
+            :param batchSize: Packets per decode job.
+            :param latency: Longest time (in seconds) a packet waits for its batch to fill up, see flushExpired.
+        """
+        self.handler = handler
+        self.executor = concurrent.futures.ProcessPoolExecutor(workers)
+        self.batchSize = batchSize
+        self.latency = latency
+        self.lock = threading.Lock()
+        # Handler calls are serialized, to keep each device in order
+        self.deliverLock = threading.Lock()
+        # (bytearray of frames, frame count, time of the first frame) by device
+        self.batches = {}
+        # Submitted jobs by device, in submission order
+        self.jobs = collections.defaultdict(collections.deque)
+        # NebTimestampUnwrapper by (deviceId, command)
+        self.timestampUnwrappers = collections.defaultdict(NebTimestampUnwrapper)
+        self.frameCount = 0
+        self.crcErrorCount = 0
+        self.jobCount = 0
+
+    def push(self, deviceId, frame):
+        """
+            Queue a packet for decoding, starting a job once batchSize packets are queued.
+
+            :param frame: Motion stream packet (see isBatchFrame).
+        """
+        with self.lock:
+            batch = self.batches.get(deviceId)
+            if batch is None:
+                batch = self.batches[deviceId] = [bytearray(), 0, time.monotonic()]
+            batch[0] += frame
+            batch[1] += 1
+            if batch[1] < self.batchSize:
+                return
+            del self.batches[deviceId]
+        self.submit(deviceId, batch[0])
+
+    def flush(self, maxAge=0):
+        """
+            Start a job for every batch older than maxAge (in seconds), even if not full.
+        """
+        now = time.monotonic()
+        with self.lock:
+            expired = [(deviceId, batch[0]) for deviceId, batch in self.batches.items() if now - batch[2] >= maxAge]
+            for deviceId, buffer in expired:
+                del self.batches[deviceId]
+        for deviceId, buffer in expired:
+            self.submit(deviceId, buffer)
+
+    def flushExpired(self):
+        """
+            Start a job for the batches waiting for longer than latency. Called
+            periodically by the reader, e.g. NeblinaFleet.
+        """
+        self.flush(self.latency)
+
+    def submit(self, deviceId, buffer):
+        future = self.executor.submit(decodeFrames, deviceId, bytes(buffer))
+        with self.lock:
+            self.jobs[deviceId].append(future)
+            self.jobCount += 1
+        future.add_done_callback(lambda future: self.deliver(deviceId))
+
+    def deliver(self, deviceId):
+        # A job may complete before the previous one of the same device, wait for it
+        with self.deliverLock:
+            while True:
+                with self.lock:
+                    jobs = self.jobs[deviceId]
+                    if not jobs or not jobs[0].done():
+                        return
+                    future = jobs.popleft()
+                try:
+                    batch = future.result()
+                except Exception:
+                    logging.error("Decode job error : ", exc_info=True)
+                    continue
+                self.frameCount += batch.frameCount
+                self.crcErrorCount += batch.crcErrorCount
+                for command, samples in batch.streams.items():
+                    batch.timestamps[command] = neblinaBatch.unwrapTimestamps(
+                        samples['timestamp'], self.timestampUnwrappers[(deviceId, command)])
+                try:
+                    self.handler(batch)
+                except Exception:
+                    logging.error("Decode handler error : ", exc_info=True)
+
+    def close(self):
+        """
+            Decode the packets still queued, then stop the worker processes.
+        """
+        self.flush()
+        self.executor.shutdown(wait=True)
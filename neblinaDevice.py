@@ -28,6 +28,7 @@
 import asyncio
 
 from neblina import *
+from neblinaCommunication import ReceivePollTimeout
 from neblinaUART import NeblinaUART
 
 bleSupported = True
@@ -60,13 +61,26 @@ class NeblinaDevice(object):
     def isConnected(self):
         return self.communication.isConnected()
 
-    def receivePacket(self):
+    def receivePacket(self, timeout=ReceivePollTimeout):
         if self.isConnected():
-            return self.communication.receivePacket()
+            return self.communication.receivePacket(timeout)
         else:
             return None
 
+    def fileno(self):
+        return self.communication.fileno()
+
+    def receiveAvailablePackets(self):
+        if self.isConnected():
+            return self.communication.receiveAvailablePackets()
+        else:
+            return []
+
     def sendPacket(self, packet):
         if self.isConnected():
             self.communication.sendPacket(packet)
 
+    def sendPackets(self, packets):
+        if self.isConnected():
+            self.communication.sendPackets(packets)
+
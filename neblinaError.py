@@ -41,4 +41,19 @@ class InvalidPacketFormatError(Exception):
     def __init__(self, error):
         self.errorString = error
     def __str__(self):
-        return self.errorString
\ No newline at end of file
+        return self.errorString
+
+###################################################################################
+
+class CommandError(Exception):
+    """Command failed, see result (NebCommandResult) for the details"""
+    def __init__(self, result):
+        self.result = result
+    def __str__(self):
+        return str(self.result)
+
+###################################################################################
+
+class CommandTimeoutError(CommandError, TimeoutError):
+    """Command not acknowledged or answered, even after its retries"""
+    pass
@@ -0,0 +1,430 @@
+#!/usr/bin/env python
+###################################################################################
+#
+# Copyright (c)     2010-2016   Motsai
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###################################################################################
+
+import collections
+import functools
+import logging
+import selectors
+import socket
+import threading
+import time
+
+from neblina import *
+from neblinaAPI import NeblinaAPI
+from neblinaCore import ReceiveLoopTimeout
+from neblinaDevice import NeblinaDevice
+
+decodePoolSupported = True
+try:
+    from neblinaDecodePool import isBatchFrame
+except ImportError:
+    decodePoolSupported = False
+
+###################################################################################
+
+
+class FleetDelegate(object):
+    """
+        Delegate of one device of a fleet. Hands the data to the fleet delegate,
+        tagged with the device identifier: handleIMU(deviceId, data) and so on.
+    """
+
+    def __init__(self, delegate, deviceId):
+        self.delegate = delegate
+        self.deviceId = deviceId
+
+    def __getattr__(self, name):
+        return functools.partial(getattr(self.delegate, name), self.deviceId)
+
+###################################################################################
+
+
+class FleetDevice(object):
+    """
+        NeblinaDevice of a fleet. The fleet thread reads it while commands are
+        written from other threads, so the accesses are serialized (bluepy
+        reads its write responses from the same pipe as the notifications).
+    """
+
+    def __init__(self, fleet, device):
+        self.fleet = fleet
+        self.device = device
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.device, name)
+
+    def receivePacket(self, timeout=None):
+        # The fleet thread is the only reader
+        return None
+
+    def receiveAvailablePackets(self):
+        with self.lock:
+            return self.device.receiveAvailablePackets()
+
+    def sendPacket(self, packet):
+        with self.lock:
+            self.device.sendPacket(packet)
+        # Packets received while waiting for the write response are not signalled by the file descriptor
+        self.fleet.wakeup()
+
+    def sendPackets(self, packets):
+        with self.lock:
+            self.device.sendPackets(packets)
+        self.fleet.wakeup()
+
+###################################################################################
+
+
+class NeblinaFleet(object):
+    """
+        Several Neblina, received by a single thread waiting on all of them at
+        once (epoll, kqueue or select, see selectors). Each device keeps its own
+        NeblinaAPI for the individual commands:
+
+            fleet = NeblinaFleet()
+            fleet.open('left', '/dev/ttyACM0')
+            fleet.open('right', 'F4:62:0B:4C:E6:11', Interface.BLE)
+            fleet.setDelegate(delegate)     # delegate.handleIMU(deviceId, data)
+            fleet.setDownsample(40)
+            fleet.streamIMU(True)
+            temperature = fleet['left'].getTemperature()
+
+        Streaming data is handed to the delegate from the fleet thread, or
+        decoded in batches by decodePool (see NebDecodePool).
+    """
+
+    def __init__(self, decodePool=None):
+        """
+            Constructor
+
+            :param decodePool: NebDecodePool instance receiving the motion stream packets
+                               nobody waits for, None to decode everything in the fleet thread.
+        """
+        assert decodePool is None or decodePoolSupported
+        # NeblinaAPI by device identifier
+        self.apis = collections.OrderedDict()
+        self.delegate = None
+        self.selector = selectors.DefaultSelector()
+        # Wakes up the fleet thread, e.g. for a device added or packets queued by bluepy
+        self.wakeupReader, self.wakeupWriter = socket.socketpair()
+        self.wakeupReader.setblocking(False)
+        self.wakeupWriter.setblocking(False)
+        self.selector.register(self.wakeupReader, selectors.EVENT_READ, None)
+        self.thread = None
+        self.stopEvent = threading.Event()
+        self.decodePool = decodePool
+
+    def __getitem__(self, deviceId):
+        return self.apis[deviceId]
+
+    def __len__(self):
+        return len(self.apis)
+
+    def deviceIds(self):
+        return list(self.apis)
+
+    def open(self, deviceId, address, interface=Interface.UART):
+        """
+            Open communication with a Neblina and add it to the fleet.
+
+            :param deviceId: Identifier of the device in the fleet, any hashable value.
+            :param address: UART port or BLE address of Neblina.
+            :param interface: Interface.UART or Interface.BLE.
+            :return: NeblinaAPI instance of the device.
+        """
+        device = NeblinaDevice(address, interface)
+        device.connect()
+        return self.addDevice(deviceId, device, interface)
+
+    def addDevice(self, deviceId, device, interface=Interface.UART):
+        """
+            Add a connected device to the fleet.
+
+            :param device: NeblinaDevice instance, or any object with fileno/receiveAvailablePackets.
+            :return: NeblinaAPI instance of the device.
+        """
+        assert deviceId not in self.apis
+        api = NeblinaAPI(interface)
+        api.core.device = FleetDevice(self, device)
+        api.core.receiver = self
+        if self.delegate:
+            api.core.setDelegate(FleetDelegate(self.delegate, deviceId))
+        self.apis[deviceId] = api
+        self.selector.register(device.fileno(), selectors.EVENT_READ, deviceId)
+        self.start()
+        self.wakeup()
+        return api
+
+    def removeDevice(self, deviceId):
+        """
+            Close communication with a Neblina and remove it from the fleet.
+        """
+        api = self.apis.pop(deviceId)
+        self.unregister(api)
+        api.close()
+
+    def close(self):
+        """
+            Close communication with every Neblina, and stop the fleet thread.
+        """
+        self.stop()
+        for deviceId in list(self.apis):
+            self.removeDevice(deviceId)
+
+    def setDelegate(self, delegate):
+        """
+            Set the delegate receiving the streaming data of every device.
+            Its handlers take the device identifier first, e.g. handleIMU(deviceId, data).
+
+            :param delegate: NeblinaDelegate-like instance.
+        """
+        self.delegate = delegate
+        for deviceId, api in self.apis.items():
+            api.core.setDelegate(FleetDelegate(delegate, deviceId) if delegate else None)
+
+    def start(self):
+        """
+            Start the fleet thread. Done when the first device is added.
+        """
+        if self.thread:
+            return
+        self.stopEvent.clear()
+        self.thread = threading.Thread(target=self.run, name='NeblinaFleet')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """
+            Stop the fleet thread.
+        """
+        thread = self.thread
+        if thread:
+            self.stopEvent.set()
+            self.wakeup()
+            if thread is not threading.current_thread():
+                thread.join()
+            self.thread = None
+
+    def isRunning(self):
+        return self.thread is not None
+
+    def wakeup(self):
+        try:
+            self.wakeupWriter.send(b'\0')
+        except BlockingIOError:
+            # Already pending
+            pass
+
+    def run(self):
+        timeout = self.decodePool.latency if self.decodePool else ReceiveLoopTimeout
+        while not self.stopEvent.is_set():
+            if self.decodePool:
+                self.decodePool.flushExpired()
+            for key, mask in self.selector.select(timeout):
+                if key.data is None:
+                    try:
+                        while self.wakeupReader.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    for deviceId in list(self.apis):
+                        self.receiveFrom(deviceId)
+                else:
+                    self.receiveFrom(key.data)
+
+    def receiveFrom(self, deviceId):
+        """
+            Dispatch the packets already received from a device, without waiting.
+        """
+        api = self.apis.get(deviceId)
+        if api is None:
+            return
+        core = api.core
+        try:
+            packets = core.device.receiveAvailablePackets()
+        except Exception:
+            # Most likely unplugged, stop waiting on it
+            logging.error("Device {0} read error : ".format(deviceId), exc_info=True)
+            self.unregister(api)
+            return
+        decodePool = self.decodePool
+        pendingRequests = core.pendingRequests
+        for bytes in packets:
+            if decodePool and isBatchFrame(bytes) and None not in pendingRequests \
+                    and (PacketType.RegularResponse, SubSystem.Motion, bytes[3]) not in pendingRequests:
+                # Nobody waits for it through the device API, leave the decoding to the pool
+                core.trackFrame(bytes)
+                decodePool.push(deviceId, bytes)
+                continue
+            packet = core.decodePacket(bytes)
+            if packet:
+                core.dispatchPacket(packet)
+
+    def unregister(self, api):
+        try:
+            self.selector.unregister(api.core.device.fileno())
+        except (KeyError, ValueError, OSError):
+            pass
+
+    def broadcast(self, subSystem, command, enable=True, timeout=3, deviceIds=None, **kwargs):
+        """
+            Send a command to every device, then collect their acknowledges.
+            The devices process it in parallel, the fleet takes about one
+            round-trip rather than one per device.
+
+            :param timeout: Maximum time to wait (in seconds) for all acknowledges.
+            :param deviceIds: Identifiers of the devices to reach, None for all of them.
+            :return: Acknowledge packet by device identifier, None for a missing acknowledge.
+        """
+        if deviceIds is None:
+            apis = list(self.apis.items())
+        else:
+            apis = [(deviceId, self.apis[deviceId]) for deviceId in deviceIds]
+        # Late answers to an earlier broadcast would be taken for answers to this one
+        keys = ((PacketType.Ack, subSystem, command), (PacketType.ErrorLogResp, subSystem, command))
+        for deviceId, api in apis:
+            # Not tracked by the state shadow
+            api.state.invalidateCommand(subSystem, command)
+            api.core.discardPackets(keys)
+            api.core.sendCommand(subSystem, command, enable, **kwargs)
+        endTime = time.monotonic() + timeout
+        ackPackets = collections.OrderedDict()
+        for deviceId, api in apis:
+            try:
+                ackPackets[deviceId] = api.core.waitForAck(subSystem, command, max(endTime - time.monotonic(), 0))
+            except TimeoutError:
+                logging.warning("No acknowledge from device {0} for subsystem {1} command {2}"
+                                .format(deviceId, subSystem, command))
+                ackPackets[deviceId] = None
+        return ackPackets
+
+    def broadcastSetting(self, subSystem, command, value, timeout=3):
+        """
+            Broadcast a configuration command to the devices not known to hold
+            value already, see NeblinaAPI.applySetting.
+
+            :param value: Value of the setting, sent as the enable flag.
+            :return: Acknowledge packet by device identifier, None for a missing acknowledge.
+                The devices already holding value are left out.
+        """
+        key = (subSystem, command)
+        deviceIds = []
+        for deviceId, api in self.apis.items():
+            if api.state.isApplied(key, value):
+                api.state.elidedCount += 1
+            else:
+                deviceIds.append(deviceId)
+        if not deviceIds:
+            return collections.OrderedDict()
+        ackPackets = self.broadcast(subSystem, command, value, timeout, deviceIds)
+        for deviceId, ackPacket in ackPackets.items():
+            if ackPacket and ackPacket.header.packetType == PacketType.Ack:
+                self.apis[deviceId].state.update(key, value)
+        return ackPackets
+
+    def setDownsample(self, factor):
+        """
+            Set motion streaming downsampling of every device, see NeblinaAPI.setDownsample.
+        """
+        assert factor % 20 == 0 and 20 <= factor <= 1000
+        ackPackets = self.broadcastSetting(SubSystem.Motion, Commands.Motion.Downsample, factor)
+        for deviceId, ackPacket in ackPackets.items():
+            if ackPacket and ackPacket.header.packetType == PacketType.Ack:
+                self.apis[deviceId].core.setStreamPeriod(factor * 1000)
+        return ackPackets
+
+    def setAccelerometerRange(self, factor):
+        """
+            Set accelerometer range of every device. Must be 2, 4, 8 or 16.
+        """
+        assert factor == 2 or factor == 4 or factor == 8 or factor == 16
+        return self.broadcastSetting(SubSystem.Motion, Commands.Motion.AccRange, factor)
+
+    def resetTimestamp(self):
+        """
+            Reset timestamp of every device, and restart their clock synchronization.
+        """
+        sendTime = time.monotonic()
+        ackPackets = self.broadcast(SubSystem.Motion, Commands.Motion.ResetTimeStamp, True)
+        resetTime = (sendTime + time.monotonic()) / 2
+        for deviceId, ackPacket in ackPackets.items():
+            if ackPacket and ackPacket.header.packetType == PacketType.Ack:
+                self.apis[deviceId].core.resetTimestamps(resetTime)
+        return ackPackets
+
+    def streamDisableAll(self):
+        """
+            Disable all streaming of every device.
+        """
+        ackPackets = self.broadcast(SubSystem.Motion, Commands.Motion.DisableStreaming, True)
+        for deviceId, ackPacket in ackPackets.items():
+            if ackPacket and ackPacket.header.packetType == PacketType.Ack:
+                self.apis[deviceId].state.disableStreams()
+        return ackPackets
+
+    def setStreaming(self, command, state):
+        """
+            Start/Stop a motion stream on every device.
+
+            :param command: Commands.Motion streaming command, e.g. Commands.Motion.IMU.
+            :param state: True, to start streaming. False, to stop streaming.
+        """
+        return self.broadcastSetting(SubSystem.Motion, command, bool(state))
+
+    def streamEulerAngle(self, state):
+        return self.setStreaming(Commands.Motion.EulerAngle, state)
+
+    def streamExternalForce(self, state):
+        return self.setStreaming(Commands.Motion.ExtForce, state)
+
+    def streamFingerGesture(self, state):
+        return self.setStreaming(Commands.Motion.FingerGesture, state)
+
+    def streamIMU(self, state):
+        return self.setStreaming(Commands.Motion.IMU, state)
+
+    def streamMAG(self, state):
+        return self.setStreaming(Commands.Motion.MAG, state)
+
+    def streamMotionState(self, state):
+        return self.setStreaming(Commands.Motion.MotionState, state)
+
+    def streamPedometer(self, state):
+        return self.setStreaming(Commands.Motion.Pedometer, state)
+
+    def streamQuaternion(self, state):
+        return self.setStreaming(Commands.Motion.Quaternion, state)
+
+    def streamRotationInfo(self, state):
+        return self.setStreaming(Commands.Motion.RotationInfo, state)
+
+    def streamSittingStanding(self, state):
+        return self.setStreaming(Commands.Motion.SittingStanding, state)
+
+    def streamTrajectoryInfo(self, state):
+        return self.setStreaming(Commands.Motion.TrajectoryInfo, state)
@@ -43,6 +43,8 @@ class NebHeader(object):
         CtrlByte(7:5) = PacketType
         CtrlByte(4:0) = Subsytem Code
     """
+    __slots__ = ('subSystem', 'length', 'crc', 'command', 'packetType')
+
     def __init__(self, subSystem, packetType, commandType, crc=255, length=16 ):
         self.subSystem = subSystem
         self.length = length
@@ -61,7 +63,7 @@ class NebHeader(object):
         packedCtrlByte = self.subSystem
         if self.packetType:
             packedCtrlByte |= (self.packetType << BitPosition.PacketType)
-        headerStringCode = struct.pack(Formatting.CommandData.Header,\
+        headerStringCode = Formatting.Struct.CommandData.Header.pack(\
         packedCtrlByte, self.length, self.crc, self.command)
         return headerStringCode
 
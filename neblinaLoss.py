@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+###################################################################################
+#
+# Copyright (c)     2010-2016   Motsai
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###################################################################################
+
+import collections
+
+from neblina import *
+
+###################################################################################
+
+# Streams sent at the downsampled rate, the other motion streams are sent on events
+PeriodicStreams = frozenset((
+    Commands.Motion.EulerAngle,
+    Commands.Motion.ExtForce,
+    Commands.Motion.IMU,
+    Commands.Motion.MAG,
+    Commands.Motion.Quaternion,
+))
+
+# Intervals used to estimate the period when the downsample factor is unknown
+PeriodEstimationCount = 16
+
+###################################################################################
+
+
+class NebLossDetector(object):
+    """
+        Detects the samples lost by the link from the timestamp cadence of a
+        stream: an interval of n periods means n - 1 samples missing in a row
+        (a burst). Fed before any host-side buffering, so it tells link loss
+        apart from the packets the host drops when it does not keep up (see
+        droppedPacketCount).
+    """
+    __slots__ = ('period', 'estimatedPeriod', 'intervals', 'lastTimestamp', 'sampleCount', 'missingCount',
+                 'gapCount', 'gapDuration', 'longestGap', 'burstHistogram', 'outOfOrderCount')
+
+    def __init__(self, period=None):
+        """
+            :param period: Expected interval between samples (in microseconds), estimated if None.
+        """
+        self.period = period
+        self.reset()
+
+    def reset(self):
+        self.estimatedPeriod = None
+        self.intervals = []
+        self.lastTimestamp = None
+        self.sampleCount = 0
+        self.missingCount = 0
+        self.gapCount = 0
+        # Total and longest time without samples (in microseconds), beyond the expected period
+        self.gapDuration = 0
+        self.longestGap = 0
+        # Number of gaps by count of consecutive missing samples
+        self.burstHistogram = collections.Counter()
+        # Repeated or backward timestamps
+        self.outOfOrderCount = 0
+
+    def setPeriod(self, period):
+        """
+            Restart with a new expected period, e.g. after the downsample factor changed.
+        """
+        self.period = period
+        self.reset()
+
+    def getPeriod(self):
+        return self.period if self.period else self.estimatedPeriod
+
+    def update(self, timestamp):
+        """
+            :param timestamp: 64-bit timestamp of the next sample (in microseconds, see NebTimestampUnwrapper).
+        """
+        lastTimestamp = self.lastTimestamp
+        if lastTimestamp is None:
+            self.lastTimestamp = timestamp
+            self.sampleCount = 1
+            return
+        interval = timestamp - lastTimestamp
+        if interval <= 0:
+            self.outOfOrderCount += 1
+            return
+        self.lastTimestamp = timestamp
+        self.sampleCount += 1
+        period = self.period or self.estimatedPeriod
+        if period is None:
+            self.intervals.append(interval)
+            if len(self.intervals) == PeriodEstimationCount:
+                # The median ignores the intervals including losses
+                self.estimatedPeriod = sorted(self.intervals)[PeriodEstimationCount // 2]
+                self.intervals = []
+            return
+        missing = (interval + period // 2) // period - 1
+        if missing > 0:
+            self.missingCount += missing
+            self.gapCount += 1
+            gap = interval - period
+            self.gapDuration += gap
+            if gap > self.longestGap:
+                self.longestGap = gap
+            self.burstHistogram[missing] += 1
+
+    def getLossRatio(self):
+        """
+            :return: Fraction of the expected samples that never arrived.
+        """
+        expected = self.sampleCount + self.missingCount
+        return self.missingCount / expected if expected else 0.0
+
+    def getStatistics(self):
+        """
+            :return: Dictionary of the counters.
+        """
+        return {'period': self.getPeriod(), 'sampleCount': self.sampleCount, 'missingCount': self.missingCount,
+                'lossRatio': self.getLossRatio(), 'gapCount': self.gapCount, 'gapDuration': self.gapDuration,
+                'longestGap': self.longestGap, 'longestBurst': max(self.burstHistogram) if self.burstHistogram else 0,
+                'burstHistogram': dict(self.burstHistogram), 'outOfOrderCount': self.outOfOrderCount}
@@ -125,19 +125,72 @@ ResponsePacketDataConstructors = {
     SubSystem.EEPROM: EEPROMResponses,
 }
 
+# Precompiled layout of every data constructor, used to reject truncated
+# packets before decoding. BlankData accepts an empty payload.
+ResponsePacketDataStructs = {
+    BlankData: None,
+    MotAndFlashRecStateData: Formatting.Struct.Data.MotionAndFlash,
+    UnitTestMotionData: Formatting.Struct.Data.UnitTestMotion,
+    FirmwareVersionsData.decode: Formatting.Struct.Data.FWVersions,
+    DataPortStatusData.decode: Formatting.Struct.CommandData.SetDataPortState,
+    FlashSessionData: Formatting.Struct.CommandData.FlashSession,
+    FlashNumSessionsData: Formatting.Struct.Data.FlashNumSessions,
+    FlashSessionInfoData: Formatting.Struct.CommandData.FlashSessionInfo,
+    BatteryLevelData: Formatting.Struct.Data.BatteryLevel,
+    TemperatureData: Formatting.Struct.Data.Temperature,
+    MotionStateData: Formatting.Struct.Data.MotionState,
+    IMUData.decode: Formatting.Struct.Data.IMU,
+    QuaternionData: Formatting.Struct.Data.Quaternion,
+    EulerAngleData: Formatting.Struct.Data.Euler,
+    ExternalForceData: Formatting.Struct.Data.ExternalForce,
+    TrajectoryDistanceData: Formatting.Struct.Data.TrajectoryDistance,
+    PedometerData: Formatting.Struct.Data.Pedometer,
+    MAGData.decode: Formatting.Struct.Data.MAG,
+    FingerGestureData: Formatting.Struct.Data.FingerGesture,
+    RotationData: Formatting.Struct.Data.RotationInfo,
+    EEPROMReadData: Formatting.Struct.Data.EEPROMRead,
+    LEDGetValData: Formatting.Struct.Data.LEDGetVal,
+}
+
+
+def buildResponsePacketDispatch():
+    """
+        Flatten ResponsePacketDataConstructors into a 256x256 table indexed by
+        (ctrlByte << 8) | command. Each entry is a (dataConstructor, struct)
+        tuple, or None for an unknown combination or a command packet.
+    """
+    dispatch = [None] * 0x10000
+    for packetType in range(8):
+        if packetType == PacketType.Command:
+            continue
+        for subSystem in range(BitMask.SubSystem + 1):
+            ctrlByte = (packetType << BitPosition.PacketType) | subSystem
+            if packetType == PacketType.Ack:
+                # Any subsystem/command can be acknowledged
+                commands = dict.fromkeys(range(256), AckData)
+            else:
+                commands = ResponsePacketDataConstructors.get(subSystem, {})
+            for command, dataConstructor in commands.items():
+                dataStruct = ResponsePacketDataStructs.get(dataConstructor)
+                dispatch[(ctrlByte << 8) | command] = (dataConstructor, dataStruct)
+    return tuple(dispatch)
+
+ResponsePacketDispatch = buildResponsePacketDispatch()
+
 
 ###################################################################################
 
 
 class NebResponsePacket(object):
     """docstring for NebResponsePacket"""
+    __slots__ = ('header', 'headerLength', 'data', 'packetString', 'dataConstructor', 'deviceTimestamp', 'hostTimestamp')
 
     @staticmethod
     def createResponsePacket(self, subSystem, commands, data, dataString):
-        crc = nebUtilities.crc8(bytearray(dataString))
+        crc = nebUtilities.crc8(dataString)
         header = NebHeader(subSystem, False, commands, crc, len(dataString))
         responsePacket = NebResponsePacket(packetString=None, header=header, data=data, checkCRC=False)
-        responsePacket.header.crc = nebUtilities.genNebCRC8(bytearray(responsePacket.stringEncode()))
+        responsePacket.header.crc = nebUtilities.genNebCRC8(responsePacket.stringEncode())
         return responsePacket
 
     @classmethod
@@ -167,7 +220,7 @@ class NebResponsePacket(object):
         roll = int(roll * 10)
         demoHeading = int(demoHeading * 10)
         garbage = '\000\000\000\000'.encode('utf-8')
-        dataString = struct.pack(Formatting.Data.Euler, int(timestamp), yaw, pitch, roll, demoHeading, garbage)
+        dataString = Formatting.Struct.Data.Euler.pack(int(timestamp), yaw, pitch, roll, demoHeading, garbage)
         data = EulerAngleData(dataString)
         return cls.createResponsePacket(cls, SubSystem.Motion, Commands.Motion.EulerAngle, data, dataString)
 
@@ -176,7 +229,7 @@ class NebResponsePacket(object):
         # Multiply the walking direction value by 10 to emulate the firmware behavior
         walkingDirection = int(walkingDirection * 10)
         garbage = ('\000' * 7).encode('utf-8')
-        dataString = struct.pack(Formatting.Data.Pedometer, timestamp, stepCount, \
+        dataString = Formatting.Struct.Data.Pedometer.pack(timestamp, stepCount, \
                                  stepsPerMinute, walkingDirection, garbage)
         data = PedometerData(dataString)
         return cls.createResponsePacket(cls, SubSystem.Motion, Commands.Motion.Pedometer, data, dataString)
@@ -184,12 +237,23 @@ class NebResponsePacket(object):
     @classmethod
     def createRotationResponsePacket(cls, timestamp, rotationCount, rpm):
         garbage = ('\000' * 6).encode('utf-8')
-        dataString = struct.pack(Formatting.Data.RotationInfo, timestamp, rotationCount, \
+        dataString = Formatting.Struct.Data.RotationInfo.pack(timestamp, rotationCount, \
                                  rpm, garbage)
         data = RotationData(dataString)
         return cls.createResponsePacket(cls, SubSystem.Motion, Commands.Motion.RotationInfo, data, dataString)
 
-    def __init__(self, packetString=None, header=None, data=None, checkCRC=True):
+    def __init__(self, packetString=None, header=None, data=None, checkCRC=True, lazy=False):
+        """
+            :param lazy: True, to only decode the header. The data object is then
+                         built on first access of packet.data. The unknown
+                         subsystems/commands are still detected right away,
+                         see isPacketUnknown.
+        """
+        self.dataConstructor = None
+        # 64-bit data timestamp (microseconds, see NebTimestampUnwrapper) and its
+        # host time estimate (see NebClockSync), set by NeblinaCore
+        self.deviceTimestamp = None
+        self.hostTimestamp = None
         if (packetString != None):
             # Sanity check
             packetStringLength = len(packetString)
@@ -205,9 +269,8 @@ class NebResponsePacket(object):
 
             # Extract the header information
             self.headerLength = 4
-            headerString = packetString[:self.headerLength]
             ctrlByte, packetLength, crc, command \
-                = struct.unpack(Formatting.CommandData.Header, headerString)
+                = Formatting.Struct.CommandData.Header.unpack_from(packetString, 0)
 
             # Extract the value from the subsystem byte
             subSystem = ctrlByte & BitMask.SubSystem
@@ -222,25 +285,64 @@ class NebResponsePacket(object):
 
             self.header = NebHeader(subSystem, packetType, command, crc, packetLength)
 
-            # Extract the data substring
-            dataString = packetString[self.headerLength:self.headerLength + packetLength]
-
             # Perform CRC of data bytes
             if (checkCRC):
-                calculatedCRC = nebUtilities.genNebCRC8(bytearray(packetString))
+                calculatedCRC = nebUtilities.genNebCRC8(packetString)
                 if calculatedCRC != self.header.crc:
                     raise CRCError(calculatedCRC, self.header.crc)
 
-            if packetType == PacketType.Ack:
-                self.data = AckData()
+            # Find the data constructor based on the control byte and command
+            entry = ResponsePacketDispatch[(ctrlByte << 8) | command]
+            if entry is None:
+                # Unknown subsystem/command combination, nothing to decode
+                self.data = None
+                return
+            dataConstructor, dataStruct = entry
+            if dataStruct is not None and packetStringLength < self.headerLength + dataStruct.size:
+                raise InvalidPacketFormatError( \
+                    'Truncated packet, expected at least {0} bytes but got {1}' \
+                        .format(self.headerLength + dataStruct.size, packetStringLength))
+
+            # The data is decoded in place, right after the header.
+            if lazy:
+                # Decoded on first access of self.data, see __getattr__
+                self.packetString = packetString
+                self.dataConstructor = dataConstructor
             else:
-                # Build the data object based on the subsystem and command.
-                self.data = ResponsePacketDataConstructors[subSystem][self.header.command](dataString)
+                self.data = dataConstructor(packetString, self.headerLength)
 
         elif (header != None and data != None):
             self.header = header
             self.data = data
 
+    @classmethod
+    def fromString(cls, packetString, checkCRC=True, lazy=False):
+        """
+            Same as the constructor, but returns None for an unknown
+            subsystem/command combination. The CRC is checked first, so a
+            corrupted header raises CRCError rather than looking unknown.
+        """
+        packet = cls(packetString, checkCRC=checkCRC, lazy=lazy)
+        if packet.isPacketUnknown():
+            return None
+        return packet
+
+    def __getattr__(self, name):
+        # Only called when the attribute does not exist yet, i.e. for the data
+        # of a lazy packet that has not been accessed so far
+        if name == 'data' and self.dataConstructor is not None:
+            self.data = self.dataConstructor(self.packetString, self.headerLength)
+            self.dataConstructor = None
+            self.packetString = None
+            return self.data
+        raise AttributeError(name)
+
+    def isPacketUnknown(self):
+        """
+            :return: True for an unknown subsystem/command combination, whose data is None.
+        """
+        return self.dataConstructor is None and self.data is None
+
     def isPacketError(self):
         return self.header.packetType == PacketType.ErrorLogResp
 
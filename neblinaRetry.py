@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+###################################################################################
+#
+# Copyright (c)     2010-2016   Motsai
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###################################################################################
+
+
+import random
+
+from neblina import *
+
+###################################################################################
+
+# Commands with a side effect that must not happen twice. When their acknowledge
+# is lost, the command may or may not have been executed, so they are never resent.
+NonIdempotentCommands = frozenset([
+    (SubSystem.Storage, Commands.Storage.EraseAll),
+    (SubSystem.Storage, Commands.Storage.Record),
+    (SubSystem.Storage, Commands.Storage.Playback),
+])
+
+###################################################################################
+
+
+class RetryPolicy(object):
+    """
+        How long to wait for a command, and how often to resend it.
+        The delay before the n-th retry grows exponentially from backoff, up to
+        maxBackoff, and is randomly shortened by up to jitter (a fraction of it)
+        so that several devices retrying together do not stay in lockstep.
+    """
+    __slots__ = ('timeout', 'retries', 'backoff', 'backoffFactor', 'maxBackoff', 'jitter')
+
+    def __init__(self, timeout=3, retries=2, backoff=0.1, backoffFactor=2.0, maxBackoff=2.0, jitter=0.5):
+        """
+            :param timeout: Maximum time to wait (in seconds) for each packet of an attempt.
+            :param retries: Number of resends after the first attempt.
+            :param backoff: Delay (in seconds) before the first retry.
+            :param backoffFactor: Growth of the delay at each retry.
+            :param maxBackoff: Longest delay (in seconds) between two attempts.
+            :param jitter: Fraction of the delay randomly removed, between 0 and 1.
+        """
+        assert timeout > 0 and retries >= 0 and backoff >= 0 and backoffFactor >= 1 and 0 <= jitter <= 1
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.backoffFactor = backoffFactor
+        self.maxBackoff = maxBackoff
+        self.jitter = jitter
+
+    def __repr__(self):
+        return 'RetryPolicy(timeout={0}, retries={1}, backoff={2}, backoffFactor={3}, maxBackoff={4}, jitter={5})'\
+            .format(self.timeout, self.retries, self.backoff, self.backoffFactor, self.maxBackoff, self.jitter)
+
+    def getDelay(self, attempt):
+        """
+            :param attempt: Number of attempts done so far (1 after the first one).
+            :return: Time to wait (in seconds) before the next attempt.
+        """
+        delay = min(self.backoff * self.backoffFactor ** (attempt - 1), self.maxBackoff)
+        return delay * (1 - self.jitter * random.random())
+
+###################################################################################
+
+# Policy of the commands without their own, see NeblinaCore.setRetryPolicy
+DefaultRetryPolicy = RetryPolicy()
+
+# Switching the interface is often sent right after opening the port, while the module
+# is still busy, so it gets more retries.
+DefaultRetryPolicies = {
+    (SubSystem.Debug, Commands.Debug.SetInterface): RetryPolicy(retries=5),
+}
+
+# Opening the communication, e.g. a serial port still being enumerated
+ConnectRetryPolicy = RetryPolicy(retries=10, backoff=0.5, maxBackoff=5.0)
+
+###################################################################################
+
+
+class NebCommandResult(object):
+    """
+        Outcome of a command sent with NeblinaCore.execute.
+    """
+    __slots__ = ('subSystem', 'command', 'status', 'packet', 'attempts', 'elapsed', 'ambiguous')
+
+    def __init__(self, subSystem, command):
+        self.subSystem = subSystem
+        self.command = command
+        # CommandStatus
+        self.status = CommandStatus.Timeout
+        # Response (or acknowledge) packet, the error packet on CommandStatus.ErrorResponse
+        self.packet = None
+        # Number of times the command was sent
+        self.attempts = 0
+        # Time (in seconds) from the first send to the outcome
+        self.elapsed = 0.0
+        # True when a non-idempotent command timed out, it may have been executed anyway
+        self.ambiguous = False
+
+    def __bool__(self):
+        return self.status == CommandStatus.Success
+
+    def __str__(self):
+        status = {CommandStatus.Success: 'succeeded', CommandStatus.ErrorResponse: 'failed with an error response',
+                  CommandStatus.Timeout: 'timed out'}[self.status]
+        string = 'Subsystem {0} command {1} {2} after {3} attempt(s) in {4:.3f}s'\
+            .format(self.subSystem, self.command, status, self.attempts, self.elapsed)
+        if self.ambiguous:
+            string += ', it may have been executed'
+        return string
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+###################################################################################
+#
+# Copyright (c)     2010-2016   Motsai
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###################################################################################
+
+
+from neblina import *
+
+###################################################################################
+
+# Motion streams started/stopped with their command's enable flag
+StreamCommands = (
+    Commands.Motion.EulerAngle,
+    Commands.Motion.ExtForce,
+    Commands.Motion.FingerGesture,
+    Commands.Motion.IMU,
+    Commands.Motion.MAG,
+    Commands.Motion.MotionState,
+    Commands.Motion.Pedometer,
+    Commands.Motion.Quaternion,
+    Commands.Motion.RotationInfo,
+    Commands.Motion.SittingStanding,
+    Commands.Motion.TrajectoryInfo,
+)
+
+# Streams reported by MotAndFlashRecStateData, by MotionStatusData attribute
+MotionStatusStreams = (
+    ('distance', Commands.Motion.TrajectoryInfo),
+    ('force', Commands.Motion.ExtForce),
+    ('euler', Commands.Motion.EulerAngle),
+    ('quaternion', Commands.Motion.Quaternion),
+    ('imuData', Commands.Motion.IMU),
+    ('motion', Commands.Motion.MotionState),
+    ('steps', Commands.Motion.Pedometer),
+    ('magData', Commands.Motion.MAG),
+    ('sitStand', Commands.Motion.SittingStanding),
+)
+
+###################################################################################
+
+
+def getLEDKey(index):
+    return (SubSystem.LED, Commands.LED.SetVal, index)
+
+###################################################################################
+
+
+class NebDeviceState(object):
+    """
+        Shadow of the device configuration, as last acknowledged or read back.
+        The keys are (subSystem, command) tuples for the motion settings and
+        streams, getLEDKey(index) for the LEDs. A missing key is unknown, so its
+        command is always sent.
+        Not thread-safe by itself, like the commands it shadows.
+    """
+    __slots__ = ('values', 'elidedCount')
+
+    def __init__(self):
+        self.values = {}
+        # Commands not sent, because the device already had the value
+        self.elidedCount = 0
+
+    def __contains__(self, key):
+        return key in self.values
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    def isApplied(self, key, value):
+        """
+            :return: True if the device is known to hold value for key.
+        """
+        return key in self.values and self.values[key] == value
+
+    def update(self, key, value):
+        self.values[key] = value
+
+    def invalidate(self, key=None):
+        """
+            Forget a value, or everything if key is None (e.g. after a reconnection or a reset).
+        """
+        if key is None:
+            self.values.clear()
+        else:
+            self.values.pop(key, None)
+
+    def invalidateCommand(self, subSystem, command):
+        """
+            Forget the values a command sent without tracking may have changed.
+        """
+        if subSystem == SubSystem.Motion and command == Commands.Motion.DisableStreaming:
+            for streamCommand in StreamCommands:
+                self.values.pop((SubSystem.Motion, streamCommand), None)
+        elif subSystem == SubSystem.LED and command == Commands.LED.SetVal:
+            for index in range(8):
+                self.values.pop(getLEDKey(index), None)
+        else:
+            self.values.pop((subSystem, command), None)
+
+    def disableStreams(self):
+        for command in StreamCommands:
+            self.values[(SubSystem.Motion, command)] = False
+
+    def seedMotionStatus(self, motionStatus):
+        """
+            :param motionStatus: MotionStatusData instance, as decoded from MotAndFlashRecStateData.
+        """
+        for attribute, command in MotionStatusStreams:
+            value = getattr(motionStatus, attribute, None)
+            if value is not None:
+                self.values[(SubSystem.Motion, command)] = value
+
+    def seedLEDs(self, ledState, indices=range(8)):
+        """
+            :param ledState: LED values, as in LEDGetValData.
+            :param indices: LED indices read.
+        """
+        for index in indices:
+            self.values[getLEDKey(index)] = ledState[index]
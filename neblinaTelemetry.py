@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+###################################################################################
+#
+# Copyright (c)     2010-2016   Motsai
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###################################################################################
+
+import collections
+import time
+
+###################################################################################
+
+# Upper bounds (in seconds) of the acknowledge round-trip histogram buckets,
+# followed by an unbounded bucket
+AckLatencyBuckets = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0)
+
+# Commands remembered per subsystem/command while waiting for their acknowledge
+AckPendingSize = 16
+
+###################################################################################
+
+
+class NebTelemetry(object):
+    """
+        Link-quality and throughput counters of a device, updated by NeblinaCore
+        as the packets go through. Each counter is a plain integer written by
+        the thread reading the device only, so snapshot() reads them without any
+        lock. commandSent runs on the threads sending commands instead: the send
+        times are kept in deques, whose append and popleft are atomic.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.startTime = time.monotonic()
+        # Packets and bytes read from the device, valid or not
+        self.frameCount = 0
+        self.byteCount = 0
+        self.crcErrorCount = 0
+        # Bad header or length
+        self.invalidPacketCount = 0
+        # Unknown subsystem/command
+        self.unknownPacketCount = 0
+        # Valid packets by (packetType, subSystem, command), whoever decoded them
+        self.packetCounts = collections.Counter()
+        # Send times of the commands waiting for their acknowledge, by (subSystem, command)
+        self.commandTimes = {}
+        self.ackLatencyHistogram = [0] * (len(AckLatencyBuckets) + 1)
+        self.ackLatencySum = 0.0
+        self.ackCount = 0
+
+    def commandSent(self, subSystem, command):
+        key = (subSystem, command)
+        sendTimes = self.commandTimes.get(key)
+        if sendTimes is None:
+            # Two threads may send the first command of a kind at once
+            sendTimes = self.commandTimes.setdefault(key, collections.deque(maxlen=AckPendingSize))
+        sendTimes.append(time.monotonic())
+
+    def ackReceived(self, subSystem, command):
+        sendTimes = self.commandTimes.get((subSystem, command))
+        if not sendTimes:
+            # Not sent through NeblinaCore, or its send time was forgotten
+            return
+        latency = time.monotonic() - sendTimes.popleft()
+        bucket = 0
+        while bucket < len(AckLatencyBuckets) and latency > AckLatencyBuckets[bucket]:
+            bucket += 1
+        self.ackLatencyHistogram[bucket] += 1
+        self.ackLatencySum += latency
+        self.ackCount += 1
+
+    def snapshot(self):
+        """
+            :return: NebTelemetrySnapshot instance of the counters.
+        """
+        return NebTelemetrySnapshot(self)
+
+###################################################################################
+
+
+class NebTelemetrySnapshot(object):
+    """
+        Copy of the NebTelemetry counters at a given time, plus the state of the
+        packet buffers and of the SLIP decoder filled in by NeblinaCore.
+        Rates come from the difference between two snapshots, see rates().
+    """
+
+    def __init__(self, telemetry):
+        self.time = time.monotonic()
+        self.startTime = telemetry.startTime
+        self.frameCount = telemetry.frameCount
+        self.byteCount = telemetry.byteCount
+        self.crcErrorCount = telemetry.crcErrorCount
+        self.invalidPacketCount = telemetry.invalidPacketCount
+        self.unknownPacketCount = telemetry.unknownPacketCount
+        self.packetCounts = dict(telemetry.packetCounts)
+        self.ackLatencyHistogram = list(telemetry.ackLatencyHistogram)
+        self.ackLatencySum = telemetry.ackLatencySum
+        self.ackCount = telemetry.ackCount
+        # Filled in by NeblinaCore.getTelemetry
+        self.droppedPacketCount = 0
+        # Packets queued by (packetType, subSystem, command)
+        self.queueDepths = {}
+        # SlipDecoder statistics, empty if the device has no SLIP decoder (e.g. BLE)
+        self.slip = {}
+        # Samples lost by the link, NebLossDetector statistics by streaming command
+        self.sampleLoss = {}
+
+    def getAckLatencyMean(self):
+        """
+            :return: Mean acknowledge round-trip (in seconds), None if no acknowledge was timed.
+        """
+        if self.ackCount == 0:
+            return None
+        return self.ackLatencySum / self.ackCount
+
+    def rates(self, previous=None):
+        """
+            Throughput since a previous snapshot, or since the counters were reset.
+
+            :param previous: Earlier NebTelemetrySnapshot instance, or None.
+            :return: (packets/s, bytes/s, {(packetType, subSystem, command): packets/s})
+        """
+        if previous is None or previous.startTime != self.startTime:
+            elapsed = self.time - self.startTime
+            frameCount, byteCount, packetCounts = 0, 0, {}
+        else:
+            elapsed = self.time - previous.time
+            frameCount, byteCount, packetCounts = previous.frameCount, previous.byteCount, previous.packetCounts
+        if elapsed <= 0:
+            return 0.0, 0.0, {}
+        streamRates = {key: (count - packetCounts.get(key, 0)) / elapsed for key, count in self.packetCounts.items()}
+        return (self.frameCount - frameCount) / elapsed, (self.byteCount - byteCount) / elapsed, streamRates
@@ -30,7 +30,8 @@ import serial
 import time
 import os
 
-from neblinaCommunication import NeblinaCommunication
+from neblinaCommunication import NeblinaCommunication, ReceivePollTimeout
+from neblinaRetry import ConnectRetryPolicy
 
 from pyslip import slip
 
@@ -44,19 +45,27 @@ class NeblinaUART(NeblinaCommunication):
         self.comslip = slip.slip()
         self.sc = None
 
-    def connect(self):
+    def connect(self, policy=ConnectRetryPolicy):
+        """
+            :param policy: RetryPolicy of the attempts to open the serial COM port.
+            :raise ConnectionError: The port could not be opened, even after the retries.
+        """
         # Try to open the serial COM port
         logging.debug("Opening COM port : {0}".format(self.address))
         self.sc = None
+        attempts = 0
         while self.sc is None:
+            attempts += 1
             try:
                 self.sc = serial.Serial(port=self.address, baudrate=500000)
             except serial.serialutil.SerialException as se:
+                if attempts > policy.retries:
+                    raise ConnectionError('Unable to open COM port {0} : {1}'.format(self.address, se)) from se
                 if 'Device or resource busy:' in se.__str__():
                     logging.info('Opening COM port is taking a little while, please stand by...')
                 else:
                     logging.error('se: {0}'.format(se))
-                time.sleep(1)
+                time.sleep(policy.getDelay(attempts))
 
         self.sc.flushInput()
 
@@ -70,13 +79,27 @@ class NeblinaUART(NeblinaCommunication):
         else:
             return self.sc and self.sc.isOpen()
 
-    def receivePacket(self):
+    def receivePacket(self, timeout=ReceivePollTimeout):
+        """
+            :param timeout: Maximum time to wait (in seconds) for a packet, None to wait forever.
+                            By default, returns quickly for polling loops.
+        """
         packet = None
         try:
-            packet = self.comslip.receivePacketFromStream(self.sc)
+            packet = self.comslip.receiveBufferedPacketFromStream(self.sc, timeout=timeout)
         except KeyboardInterrupt:
             pass
         return packet
 
+    def fileno(self):
+        return self.sc.fileno()
+
+    def receiveAvailablePackets(self):
+        return self.comslip.receiveAvailablePacketsFromStream(self.sc)
+
     def sendPacket(self, packet):
         self.comslip.sendPacketToStream(self.sc, packet)
+
+    def sendPackets(self, packets):
+        # Back-to-back, in a single write
+        self.comslip.sendPacketsToStream(self.sc, packets)
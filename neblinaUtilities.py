@@ -34,6 +34,20 @@ from neblina import *
 
 ###################################################################################
 
+
+def buildCRC8Table():
+    # CRC value after processing a single byte from a CRC of 0,
+    # the CRC of any byte sequence then is crc = table[crc ^ byte] for each byte
+    table = []
+    for ee in range(256):
+        ff = (ee) ^ (ee>>4) ^ (ee>>7)
+        table.append(((ff<<1)%256) ^ ((ff<<4) % 256))
+    return tuple(table)
+
+CRC8Table = buildCRC8Table()
+
+###################################################################################
+
 class NebUtilities(object):
 
     # http://stackoverflow.com/questions/434287/what-is-the-most-pythonic-way-to-iterate-over-a-list-in-chunks
@@ -41,29 +55,20 @@ class NebUtilities(object):
         args = [iter(iterable)] * n
         return zip_longest(*args, fillvalue=fillvalue)
 
-    def crc8(bytes):
-        crc = 0
+    def crc8(bytes, crc=0):
+        table = CRC8Table
         for byte in bytes:
-            ee = (crc) ^ (byte)
-            ff = (ee) ^ (ee>>4) ^ (ee>>7)
-            crc = ((ff<<1)%256) ^ ((ff<<4) % 256)
+            crc = table[crc ^ byte]
         return crc
 
     # Special CRC routine that skips the expected position of the CRC calculation
     # in a Neblina packet
     def genNebCRC8(packetBytes):
-        crc = 0
-        # The CRC should be placed as the third byte in the packet
-        crc_backup = packetBytes[2]
-        packetBytes[2] = 255
-        ii = 0
-        while ii < len(packetBytes):
-           ee = (crc) ^ (packetBytes[ii])
-           ff = (ee) ^ (ee>>4) ^ (ee>>7)
-           crc = ((ff<<1)%256) ^ ((ff<<4) % 256)
-           ii += 1
-        packetBytes[2] = crc_backup
-        return crc
+        # The CRC should be placed as the third byte in the packet,
+        # it is computed as if that byte was 255
+        crc = NebUtilities.crc8(packetBytes[:2])
+        crc = CRC8Table[crc ^ 0xFF]
+        return NebUtilities.crc8(packetBytes[3:], crc)
 
     def saveFlashPlayback(sessionID, packetList):
         path = os.path.dirname(__file__)
@@ -105,26 +110,32 @@ class NebUtilities(object):
         filepath[Commands.Motion.Pedometer] = os.path.join(indexPath, "pedometer.csv")
         filepath[Commands.Motion.RotationInfo] = os.path.join(indexPath, "rotation.csv")
 
-        for i in range(size):
-            if filepath[i]:
-                filehandle[i] = open(filepath[i], "a")
-
-        for packet in packetList:
-            if packet.header.subSystem != SubSystem.Motion or packet.header.packetType != PacketType.RegularResponse:
-                continue
-
-            filesize[0] += 1
-            filehandle[0].write("{0}\n".format(packet.stringEncode()))
-
-            if filehandle[packet.header.command]:
-                filesize[packet.header.command] += 1
-                filehandle[packet.header.command].write("{0}\n".format(packet.data.csvString()))
-
-        for i in range(size):
-            if filepath[i]:
-                filehandle[i].close()
-
-        for i in range(size):
-            if filesize[i]==0 and filepath[i]:
-                os.remove(filepath[i])
+        # The packets may come from a live download, which can be interrupted
+        try:
+            for i in range(size):
+                if filepath[i]:
+                    filehandle[i] = open(filepath[i], "a")
+
+            for packet in packetList:
+                if packet.header.subSystem != SubSystem.Motion or packet.header.packetType != PacketType.RegularResponse:
+                    continue
+
+                filesize[0] += 1
+                filehandle[0].write("{0}\n".format(packet.stringEncode()))
+
+                if filehandle[packet.header.command]:
+                    filesize[packet.header.command] += 1
+                    csvString = packet.data.csvString()
+                    if packet.deviceTimestamp is not None:
+                        # Unwrapped timestamp, to stay monotonic over sessions longer than ~71 minutes
+                        csvString = str(packet.deviceTimestamp) + csvString[csvString.index(';'):]
+                    filehandle[packet.header.command].write("{0}\n".format(csvString))
+        finally:
+            for i in range(size):
+                if filehandle[i]:
+                    filehandle[i].close()
+
+            for i in range(size):
+                if filesize[i]==0 and filehandle[i]:
+                    os.remove(filepath[i])
 
@@ -1,7 +1,12 @@
 #!/usr/bin/env python
 import serial as sc
 import binascii
+import collections
 import io
+import logging
+import os
+import select
+import time
 
 
 class slip():
@@ -13,19 +18,30 @@ class slip():
     SLIP_ESC_END = b'\xdc' # dec: 220
     SLIP_ESC_ESC = b'\xdd' # dec: 221
 
+    def __init__(self):
+        self.decoder = SlipDecoder()
+        # Frames already decoded but not yet handed out
+        self.packets = collections.deque()
+
     def sendPacketToStream(self, stream, packet):
         if stream == None:
             raise Exception('Missing stream Object')
         encodedPacket = self.encode(packet)
         stream.write(encodedPacket)
 
-    def receivePacketFromStream(self, stream, length=1000):
+    def sendPacketsToStream(self, stream, packets):
+        if stream == None:
+            raise Exception('Missing stream Object')
+        stream.write(self.encodeMany(packets))
+
+    def receivePacketFromStream(self, stream, length=1000, timeout=0.01):
         if stream == None:
             raise Exception('Missing stream Object')
         fileStream = (type(stream) == io.BufferedReader)
         packet = b''
         received = 0
-        stream._timeout = 0.01
+        if not fileStream and stream.timeout != timeout:
+            stream.timeout = timeout
         while 1:
             serialByte = stream.read(1)
             if serialByte is None:
@@ -59,6 +75,93 @@ class slip():
                 received = received + 1
                 packet += serialByte
 
+    def receiveBufferedPacketFromStream(self, stream, length=1000, chunkSize=4096, timeout=0.01):
+        """
+            Chunked variant of receivePacketFromStream.
+
+            Everything available on the stream (in_waiting bytes for a serial
+            port, chunkSize bytes for a file) is read at once and split into
+            frames. Frames that are not returned yet are kept for the next call,
+            as is the partial frame at the end of the chunk.
+
+            A serial port is waited on until a frame is complete or the timeout
+            (in seconds, None to wait forever) expires on the monotonic clock.
+        """
+        if stream == None:
+            raise Exception('Missing stream Object')
+        fileStream = (type(stream) == io.BufferedReader)
+        if not fileStream and timeout is not None:
+            deadline = time.monotonic() + timeout
+        else:
+            deadline = None
+        while not self.packets:
+            if fileStream:
+                chunk = stream.read(chunkSize)
+            else:
+                chunk = self.readAvailable(stream, deadline)
+            if chunk is None:
+                raise Exception('Bad character from stream')
+            elif len(chunk) == 0:
+                if fileStream: # EOF reached
+                    return chunk
+                else:
+                    # raise TimeoutError('Read timed out')
+                    return None
+            self.decoder.length = length
+            self.packets.extend(self.decoder.feed(chunk))
+        return self.packets.popleft()
+
+    def receiveAvailablePacketsFromStream(self, stream, length=1000):
+        """
+            Non-blocking variant of receiveBufferedPacketFromStream, for a
+            serial port reported readable by select/selectors.
+
+            :return: List of every complete frame, possibly empty.
+        """
+        if stream == None:
+            raise Exception('Missing stream Object')
+        waiting = stream.in_waiting
+        if waiting:
+            self.decoder.length = length
+            self.packets.extend(self.decoder.feed(stream.read(waiting)))
+        packets = list(self.packets)
+        self.packets.clear()
+        return packets
+
+    def readAvailable(self, stream, deadline):
+        """
+            Read the bytes waiting on a serial port, waiting for some until the
+            deadline (time.monotonic(), None to wait forever).
+
+            :return: The bytes read, empty if the deadline expired.
+        """
+        waiting = stream.in_waiting
+        if waiting:
+            return stream.read(waiting)
+        if deadline is None:
+            remaining = None
+        else:
+            remaining = max(deadline - time.monotonic(), 0)
+        try:
+            fileno = stream.fileno()
+        except (AttributeError, io.UnsupportedOperation):
+            # Only the POSIX serial ports have a file descriptor
+            fileno = None
+        if fileno is not None and os.name == "posix":
+            # Sleep on the readiness of the file descriptor
+            readable, writable, exceptional = select.select([fileno], [], [], remaining)
+            if not readable:
+                return b''
+            return stream.read(max(stream.in_waiting, 1))
+        # No file descriptor to wait on, or select limited to sockets (Windows),
+        # let the port time out instead
+        if stream.timeout != remaining:
+            stream.timeout = remaining
+        chunk = stream.read(1)
+        if chunk and stream.in_waiting:
+            chunk += stream.read(stream.in_waiting)
+        return chunk
+
     def decodePackets(self, stream):
         packetlist = []
         packet = self.receivePacketFromStream(stream)
@@ -67,21 +170,133 @@ class slip():
             packet = self.receivePacketFromStream(stream)
         return packetlist
 
+    def escape(self, packet):
+        # ESC must be escaped first, otherwise the ESC introduced when
+        # escaping END would be escaped again
+        escaped = bytes(packet).replace(self.SLIP_ESC, self.SLIP_ESC + self.SLIP_ESC_ESC)
+        return escaped.replace(self.SLIP_END, self.SLIP_ESC + self.SLIP_ESC_END)
+
     def encode(self, packet):
-        # Encode an initial END character to flush out any data that
-        # may have accumulated in the receiver due to line noise
-        encoded = b''
-        packetBytes = [packet[ii:ii+1] for ii in range(len(packet))]
-        for byte in packetBytes:
-            # SLIP_END
-            if byte == self.SLIP_END:
-                encoded +=  self.SLIP_ESC + self.SLIP_ESC_END
-            # SLIP_ESC
-            elif byte == self.SLIP_ESC:
-                encoded += self.SLIP_ESC + self.SLIP_ESC_ESC
-            # the rest can simply be appended
-            else:
-                encoded += byte
-        encoded += self.SLIP_END
-        return (encoded)
+        return self.escape(packet) + self.SLIP_END
+
+    def encodeMany(self, packets):
+        """
+            Encode a list of packets in a single contiguous buffer,
+            for batched writes.
+        """
+        if len(packets) == 0:
+            return b''
+        return self.SLIP_END.join([self.escape(packet) for packet in packets]) + self.SLIP_END
+
+
+class SlipDecoder():
+    """
+        Incremental (push-style) SLIP decoder
+
+        Bytes are pushed with feed() as they come from any source: a serial
+        reader thread, an asyncio protocol, a BLE notification callback, an
+        mmap'd file... The partial frame (and thus the escape state) is kept
+        between calls.
+
+        Statistics:
+        - frameCount: number of frames returned
+        - oversizeCount: number of frames truncated at length bytes
+        - protocolErrorCount: number of frames dropped on a bad escape sequence
+        - resyncCount: number of times bytes were dropped to realign on SLIP_END
+    """
+    SLIP_END = slip.SLIP_END
+    SLIP_ESC = slip.SLIP_ESC
+    SLIP_ESC_END = slip.SLIP_ESC_END
+    SLIP_ESC_ESC = slip.SLIP_ESC_ESC
+
+    def __init__(self, length=1000):
+        self.length = length
+        self.buffer = bytearray()
+        # The buffered frame went over the worst case escaped size of a frame
+        # and bytes are dropped until the next SLIP_END
+        self.overflowing = False
+        self.truncated = False
+        self.resetStatistics()
+
+    def resetStatistics(self):
+        self.frameCount = 0
+        self.oversizeCount = 0
+        self.protocolErrorCount = 0
+        self.resyncCount = 0
+
+    def reset(self):
+        self.buffer = bytearray()
+        self.overflowing = False
+        self.truncated = False
+
+    def feed(self, data):
+        """
+            Push bytes in the decoder.
+
+            :param data: Any bytes-like object.
+            :return: List of the frames completed by data.
+        """
+        frames = []
+        start = len(self.buffer)
+        self.buffer += data
+        index = self.buffer.find(self.SLIP_END, start)
+        if self.overflowing:
+            if index < 0:
+                del self.buffer[start:]
+                return frames
+            del self.buffer[start:index]
+            self.overflowing = False
+        elif index < 0:
+            self.checkOverflow()
+            return frames
+
+        rawFrames = self.buffer.split(self.SLIP_END)
+        # The last element is the incomplete frame following the last SLIP_END
+        self.buffer = rawFrames.pop()
+        for rawFrame in rawFrames:
+            frame = self.decodeFrame(rawFrame)
+            if frame is not None:
+                frames.append(frame)
+        self.checkOverflow()
+        return frames
+
+    def decodeFrame(self, frame):
+        if len(frame) == 0:
+            return None
+        if self.truncated:
+            self.truncated = False
+            # The cut may have fallen in the middle of an escape sequence
+            if frame.endswith(self.SLIP_ESC):
+                frame = frame[:-1]
+        if self.SLIP_ESC in frame:
+            frame = self.unescape(frame)
+            if frame is None:
+                self.protocolErrorCount += 1
+                self.resyncCount += 1
+                logging.warning('SLIP Protocol Error, dropping frame.')
+                return None
+        if len(frame) > self.length:
+            self.oversizeCount += 1
+            frame = frame[:self.length]
+        self.frameCount += 1
+        return bytes(frame)
+
+    def checkOverflow(self):
+        # A frame of length bytes is at most twice as long once escaped
+        maxBufferLength = 2 * self.length
+        if len(self.buffer) > maxBufferLength:
+            del self.buffer[maxBufferLength:]
+            self.overflowing = True
+            self.truncated = True
+            self.resyncCount += 1
 
+    def unescape(self, frame):
+        escapeCount = frame.count(self.SLIP_ESC)
+        escapedEndCount = frame.count(self.SLIP_ESC + self.SLIP_ESC_END)
+        escapedEscCount = frame.count(self.SLIP_ESC + self.SLIP_ESC_ESC)
+        if escapeCount != escapedEndCount + escapedEscCount:
+            return None
+        # ESC_END pairs must go first, otherwise an escaped ESC followed by
+        # a literal ESC_END byte would turn into an END
+        frame = frame.replace(self.SLIP_ESC + self.SLIP_ESC_END, self.SLIP_END)
+        return frame.replace(self.SLIP_ESC + self.SLIP_ESC_ESC, self.SLIP_ESC)
@@ -1,7 +1,17 @@
+import io
+import os
+import sys
+import threading
+import time
 import unittest
 import slip
 import struct
 
+# Serial port stand-ins shared with the Neblina tests
+rootPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.extend([rootPath, os.path.join(rootPath, "test")])
+from neblinaTestUtilities import PipeSerial, NoFilenoSerial
+
 class ut_Slip(unittest.TestCase):
 
 	def setUp(self):
@@ -62,7 +72,118 @@ class ut_Slip(unittest.TestCase):
 		for idx,newPacket in enumerate(newPackets):
 			self.assertEqual(newPacket, initialPackets[idx])
 
-
+	# Make sure the buffered decoder returns the same packets as the byte-per-byte one,
+	# whatever the chunk boundaries are
+	def testSLIPBufferedDecode(self):
+		initialPackets = self.getTestStream("testdata.bin")
+		with open("testdata.bin", "rb") as testFile:
+			data = testFile.read()
+
+		for chunkSize in (1, 2, 3, 7, 4096):
+			nebSlip = slip.slip()
+			stream = io.BufferedReader(io.BytesIO(data))
+			newPackets = []
+			packet = nebSlip.receiveBufferedPacketFromStream(stream, chunkSize=chunkSize)
+			while(packet != b''):
+				newPackets.append(packet)
+				packet = nebSlip.receiveBufferedPacketFromStream(stream, chunkSize=chunkSize)
+			self.assertEqual(newPackets, initialPackets)
+
+	def testSLIPBufferedDecodeEscapes(self):
+		nebSlip = slip.slip()
+		packet = b'\x01\xc0\xdb\xdc\xdd\xdb\x02'
+		stream = io.BufferedReader(io.BytesIO(self.slip.encode(packet)))
+		self.assertEqual(nebSlip.receiveBufferedPacketFromStream(stream, chunkSize=2), packet)
+
+		# An escape followed by anything else than ESC_END or ESC_ESC is dropped
+		stream = io.BufferedReader(io.BytesIO(b'\x01\xdb\x02\xc0\x03\xc0'))
+		self.assertEqual(nebSlip.receiveBufferedPacketFromStream(stream), b'\x03')
+		self.assertEqual(nebSlip.decoder.protocolErrorCount, 1)
+
+	def testSLIPEncode(self):
+		packet = bytes(range(256)) + b'\xdb\xdc\xc0\xdd\xdb\xdb\xc0\xc0'
+		encoded = self.slip.encode(packet)
+		self.assertEqual(encoded.count(b'\xc0'), 1)
+		self.assertEqual(encoded[-1:], b'\xc0')
+		self.assertEqual(slip.SlipDecoder().feed(encoded), [packet])
+		self.assertEqual(self.slip.encode(b'\x01\xc0\xdb'), b'\x01\xdb\xdc\xdb\xdd\xc0')
+
+	def testSLIPEncodeMany(self):
+		packets = [b'\x01\x02', b'\xc0', b'\xdb\xdd', bytearray(b'\x03')]
+		encoded = self.slip.encodeMany(packets)
+		self.assertEqual(encoded, b''.join([self.slip.encode(packet) for packet in packets]))
+		self.assertEqual(slip.SlipDecoder().feed(encoded), [bytes(packet) for packet in packets])
+		self.assertEqual(self.slip.encodeMany([]), b'')
+
+	def testSlipDecoderFeed(self):
+		with open("testdata.bin", "rb") as testFile:
+			data = testFile.read()
+		initialPackets = self.getTestStream("testdata.bin")
+
+		# Feeding byte per byte must give the same frames as feeding everything at once
+		decoder = slip.SlipDecoder()
+		packets = []
+		for ii in range(len(data)):
+			packets += decoder.feed(data[ii:ii+1])
+		self.assertEqual(packets[:len(initialPackets)], initialPackets)
+		self.assertEqual(decoder.frameCount, len(packets))
+
+		decoder = slip.SlipDecoder()
+		self.assertEqual(decoder.feed(memoryview(data))[:len(initialPackets)], initialPackets)
+
+	def testSlipDecoderStatistics(self):
+		decoder = slip.SlipDecoder(length=4)
+		# Frame split in the middle of an escape sequence
+		self.assertEqual(decoder.feed(b'\xc0\x01\xdb'), [])
+		self.assertEqual(decoder.feed(b'\xdc\x02\xc0'), [b'\x01\xc0\x02'])
+		# Oversize frame is truncated
+		self.assertEqual(decoder.feed(b'\x01\x02\x03\x04\x05\xc0'), [b'\x01\x02\x03\x04'])
+		self.assertEqual(decoder.oversizeCount, 1)
+		# Bad escape sequence
+		self.assertEqual(decoder.feed(b'\x01\xdb\x01\xc0\x02\xc0'), [b'\x02'])
+		self.assertEqual(decoder.protocolErrorCount, 1)
+		self.assertEqual(decoder.resyncCount, 1)
+		# Runaway frame without SLIP_END does not grow the buffer forever
+		self.assertEqual(decoder.feed(b'\x07' * 100), [])
+		self.assertEqual(decoder.feed(b'\x07' * 100), [])
+		self.assertLessEqual(len(decoder.buffer), 8)
+		self.assertEqual(decoder.feed(b'\x07\xc0\x08\xc0'), [b'\x07' * 4, b'\x08'])
+		self.assertEqual(decoder.resyncCount, 2)
+		self.assertEqual(decoder.oversizeCount, 2)
+		self.assertEqual(decoder.frameCount, 5)
+
+	@unittest.skipUnless(os.name == "posix", "select on pipes requires POSIX")
+	def testSLIPReceiveDeadline(self):
+		nebSlip = slip.slip()
+		stream = PipeSerial()
+		# Nothing received, returns once the deadline expires
+		startTime = time.monotonic()
+		self.assertIsNone(nebSlip.receiveBufferedPacketFromStream(stream, timeout=0.05))
+		self.assertGreaterEqual(time.monotonic() - startTime, 0.05)
+
+		# Wakes up as soon as the frame is complete, rather than at the deadline
+		packet = b'\x01\xc0\x02'
+		timer = threading.Timer(0.05, stream.inject, [[packet]])
+		timer.start()
+		startTime = time.monotonic()
+		self.assertEqual(nebSlip.receiveBufferedPacketFromStream(stream, timeout=5), packet)
+		self.assertLess(time.monotonic() - startTime, 1)
+		timer.join()
+		stream.close()
+
+	@unittest.skipUnless(os.name == "posix", "select on pipes requires POSIX")
+	def testSLIPReceiveTimeoutWithoutFileno(self):
+		nebSlip = slip.slip()
+		stream = NoFilenoSerial()
+		startTime = time.monotonic()
+		self.assertIsNone(nebSlip.receiveBufferedPacketFromStream(stream, timeout=0.05))
+		self.assertGreaterEqual(time.monotonic() - startTime, 0.05)
+		self.assertLessEqual(stream.timeout, 0.05)
+
+		packet = b'\x01\xc0\x02'
+		stream.inject([packet])
+		self.assertEqual(nebSlip.receiveBufferedPacketFromStream(stream, timeout=5), packet)
+		stream.close()
 
 if __name__ == "__main__":
 	unittest.main() # run all tests
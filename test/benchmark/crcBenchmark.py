@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+###################################################################################
+#
+# Copyright (c)     2010-2016   Motsai
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###################################################################################
+
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../.."))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../../pyslip"))
+
+from pyslip import slip
+from neblinaUtilities import NebUtilities as nebUtilities
+
+batchSupported = True
+try:
+    import neblinaBatch
+except ImportError:
+    batchSupported = False
+
+###################################################################################
+
+repeatCount = 2000
+
+###################################################################################
+
+
+# Reference implementation, the bitwise CRC genNebCRC8 used to be
+def genNebCRC8Bitwise(packetBytes):
+    crc = 0
+    crc_backup = packetBytes[2]
+    packetBytes[2] = 255
+    ii = 0
+    while ii < len(packetBytes):
+       ee = (crc) ^ (packetBytes[ii])
+       ff = (ee) ^ (ee>>4) ^ (ee>>7)
+       crc = ((ff<<1)%256) ^ ((ff<<4) % 256)
+       ii += 1
+    packetBytes[2] = crc_backup
+    return crc
+
+
+def measure(function, packets):
+    byteCount = sum([len(packet) for packet in packets])
+    start = time.perf_counter()
+    for i in range(repeatCount):
+        for packet in packets:
+            function(packet)
+    elapsed = time.perf_counter() - start
+    return repeatCount * byteCount / elapsed / 1e6
+
+###################################################################################
+
+
+def main():
+    dataPath = os.path.join(os.path.dirname(__file__), "../data/")
+    packets = []
+    for filepath in sorted(glob.glob(os.path.join(dataPath, "*.bin"))):
+        with open(filepath, "rb") as captureFile:
+            packets += slip.slip().decodePackets(captureFile)
+    packets = [bytearray(packet) for packet in packets if len(packet) >= 3]
+
+    for packet in packets:
+        assert genNebCRC8Bitwise(packet) == nebUtilities.genNebCRC8(packet)
+
+    before = measure(genNebCRC8Bitwise, packets)
+    after = measure(nebUtilities.genNebCRC8, packets)
+    print("{0} packets from test/data".format(len(packets)))
+    print("bitwise CRC8      : {0:8.2f} MB/s".format(before))
+    print("table-driven CRC8 : {0:8.2f} MB/s ({1:.1f}x)".format(after, after / before))
+
+    if batchSupported:
+        # Same size as a full flash recording
+        recording = [bytes(packet) for packet in packets if len(packet) == neblinaBatch.PacketLength]
+        recording = b''.join(recording * (900000 // len(recording)))
+        frames, lengthMask = neblinaBatch.stackFrames(recording)
+        start = time.perf_counter()
+        neblinaBatch.validateCRCBatch(frames)
+        elapsed = time.perf_counter() - start
+        print("NumPy batch CRC8  : {0:8.2f} MB/s ({1} packets in {2:.3f}s)".format(len(recording) / elapsed / 1e6, len(frames), elapsed))
+
+###################################################################################
+
+
+if __name__ == "__main__":
+    main()
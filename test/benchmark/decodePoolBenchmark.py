@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+###################################################################################
+#
+# Copyright (c)     2010-2016   Motsai
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###################################################################################
+
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../.."))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../../pyslip"))
+
+from neblinaResponsePacket import NebResponsePacket
+from neblinaDecodePool import NebDecodePool
+import neblinasim as nebsim
+
+###################################################################################
+
+# Simulated devices, streaming IMU and MAG
+deviceCount = 16
+packetsPerDevice = 20000
+
+###################################################################################
+
+
+def buildTraffic():
+    """
+        Interleaved frames of every device, as read by the reader threads.
+    """
+    imuPackets = [packet.stringEncode() for packet in nebsim.createRandomIMUDataPacketList(50.0, packetsPerDevice // 2, 1.0)]
+    magPackets = [packet.stringEncode() for packet in nebsim.createRandomMAGDataPacketList(50.0, packetsPerDevice // 2, 1.0)]
+    devicePackets = [packet for pair in zip(imuPackets, magPackets) for packet in pair]
+    return [(deviceId, packet) for packet in devicePackets for deviceId in range(deviceCount)]
+
+
+def measureObjects(traffic):
+    start = time.perf_counter()
+    for deviceId, packet in traffic:
+        NebResponsePacket(packet)
+    return len(traffic) / (time.perf_counter() - start)
+
+
+def measurePool(traffic, workers):
+    sampleCounts = [0]
+
+    def handler(batch):
+        for samples in batch.streams.values():
+            sampleCounts[0] += len(samples)
+
+    pool = NebDecodePool(handler, workers)
+    # Start the worker processes before measuring
+    pool.executor.submit(int).result()
+    start = time.perf_counter()
+    for deviceId, packet in traffic:
+        pool.push(deviceId, packet)
+    pool.close()
+    elapsed = time.perf_counter() - start
+    assert sampleCounts[0] == len(traffic)
+    return len(traffic) / elapsed
+
+###################################################################################
+
+
+def main():
+    traffic = buildTraffic()
+    print("{0} packets from {1} simulated devices".format(len(traffic), deviceCount))
+
+    reference = measureObjects(traffic)
+    print("NebResponsePacket, 1 thread : {0:10.0f} packets/s".format(reference))
+
+    workers = 1
+    while workers <= os.cpu_count():
+        rate = measurePool(traffic, workers)
+        print("NebDecodePool, {0:2d} processes : {1:10.0f} packets/s ({2:.1f}x)".format(workers, rate, rate / reference))
+        workers *= 2
+
+###################################################################################
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+###################################################################################
+#
+# Copyright (c)     2010-2016   Motsai
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###################################################################################
+
+import glob
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../.."))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../../pyslip"))
+
+from pyslip import slip
+from neblinaResponsePacket import NebResponsePacket
+
+###################################################################################
+
+# Number of packets retained per stream type
+packetCount = 20000
+
+###################################################################################
+
+
+def loadValidFrames(filepath):
+    with open(filepath, "rb") as captureFile:
+        frames = slip.slip().decodePackets(captureFile)
+    validFrames = []
+    for frame in frames:
+        try:
+            NebResponsePacket(frame)
+            validFrames.append(bytes(frame))
+        except Exception:
+            pass
+    return validFrames
+
+
+def measure(frames, lazy):
+    frames = [frames[ii % len(frames)] for ii in range(packetCount)]
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    # Each packet gets its own copy of the frame, as it would coming from the link.
+    # The copy is only retained if the packet needs it (lazy decoding).
+    packets = [NebResponsePacket(bytes(bytearray(frame)), lazy=lazy) for frame in frames]
+    used = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return used / len(packets)
+
+###################################################################################
+
+
+def main():
+    dataPath = os.path.join(os.path.dirname(__file__), "../data/")
+    print("{0:<30} {1:>16} {2:>16}".format("Capture", "decoded (B/pkt)", "lazy (B/pkt)"))
+    for filepath in sorted(glob.glob(os.path.join(dataPath, "*Stream.bin"))):
+        frames = loadValidFrames(filepath)
+        if len(frames) == 0:
+            continue
+        print("{0:<30} {1:>16.0f} {2:>16.0f}".format(os.path.basename(filepath), measure(frames, False), measure(frames, True)))
+
+###################################################################################
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+###################################################################################
+#
+# Copyright (c)     2010-2016   Motsai
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###################################################################################
+
+import glob
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../.."))
+
+from pyslip import slip
+
+###################################################################################
+
+# Number of times each capture is decoded, the captures are only a few hundred bytes
+repeatCount = 500
+
+###################################################################################
+
+
+def decodeByteByByte(data):
+    nebSlip = slip.slip()
+    return nebSlip.decodePackets(io.BufferedReader(io.BytesIO(data)))
+
+
+def decodeBuffered(data):
+    nebSlip = slip.slip()
+    stream = io.BufferedReader(io.BytesIO(data))
+    packets = []
+    packet = nebSlip.receiveBufferedPacketFromStream(stream)
+    while packet != b'':
+        packets.append(packet)
+        packet = nebSlip.receiveBufferedPacketFromStream(stream)
+    return packets
+
+
+# Reference implementation, the per-byte encoder slip.encode used to be
+def encodeByteByByte(packet):
+    encoded = b''
+    packetBytes = [packet[ii:ii+1] for ii in range(len(packet))]
+    for byte in packetBytes:
+        if byte == slip.slip.SLIP_END:
+            encoded += slip.slip.SLIP_ESC + slip.slip.SLIP_ESC_END
+        elif byte == slip.slip.SLIP_ESC:
+            encoded += slip.slip.SLIP_ESC + slip.slip.SLIP_ESC_ESC
+        else:
+            encoded += byte
+    encoded += slip.slip.SLIP_END
+    return encoded
+
+
+def encodeAll(packets):
+    return b''.join([encodeByteByByte(packet) for packet in packets])
+
+
+def encodeVectorized(packets):
+    nebSlip = slip.slip()
+    return b''.join([nebSlip.encode(packet) for packet in packets])
+
+
+def encodeBatch(packets):
+    return slip.slip().encodeMany(packets)
+
+
+def measure(function, data, frameCount):
+    start = time.perf_counter()
+    for i in range(repeatCount):
+        function(data)
+    elapsed = time.perf_counter() - start
+    return repeatCount * frameCount / elapsed
+
+###################################################################################
+
+
+def main():
+    dataPath = os.path.join(os.path.dirname(__file__), "../data/")
+    print("{0:<30} {1:>15} {2:>15} {3:>8}".format("Capture", "before (fr/s)", "after (fr/s)", "speedup"))
+    for filepath in sorted(glob.glob(os.path.join(dataPath, "*Stream.bin"))):
+        with open(filepath, "rb") as captureFile:
+            data = captureFile.read()
+        packets = decodeBuffered(data)
+        assert decodeByteByByte(data) == packets
+        before = measure(decodeByteByByte, data, len(packets))
+        after = measure(decodeBuffered, data, len(packets))
+        print("{0:<30} {1:>15.0f} {2:>15.0f} {3:>7.1f}x".format(os.path.basename(filepath), before, after, after / before))
+
+    print("")
+    print("{0:<30} {1:>15} {2:>15} {3:>15}".format("Capture", "per-byte (fr/s)", "encode (fr/s)", "encodeMany (fr/s)"))
+    for filepath in sorted(glob.glob(os.path.join(dataPath, "*Stream.bin"))):
+        with open(filepath, "rb") as captureFile:
+            packets = decodeBuffered(captureFile.read())
+        assert encodeAll(packets) == encodeVectorized(packets) == encodeBatch(packets)
+        before = measure(encodeAll, packets, len(packets))
+        after = measure(encodeVectorized, packets, len(packets))
+        batch = measure(encodeBatch, packets, len(packets))
+        print("{0:<30} {1:>15.0f} {2:>15.0f} {3:>15.0f}".format(os.path.basename(filepath), before, after, batch))
+
+###################################################################################
+
+
+if __name__ == "__main__":
+    main()
@@ -26,8 +26,13 @@
 ###################################################################################
 
 import array
+import collections
 import csv
+import io
 import os
+import select
+import socket
+import time
 
 ###################################################################################
 
@@ -49,4 +54,199 @@ def csvVectorsToList(csvFileName):
         vectorInts = [int(packetByte) for packetByte in vector]
         vectorBytes = (array.array('B', vectorInts).tobytes())
         testVectorPacketList.append(vectorBytes)
-    return testVectorPacketList
\ No newline at end of file
+    return testVectorPacketList
+###################################################################################
+
+
+def buildPacketString(packetType, subSystem, command, dataString=bytes(16)):
+    from neblina import BitPosition
+    from neblinaUtilities import NebUtilities
+    ctrlByte = (packetType << BitPosition.PacketType) | subSystem
+    packetString = bytes(bytearray([ctrlByte, len(dataString), 0, command])) + dataString
+    crc = NebUtilities.genNebCRC8(packetString)
+    return packetString[:2] + bytes(bytearray([crc])) + packetString[3:]
+
+
+def buildAckPacketString(subSystem, command):
+    from neblina import PacketType
+    return buildPacketString(PacketType.Ack, subSystem, command)
+
+###################################################################################
+
+
+class PacketListDevice(object):
+    """
+        Stand-in for NeblinaDevice, receiving a predefined list of packets.
+    """
+
+    def __init__(self, packetStrings, readTimeout=0.01):
+        self.packetStrings = collections.deque(packetStrings)
+        self.sentPackets = []
+        self.readTimeout = readTimeout
+        self.connected = True
+
+    def connect(self):
+        self.connected = True
+
+    def disconnect(self):
+        self.connected = False
+
+    def isConnected(self):
+        return self.connected
+
+    def receivePacket(self, timeout=None):
+        try:
+            return self.packetStrings.popleft()
+        except IndexError:
+            # Behave like a serial read timing out
+            if timeout is not None:
+                time.sleep(min(self.readTimeout, timeout))
+            else:
+                time.sleep(self.readTimeout)
+            return None
+
+    def sendPacket(self, packet):
+        self.sentPackets.append(packet)
+
+    def sendPackets(self, packets):
+        self.sentPackets.extend(packets)
+
+###################################################################################
+
+
+class ResponderDevice(PacketListDevice):
+    """
+        Stand-in for NeblinaDevice, answering each command sent with the packets
+        returned by responder(packet), a list of packet strings.
+    """
+
+    def __init__(self, responder, readTimeout=0.01):
+        PacketListDevice.__init__(self, [], readTimeout)
+        self.responder = responder
+
+    def sendPacket(self, packet):
+        PacketListDevice.sendPacket(self, packet)
+        self.packetStrings.extend(self.responder(packet))
+
+    def sendPackets(self, packets):
+        for packet in packets:
+            self.sendPacket(packet)
+
+###################################################################################
+
+
+class PipeSerial(object):
+    """
+        Stand-in for serial.Serial, reading from a pipe. The writes are recorded.
+    """
+
+    def __init__(self):
+        self.readFd, self.writeFd = os.pipe()
+        self.pending = 0
+        self.timeout = None
+        self.is_open = True
+        self.written = b''
+
+    @property
+    def in_waiting(self):
+        return self.pending
+
+    def fileno(self):
+        return self.readFd
+
+    def reset_input_buffer(self):
+        pass
+
+    def read(self, size):
+        data = os.read(self.readFd, size)
+        self.pending -= len(data)
+        return data
+
+    def write(self, data):
+        self.written += data
+
+    def close(self):
+        self.is_open = False
+        os.close(self.readFd)
+        os.close(self.writeFd)
+
+    def injectBytes(self, data):
+        self.pending += len(data)
+        os.write(self.writeFd, data)
+
+    def inject(self, packetStrings):
+        from pyslip import slip
+        self.injectBytes(slip.slip().encodeMany(packetStrings))
+
+
+class NoFilenoSerial(PipeSerial):
+    """
+        PipeSerial without file descriptor, like the serial ports on Windows:
+        reads wait up to the timeout of the port.
+    """
+
+    def fileno(self):
+        raise io.UnsupportedOperation("fileno")
+
+    def read(self, size):
+        select.select([self.readFd], [], [], self.timeout)
+        if not self.pending:
+            return b''
+        return PipeSerial.read(self, size)
+
+###################################################################################
+
+
+class SocketDevice(object):
+    """
+        Stand-in for NeblinaDevice, receiving the packets written to a socket pair.
+        Every command is acknowledged, unless acknowledge is False.
+        Commands are answered with an error packet instead when refuse is True.
+    """
+
+    def __init__(self, acknowledge=True):
+        from pyslip import slip
+        self.hostSocket, self.deviceSocket = socket.socketpair()
+        self.hostSocket.setblocking(False)
+        self.slip = slip.slip()
+        self.decoder = slip.SlipDecoder()
+        self.acknowledge = acknowledge
+        self.refuse = False
+        self.sentPackets = []
+        self.connected = True
+
+    def connect(self):
+        self.connected = True
+
+    def disconnect(self):
+        self.connected = False
+        self.hostSocket.close()
+        self.deviceSocket.close()
+
+    def isConnected(self):
+        return self.connected
+
+    def fileno(self):
+        return self.hostSocket.fileno()
+
+    def receiveAvailablePackets(self):
+        try:
+            return self.decoder.feed(self.hostSocket.recv(4096))
+        except BlockingIOError:
+            return []
+
+    def sendPacket(self, packet):
+        self.sentPackets.append(packet)
+        # Subsystem in the control byte, command in the 4th byte
+        if self.refuse:
+            from neblina import PacketType
+            self.inject([buildPacketString(PacketType.ErrorLogResp, packet[0] & 0x1F, packet[3])])
+        elif self.acknowledge:
+            self.inject([buildAckPacketString(packet[0] & 0x1F, packet[3])])
+
+    def sendPackets(self, packets):
+        for packet in packets:
+            self.sendPacket(packet)
+
+    def inject(self, packetStrings):
+        self.deviceSocket.sendall(self.slip.encodeMany(packetStrings))
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# Neblina unit testing framework
+# (C) 2015 Motsai Research Inc.
+
+import asyncio
+import os
+import unittest
+
+from neblina import *
+from neblinaAsyncAPI import AsyncNeblinaAPI
+from neblinaCommandPacket import NebCommandPacket
+import neblinasim as nebsim
+import neblinaTestUtilities
+
+def getSuite():
+    return unittest.TestLoader().loadTestsFromTestCase(asyncUnitTest)
+
+# Unit testing class
+@unittest.skipUnless(os.name == "posix", "add_reader on pipes requires POSIX")
+class asyncUnitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.api = AsyncNeblinaAPI(self.loop)
+        self.serial = neblinaTestUtilities.PipeSerial()
+        self.api.core.attach(self.serial)
+
+    def tearDown(self):
+        self.api.close()
+        self.loop.close()
+
+    def testRequest(self):
+        temperature = Formatting.Struct.Data.Temperature.pack(0, 2512, bytes(10))
+        self.loop.call_soon(self.serial.inject, [
+            neblinaTestUtilities.buildAckPacketString(SubSystem.Power, Commands.Power.GetTemperature),
+            neblinaTestUtilities.buildPacketString(PacketType.RegularResponse, SubSystem.Power,
+                                                   Commands.Power.GetTemperature, temperature)])
+        self.assertAlmostEqual(self.loop.run_until_complete(self.api.getTemperature()), 25.12)
+        self.assertTrue(self.serial.written.endswith(b'\xc0'))
+
+        # No answer
+        with self.assertRaises(TimeoutError):
+            self.loop.run_until_complete(self.api.core.request(SubSystem.Power, Commands.Power.GetTemperature,
+                                                               timeout=0.05))
+        self.assertEqual(self.api.core.pendingRequests, [])
+
+    def testErrorResponse(self):
+        # Flash full, the error packet comes instead of the acknowledge
+        self.loop.call_soon(self.serial.inject, [
+            neblinaTestUtilities.buildPacketString(PacketType.ErrorLogResp, SubSystem.Storage,
+                                                   Commands.Storage.Record)])
+        packet = self.loop.run_until_complete(self.api.core.request(SubSystem.Storage, Commands.Storage.Record,
+                                                                    True, response=True, timeout=0.5))
+        self.assertTrue(packet.isPacketError())
+        self.assertEqual(self.api.core.pendingRequests, [])
+
+    def testSendFailure(self):
+        def write(data):
+            raise OSError("Unplugged")
+        self.serial.write = write
+        with self.assertRaises(OSError):
+            self.loop.run_until_complete(self.api.core.request(SubSystem.Power, Commands.Power.GetTemperature,
+                                                               response=True))
+        with self.assertRaises(OSError):
+            self.loop.run_until_complete(self.api.core.sendCommands(
+                [NebCommandPacket(SubSystem.Motion, Commands.Motion.IMU, True)]))
+        self.assertEqual(self.api.core.pendingRequests, [])
+
+    def testRunningLoop(self):
+        with self.assertRaises(RuntimeError):
+            AsyncNeblinaAPI()
+
+        async def create():
+            return AsyncNeblinaAPI()
+        self.assertIs(self.loop.run_until_complete(create()).core.loop, self.loop)
+
+    def testStream(self):
+        imuPackets = nebsim.createRandomIMUDataPacketList(50.0, 10, 1.0)
+        self.loop.call_soon(self.serial.inject, [
+            neblinaTestUtilities.buildAckPacketString(SubSystem.Motion, Commands.Motion.IMU)] +
+            [packet.stringEncode() for packet in imuPackets])
+
+        async def consume():
+            samples = []
+            async with self.api.stream(Commands.Motion.IMU) as stream:
+                async for sample in stream:
+                    samples.append(sample)
+                    if len(samples) == len(imuPackets):
+                        # Acknowledge of the stop command, sent when leaving the block
+                        self.serial.inject([neblinaTestUtilities.buildAckPacketString(SubSystem.Motion, Commands.Motion.IMU)])
+                        break
+            return samples
+
+        samples = self.loop.run_until_complete(consume())
+        for sample, packet in zip(samples, imuPackets):
+            self.assertEqual(sample.csvString(), packet.data.csvString())
+        self.assertEqual(self.api.core.streams[(SubSystem.Motion, Commands.Motion.IMU)], [])
+        self.assertEqual(self.api.core.droppedPacketCount, 0)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# Neblina unit testing framework
+# (C) 2015 Motsai Research Inc.
+
+import glob
+import random
+import struct
+import unittest
+
+from pyslip import slip
+
+from neblina import *
+import neblinaBatch
+from neblinaClock import NebTimestampUnwrapper, TimestampRange
+from neblinaDecodePool import NebDecodePool
+from neblinaResponsePacket import NebResponsePacket
+from neblinaUtilities import NebUtilities as nebUtilities
+import neblinasim as nebsim
+import neblinaTestUtilities
+
+def getSuite():
+    return unittest.TestLoader().loadTestsFromTestCase(batchUnitTest)
+
+# Unit testing class
+class batchUnitTest(unittest.TestCase):
+
+    def getTestPackets(self, pattern="*.bin"):
+        packets = []
+        for filepath in sorted(glob.glob(neblinaTestUtilities.getDataFilepath(pattern))):
+            with open(filepath, "rb") as testFile:
+                packets += slip.slip().decodePackets(testFile)
+        return packets
+
+    def testCRCBatch(self):
+        packets = self.getTestPackets()
+        frames, lengthMask = neblinaBatch.stackFrames(packets)
+        self.assertEqual(frames.shape, (len(packets), 20))
+        crcs = neblinaBatch.crc8Batch(frames)
+        for idx, packet in enumerate(packets):
+            if lengthMask[idx]:
+                self.assertEqual(crcs[idx], nebUtilities.genNebCRC8(packet))
+
+    def testValidatePackets(self):
+        packets = self.getTestPackets()
+        mask = neblinaBatch.validatePackets(packets)
+        for idx, packet in enumerate(packets):
+            expected = len(packet) == 20 and nebUtilities.genNebCRC8(packet) == packet[2]
+            self.assertEqual(mask[idx], expected)
+        # The test captures contain intentional CRC errors
+        self.assertGreater(mask.sum(), 0)
+        self.assertLess(mask.sum(), len(packets))
+
+        # Concatenated packets
+        validPackets = [packet for idx, packet in enumerate(packets) if mask[idx]]
+        self.assertTrue(neblinaBatch.validatePackets(b''.join(validPackets)).all())
+
+    def getDecodedPackets(self, packets, command):
+        decodedPackets = []
+        for packet in packets:
+            try:
+                decodedPacket = NebResponsePacket(packet)
+            except Exception:
+                continue
+            if decodedPacket.isPacketValid(PacketType.RegularResponse, SubSystem.Motion, command):
+                decodedPackets.append(decodedPacket)
+        return decodedPackets
+
+    def testDecodeBatch(self):
+        for command, layout in neblinaBatch.BatchFields.items():
+            self.assertEqual(neblinaBatch.BatchDtypes[command].itemsize, struct.calcsize(layout[0]))
+
+        # All the captures together, the other streams must be skipped
+        packets = self.getTestPackets()
+
+        samples = neblinaBatch.decodeBatch(packets, Commands.Motion.IMU)
+        decodedPackets = self.getDecodedPackets(packets, Commands.Motion.IMU)
+        self.assertEqual(len(samples), len(decodedPackets))
+        for sample, packet in zip(samples, decodedPackets):
+            self.assertEqual(sample['timestamp'], packet.data.timestamp)
+            self.assertEqual(tuple(sample['accel']), packet.data.accel)
+            self.assertEqual(tuple(sample['gyro']), packet.data.gyro)
+
+        samples = neblinaBatch.decodeBatch(packets, Commands.Motion.EulerAngle)
+        decodedPackets = self.getDecodedPackets(packets, Commands.Motion.EulerAngle)
+        self.assertEqual(len(samples), len(decodedPackets))
+        for sample, packet in zip(samples, decodedPackets):
+            self.assertEqual(sample['timestamp'], packet.data.timestamp)
+            self.assertEqual(sample['yaw'] / 10.0, packet.data.yaw)
+            self.assertEqual(sample['roll'] / 10.0, packet.data.roll)
+
+        samples = neblinaBatch.decodeBatch(packets, Commands.Motion.Pedometer)
+        decodedPackets = self.getDecodedPackets(packets, Commands.Motion.Pedometer)
+        self.assertEqual(len(samples), len(decodedPackets))
+        for sample, packet in zip(samples, decodedPackets):
+            self.assertEqual(sample['stepCount'], packet.data.stepCount)
+            self.assertEqual(sample['stepsPerMinute'], packet.data.stepsPerMinute)
+            self.assertEqual(sample['walkingDirection'] / 10.0, packet.data.walkingDirection)
+
+    def testUnwrapTimestamps(self):
+        # Three hours at 50 Hz
+        timestamps = [(sample * 20000) % TimestampRange for sample in range(3 * 3600 * 50)]
+        unwrapped = neblinaBatch.unwrapTimestamps(timestamps)
+        self.assertEqual(unwrapped[-1], (len(timestamps) - 1) * 20000)
+        self.assertTrue((unwrapped[1:] > unwrapped[:-1]).all())
+
+        # In batches, continuing the same stream
+        unwrapper = NebTimestampUnwrapper()
+        batches = [neblinaBatch.unwrapTimestamps(timestamps[start:start + 100000], unwrapper)
+                   for start in range(0, len(timestamps), 100000)]
+        self.assertEqual(sum([list(batch) for batch in batches], []), list(unwrapped))
+        self.assertEqual(unwrapper.unwrap(timestamps[-1] + 20000), len(timestamps) * 20000)
+
+    def testUnwrapTimestampsAsUnwrapper(self):
+        # Same result as one timestamp at a time, with late packets around the wraparounds
+        sequences = [[TimestampRange - 20, TimestampRange - 10, 0, TimestampRange - 5, 10,
+                      TimestampRange // 2, TimestampRange - 1, 5, TimestampRange - 3, 8],
+                     # Large forward jump before any wraparound
+                     [5, TimestampRange - 5, 10],
+                     [5, TimestampRange - 5, TimestampRange - 8, 10, TimestampRange - 2, 20],
+                     [0, TimestampRange // 2 + 1, 3, TimestampRange - 1, 2, TimestampRange // 2, 7]]
+        random.seed(7)
+        for start in (0, TimestampRange - 5000):
+            sequences.append([(start + sample * 100 + random.randint(-300, 0)) % TimestampRange
+                              for sample in range(100)])
+        for timestamps in sequences:
+            unwrapper = NebTimestampUnwrapper()
+            expected = [unwrapper.unwrap(timestamp) for timestamp in timestamps]
+            self.assertEqual(list(neblinaBatch.unwrapTimestamps(timestamps)), expected)
+            self.assertGreaterEqual(min(expected), 0)
+
+            # Continuing from the previous batches
+            unwrapper = NebTimestampUnwrapper()
+            batches = [neblinaBatch.unwrapTimestamps(timestamps[start:start + 3], unwrapper)
+                       for start in range(0, len(timestamps), 3)]
+            self.assertEqual(sum([list(batch) for batch in batches], []), expected)
+
+    def testDecodePool(self):
+        batches = []
+        pool = NebDecodePool(batches.append, workers=2, batchSize=8)
+        imuPackets = {}
+        for deviceId in ('left', 'right'):
+            imuPackets[deviceId] = nebsim.createRandomIMUDataPacketList(50.0, 20, 1.0)
+        for left, right in zip(imuPackets['left'], imuPackets['right']):
+            pool.push('left', left.stringEncode())
+            pool.push('right', right.stringEncode())
+        # Bad CRC
+        corrupted = bytearray(imuPackets['left'][0].stringEncode())
+        corrupted[2] ^= 0xFF
+        pool.push('left', bytes(corrupted))
+        pool.close()
+
+        self.assertEqual(pool.frameCount, 41)
+        self.assertEqual(pool.crcErrorCount, 1)
+        for deviceId, packets in imuPackets.items():
+            samples = [sample for batch in batches if batch.deviceId == deviceId
+                       for sample in batch.streams[Commands.Motion.IMU]]
+            self.assertEqual(len(samples), len(packets))
+            timestamps = [timestamp for batch in batches if batch.deviceId == deviceId
+                          for timestamp in batch.timestamps[Commands.Motion.IMU]]
+            self.assertEqual(timestamps, [packet.data.timestamp for packet in packets])
+            for sample, packet in zip(samples, packets):
+                self.assertEqual(sample['timestamp'], packet.data.timestamp)
+                self.assertEqual(tuple(sample['accel']), packet.data.accel)
+                self.assertEqual(tuple(sample['gyro']), packet.data.gyro)
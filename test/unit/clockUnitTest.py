@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# Neblina unit testing framework
+# (C) 2015 Motsai Research Inc.
+
+import random
+import unittest
+
+from neblina import *
+from neblinaClock import NebClockSync, NebTimestampUnwrapper, TimestampRange
+from neblinaCore import NeblinaCore
+from neblinaResponsePacket import NebResponsePacket
+import neblinasim as nebsim
+import neblinaTestUtilities
+
+def getSuite():
+    return unittest.TestLoader().loadTestsFromTestCase(clockUnitTest)
+
+# Unit testing class
+class clockUnitTest(unittest.TestCase):
+
+    def simulate(self, clockSync, duration, startTimestamp=0, offset=1000.0, drift=50e-6, period=0.02):
+        """
+            Feed a 50 Hz stream through a jittery link, with a whole second delayed every 10 seconds.
+        """
+        rng = random.Random(1234)
+        deviceTime = 0.0
+        while deviceTime < duration:
+            trueHostTime = offset + deviceTime * (1 + drift)
+            delay = 0.002 + rng.expovariate(1 / 0.005)
+            if int(deviceTime) % 10 == 5:
+                delay += 0.3
+            timestamp = (startTimestamp + int(deviceTime * 1e6)) % TimestampRange
+            clockSync.update(timestamp, trueHostTime + delay)
+            deviceTime += period
+        return lambda deviceTime: offset + deviceTime * (1 + drift)
+
+    def testDriftFit(self):
+        clockSync = NebClockSync()
+        self.assertIsNone(clockSync.toHostTime(0))
+        trueHostTime = self.simulate(clockSync, 120)
+        self.assertTrue(clockSync.isSynchronized())
+        self.assertAlmostEqual(clockSync.getDriftPPM(), 50, delta=5)
+        for deviceTime in (0.0, 60.0, 119.0):
+            # Within the smallest transport delay
+            self.assertAlmostEqual(clockSync.toHostTime(int(deviceTime * 1e6)), trueHostTime(deviceTime), delta=0.003)
+
+    def testWraparound(self):
+        clockSync = NebClockSync()
+        startTimestamp = TimestampRange - 30 * 1000000
+        trueHostTime = self.simulate(clockSync, 60, startTimestamp)
+        self.assertEqual(clockSync.unwrapper.wrapOffset, TimestampRange)
+        self.assertAlmostEqual(clockSync.getDriftPPM(), 50, delta=5)
+        # Timestamps from both sides of the wraparound
+        self.assertAlmostEqual(clockSync.toHostTime(startTimestamp), trueHostTime(0), delta=0.003)
+        self.assertAlmostEqual(clockSync.toHostTime(30 * 1000000), trueHostTime(60), delta=0.003)
+
+    def testTimestampUnwrapper(self):
+        unwrapper = NebTimestampUnwrapper()
+        self.assertEqual(unwrapper.expand(5), 5)
+        # Late packet from before the wraparound, then jitter backward
+        timestamps = [TimestampRange - 20, TimestampRange - 10, 0, 10, TimestampRange - 5, 3]
+        unwrapped = [unwrapper.unwrap(timestamp) for timestamp in timestamps]
+        self.assertEqual(unwrapped, [TimestampRange - 20, TimestampRange - 10, TimestampRange, TimestampRange + 10,
+                                     TimestampRange - 5, TimestampRange + 3])
+        self.assertEqual(unwrapper.expand(100), TimestampRange + 100)
+        self.assertEqual(unwrapper.expand(TimestampRange - 2), TimestampRange - 2)
+        # Second wraparound
+        for timestamp in range(0, TimestampRange + 1, TimestampRange // 4):
+            unwrapper.unwrap(timestamp % TimestampRange)
+        self.assertEqual(unwrapper.unwrap(7), 2 * TimestampRange + 7)
+        unwrapper.reset()
+        self.assertEqual(unwrapper.unwrap(7), 7)
+
+    def testReset(self):
+        clockSync = NebClockSync()
+        self.simulate(clockSync, 20)
+        clockSync.reset(500.0)
+        self.assertEqual(clockSync.toHostTime(0), 500.0)
+        self.assertIsNone(clockSync.unwrapper.lastTimestamp)
+
+    def testCoreHostTimestamp(self):
+        imuPackets = nebsim.createRandomIMUDataPacketList(50.0, 10, 1.0)
+        core = NeblinaCore()
+        core.device = neblinaTestUtilities.PacketListDevice([packet.stringEncode() for packet in imuPackets])
+        hostTimestamps = []
+        for imuPacket in imuPackets:
+            packet = core.readPacket()
+            self.assertIsNotNone(packet.hostTimestamp)
+            hostTimestamps.append(packet.hostTimestamp)
+        self.assertEqual(core.clockSync.sampleCount, len(imuPackets))
+        self.assertEqual(hostTimestamps[-1], core.clockSync.toHostTime(imuPackets[-1].data.timestamp))
+
+    def testCoreCorruptedFrame(self):
+        imuPackets = nebsim.createRandomIMUDataPacketList(50.0, 10, 1.0)
+        packetStrings = [packet.stringEncode() for packet in imuPackets]
+        # Most significant timestamp byte flipped, the CRC no longer matches
+        corrupted = packetStrings[5][:7] + bytes([packetStrings[5][7] ^ 0x80]) + packetStrings[5][8:]
+        core = NeblinaCore()
+        core.device = neblinaTestUtilities.PacketListDevice(packetStrings[:5] + [corrupted] + packetStrings[6:])
+        packets = [core.readPacket() for packetString in packetStrings]
+        self.assertIsNone(packets[5])
+        self.assertEqual(core.telemetry.crcErrorCount, 1)
+        self.assertEqual(core.clockSync.sampleCount, len(imuPackets) - 1)
+        # Frames handed to NebDecodePool are checked too
+        core.trackFrame(corrupted)
+        self.assertEqual(core.clockSync.sampleCount, len(imuPackets) - 1)
+        self.assertEqual(core.telemetry.frameCount, len(imuPackets) + 1)
+
+    def testCoreDeviceTimestamp(self):
+        timestamps = [TimestampRange - 40000, TimestampRange - 20000, 0, 20000]
+        packetStrings = [NebResponsePacket.createIMUResponsePacket(timestamp, (0, 0, 0), (0, 0, 0)).stringEncode()
+                         for timestamp in timestamps]
+        core = NeblinaCore()
+        core.device = neblinaTestUtilities.PacketListDevice(packetStrings + packetStrings[:1])
+        deviceTimestamps = [core.readPacket().deviceTimestamp for timestamp in timestamps]
+        self.assertEqual(deviceTimestamps, [TimestampRange - 40000, TimestampRange - 20000,
+                                            TimestampRange, TimestampRange + 20000])
+        # Timestamps restarting from 0
+        core.resetTimestamps()
+        self.assertEqual(core.readPacket().deviceTimestamp, TimestampRange - 40000)
+
+    def testCoreCorruptedTimestamp(self):
+        timestamps = [20000 * sample for sample in range(6)]
+        packetStrings = [NebResponsePacket.createIMUResponsePacket(timestamp, (0, 0, 0), (0, 0, 0)).stringEncode()
+                         for timestamp in timestamps]
+        # Timestamp close to the wraparound, with a CRC that no longer matches
+        corrupted = packetStrings[2][:7] + b'\xf0' + packetStrings[2][8:]
+        core = NeblinaCore()
+        core.device = neblinaTestUtilities.PacketListDevice(packetStrings[:2] + [corrupted] + packetStrings[3:])
+        packets = [core.readPacket() for timestamp in timestamps]
+        self.assertIsNone(packets[2])
+        # No fake wrap added to the next timestamps
+        self.assertEqual([packet.deviceTimestamp for packet in packets if packet],
+                         timestamps[:2] + timestamps[3:])
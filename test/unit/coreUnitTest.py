@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+# Neblina unit testing framework
+# (C) 2015 Motsai Research Inc.
+
+import glob
+import os
+import shutil
+import threading
+import time
+import unittest
+
+from neblina import *
+from neblinaAPI import NeblinaAPI
+from neblinaBuffer import NebPacketBuffer
+from neblinaCommandPacket import NebCommandPacket
+from neblinaCore import NeblinaCore
+from neblinaDelegate import NeblinaDelegate
+from neblinaUtilities import NebUtilities
+import neblinaUtilities
+import neblinasim as nebsim
+import neblinaTestUtilities
+
+def getSuite():
+    return unittest.TestLoader().loadTestsFromTestCase(coreUnitTest)
+
+class IMUDelegate(NeblinaDelegate):
+
+    def __init__(self):
+        NeblinaDelegate.__init__(self)
+        self.imuList = []
+
+    def handleIMU(self, data):
+        self.imuList.append(data)
+
+# Unit testing class
+class coreUnitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.imuPackets = nebsim.createRandomIMUDataPacketList(50.0, 20, 1.0)
+        packetStrings = [packet.stringEncode() for packet in self.imuPackets]
+        # Acknowledge in the middle of the stream
+        packetStrings.insert(10, neblinaTestUtilities.buildAckPacketString(SubSystem.Motion, Commands.Motion.Downsample))
+        self.core = NeblinaCore()
+        self.core.device = neblinaTestUtilities.PacketListDevice(packetStrings)
+
+    def tearDown(self):
+        self.core.close()
+
+    def waitUntil(self, condition, timeout=2):
+        endTime = time.time() + timeout
+        while not condition() and time.time() < endTime:
+            time.sleep(0.01)
+        return condition()
+
+    def testDelegateDispatch(self):
+        delegate = IMUDelegate()
+        self.core.setDelegate(delegate)
+        self.core.startReceiving()
+        self.assertTrue(self.core.isReceiving())
+
+        packet = self.core.waitForAck(SubSystem.Motion, Commands.Motion.Downsample)
+        self.assertTrue(packet.isPacketValid(PacketType.Ack, SubSystem.Motion, Commands.Motion.Downsample))
+        self.assertTrue(self.waitUntil(lambda: len(delegate.imuList) == len(self.imuPackets)))
+        for data, imuPacket in zip(delegate.imuList, self.imuPackets):
+            self.assertEqual(data.csvString(), imuPacket.data.csvString())
+
+        self.core.stopReceiving()
+        self.assertFalse(self.core.isReceiving())
+
+    def testReceiveWithoutHandler(self):
+        # Without a delegate, the streaming packets are kept for waitForPacket
+        self.core.startReceiving()
+        for imuPacket in self.imuPackets:
+            packet = self.core.waitForPacket(PacketType.RegularResponse, SubSystem.Motion, Commands.Motion.IMU)
+            self.assertEqual(packet.data.csvString(), imuPacket.data.csvString())
+
+    def testNoLossWhileWaiting(self):
+        # The IMU packets received before the acknowledge are kept for later
+        packet = self.core.waitForAck(SubSystem.Motion, Commands.Motion.Downsample)
+        self.assertTrue(packet.isPacketValid(PacketType.Ack, SubSystem.Motion, Commands.Motion.Downsample))
+        for imuPacket in self.imuPackets:
+            packet = self.core.waitForPacket(PacketType.RegularResponse, SubSystem.Motion, Commands.Motion.IMU)
+            self.assertEqual(packet.data.csvString(), imuPacket.data.csvString())
+        self.assertEqual(self.core.droppedPacketCount, 0)
+
+    def testDelegateWhileWaiting(self):
+        delegate = IMUDelegate()
+        self.core.setDelegate(delegate)
+        self.core.waitForAck(SubSystem.Motion, Commands.Motion.Downsample)
+        self.assertEqual(len(delegate.imuList), 10)
+
+    def testDroppedPackets(self):
+        self.core.packetQueueSize = 4
+        self.core.waitForAck(SubSystem.Motion, Commands.Motion.Downsample)
+        self.assertEqual(self.core.droppedPacketCount, 10 - 4)
+        # The most recent packets are kept
+        packet = self.core.waitForPacket(PacketType.RegularResponse, SubSystem.Motion, Commands.Motion.IMU)
+        self.assertEqual(packet.data.csvString(), self.imuPackets[10 - 4].data.csvString())
+
+    def testPipelinedCommands(self):
+        commands = [(SubSystem.Motion, Commands.Motion.Downsample),
+                    (SubSystem.Motion, Commands.Motion.AccRange),
+                    (SubSystem.Motion, Commands.Motion.IMU)]
+        # Acknowledges arriving out of order, around streaming packets
+        packetStrings = [neblinaTestUtilities.buildAckPacketString(*command) for command in reversed(commands)]
+        packetStrings.insert(1, self.imuPackets[0].stringEncode())
+        self.core.device = neblinaTestUtilities.PacketListDevice(packetStrings)
+
+        packets = [NebCommandPacket(SubSystem.Motion, Commands.Motion.Downsample, 40),
+                   NebCommandPacket(SubSystem.Motion, Commands.Motion.AccRange, 8),
+                   NebCommandPacket(SubSystem.Motion, Commands.Motion.IMU, True)]
+        self.core.sendCommands(packets)
+        self.assertEqual(self.core.device.sentPackets, [packet.stringEncode() for packet in packets])
+
+        ackPackets = self.core.waitForAcks(commands)
+        for ackPacket, (subSystem, command) in zip(ackPackets, commands):
+            self.assertTrue(ackPacket.isPacketValid(PacketType.Ack, subSystem, command))
+
+        # A missing acknowledge does not fail the others
+        self.core.device = neblinaTestUtilities.PacketListDevice(packetStrings[:1])
+        ackPackets = self.core.waitForAcks(commands, timeout=0.1)
+        self.assertIsNone(ackPackets[0])
+        self.assertIsNotNone(ackPackets[2])
+
+    def testTelemetry(self):
+        corrupted = bytearray(self.imuPackets[0].stringEncode())
+        corrupted[2] ^= 0xFF
+        # Corrupted into an unknown command
+        corruptedCommand = bytearray(self.imuPackets[0].stringEncode())
+        corruptedCommand[3] = 0xFE
+        unknown = neblinaTestUtilities.buildPacketString(PacketType.RegularResponse, SubSystem.Motion, 0xFE)
+        packetStrings = [bytes(corrupted), bytes(corruptedCommand), unknown, b'\x01\x02'] + \
+                        [packet.stringEncode() for packet in self.imuPackets]
+        self.core.device = neblinaTestUtilities.PacketListDevice(packetStrings)
+        self.core.sendCommand(SubSystem.Motion, Commands.Motion.Downsample, 40)
+        self.core.device.packetStrings.append(neblinaTestUtilities.buildAckPacketString(SubSystem.Motion, Commands.Motion.Downsample))
+        self.core.waitForAck(SubSystem.Motion, Commands.Motion.Downsample)
+
+        telemetry = self.core.getTelemetry()
+        self.assertEqual(telemetry.frameCount, len(packetStrings) + 1)
+        self.assertEqual(telemetry.byteCount, sum([len(packet) for packet in packetStrings]) + 20)
+        self.assertEqual(telemetry.crcErrorCount, 2)
+        self.assertEqual(telemetry.unknownPacketCount, 1)
+        self.assertEqual(telemetry.invalidPacketCount, 1)
+        imuKey = (PacketType.RegularResponse, SubSystem.Motion, Commands.Motion.IMU)
+        self.assertEqual(telemetry.packetCounts[imuKey], len(self.imuPackets))
+        self.assertEqual(telemetry.queueDepths[imuKey], len(self.imuPackets))
+        self.assertEqual(telemetry.ackCount, 1)
+        self.assertEqual(sum(telemetry.ackLatencyHistogram), 1)
+        self.assertGreaterEqual(telemetry.getAckLatencyMean(), 0)
+
+        packetRate, byteRate, streamRates = telemetry.rates()
+        self.assertGreater(packetRate, 0)
+        self.assertGreater(streamRates[imuKey], 0)
+        self.assertEqual(self.core.getTelemetry().rates(telemetry)[2][imuKey], 0)
+
+    def testPacketBuffer(self):
+        packetBuffer = NebPacketBuffer(3, Overflow.DropOldest)
+        for item in range(5):
+            self.assertTrue(packetBuffer.push(item))
+        self.assertEqual(list(packetBuffer.items), [2, 3, 4])
+        self.assertEqual(packetBuffer.overflowCount, 2)
+        self.assertEqual(packetBuffer.highWaterMark, 3)
+
+        packetBuffer = NebPacketBuffer(3, Overflow.DropNewest)
+        for item in range(5):
+            packetBuffer.push(item)
+        self.assertEqual(list(packetBuffer.items), [0, 1, 2])
+        self.assertEqual(packetBuffer.overflowCount, 2)
+        packetBuffer.pop()
+        packetBuffer.resize(1)
+        self.assertEqual(list(packetBuffer.items), [2])
+        self.assertEqual(packetBuffer.overflowCount, 3)
+
+    def testStreamBufferDropNewest(self):
+        imuBuffer = self.core.setPacketBuffer(SubSystem.Motion, Commands.Motion.IMU, 4, Overflow.DropNewest)
+        self.core.waitForAck(SubSystem.Motion, Commands.Motion.Downsample)
+        self.assertEqual(imuBuffer.overflowCount, 10 - 4)
+        self.assertEqual(imuBuffer.highWaterMark, 4)
+        packet = self.core.waitForPacket(PacketType.RegularResponse, SubSystem.Motion, Commands.Motion.IMU)
+        self.assertEqual(packet.data.csvString(), self.imuPackets[0].data.csvString())
+
+    def testStreamBufferBlock(self):
+        # The receive thread does not wait on a full buffer, the other packets still get through
+        imuBuffer = self.core.setPacketBuffer(SubSystem.Motion, Commands.Motion.IMU, 4, Overflow.Block)
+        self.core.packetBlockTimeout = 5
+        self.core.startReceiving()
+        startTime = time.monotonic()
+        self.core.waitForAck(SubSystem.Motion, Commands.Motion.Downsample)
+        self.assertLess(time.monotonic() - startTime, 1)
+        self.assertTrue(self.waitUntil(lambda: imuBuffer.overflowCount == len(self.imuPackets) - 4))
+        self.assertEqual(self.core.droppedPacketCount, len(self.imuPackets) - 4)
+        packet = self.core.waitForPacket(PacketType.RegularResponse, SubSystem.Motion, Commands.Motion.IMU)
+        self.assertEqual(packet.data.csvString(), self.imuPackets[0].data.csvString())
+
+    def testStreamBufferBlockDirectRead(self):
+        # A waiter reading the device itself waits for the consumer instead of dropping
+        imuBuffer = self.core.setPacketBuffer(SubSystem.Motion, Commands.Motion.IMU, 4, Overflow.Block)
+        keys = [(PacketType.RegularResponse, SubSystem.Motion, Commands.Motion.IMU)]
+        packets = []
+
+        def consume():
+            while len(packets) < 10:
+                with self.core.packetCondition:
+                    self.core.packetCondition.wait_for(lambda: len(imuBuffer) > 0, 2)
+                    packet = self.core.popPacket(keys)
+                if packet:
+                    packets.append(packet)
+                    time.sleep(0.001)
+
+        consumer = threading.Thread(target=consume)
+        consumer.start()
+        self.core.waitForAck(SubSystem.Motion, Commands.Motion.Downsample)
+        consumer.join()
+        self.assertEqual([packet.data.csvString() for packet in packets],
+                         [packet.data.csvString() for packet in self.imuPackets[:10]])
+        self.assertEqual(imuBuffer.overflowCount, 0)
+        self.assertEqual(imuBuffer.highWaterMark, 4)
+
+    def buildPlaybackPacketStrings(self):
+        playbackPacketString = neblinaTestUtilities.buildPacketString(PacketType.RegularResponse, SubSystem.Storage,
+            Commands.Storage.Playback, Formatting.Struct.CommandData.FlashSession.pack(0, 1, 3, bytes(9)))
+        return [neblinaTestUtilities.buildAckPacketString(SubSystem.Storage, Commands.Storage.Playback),
+                playbackPacketString] + \
+               [packet.stringEncode() for packet in self.imuPackets] + [playbackPacketString]
+
+    def testIterPacketsUntil(self):
+        self.core.device = neblinaTestUtilities.PacketListDevice(self.buildPlaybackPacketStrings()[2:])
+        progressCounts = []
+        packets = self.core.iterPacketsUntil(PacketType.RegularResponse, SubSystem.Storage, Commands.Storage.Playback,
+                                             progress=progressCounts.append, progressCount=8)
+        for packet, imuPacket in zip(packets, self.imuPackets):
+            self.assertEqual(packet.data.csvString(), imuPacket.data.csvString())
+        self.assertEqual(progressCounts, [8, 16, 20])
+        # Counted even though they were not dispatched
+        imuKey = (PacketType.RegularResponse, SubSystem.Motion, Commands.Motion.IMU)
+        self.assertEqual(self.core.telemetry.packetCounts[imuKey], len(self.imuPackets))
+
+        self.core.device = neblinaTestUtilities.PacketListDevice(self.buildPlaybackPacketStrings()[2:])
+        packetList = self.core.storePacketsUntil(PacketType.RegularResponse, SubSystem.Storage,
+                                                 Commands.Storage.Playback, progress=None)
+        self.assertEqual(len(packetList), len(self.imuPackets))
+
+    def testSessionPlaybackSink(self):
+        api = NeblinaAPI(Interface.UART)
+        api.core.device = neblinaTestUtilities.PacketListDevice(self.buildPlaybackPacketStrings())
+        packets = []
+        self.assertEqual(api.sessionPlayback(3, sink=packets.append, progress=None), len(self.imuPackets))
+        self.assertEqual([packet.data.csvString() for packet in packets],
+                         [packet.data.csvString() for packet in self.imuPackets])
+
+    def testSaveFlashPlaybackInterrupted(self):
+        sessionID = 'interrupted-{0}'.format(os.getpid())
+
+        def interruptedPlayback():
+            for packet in self.imuPackets[:5]:
+                yield packet
+            raise KeyboardInterrupt
+
+        recordPath = os.path.join(os.path.dirname(neblinaUtilities.__file__), "record")
+        try:
+            with self.assertRaises(KeyboardInterrupt):
+                NebUtilities.saveFlashPlayback(sessionID, interruptedPlayback())
+            indexPaths = glob.glob(os.path.join(recordPath, "*", "Session-{0}".format(sessionID), "0"))
+            self.assertEqual(len(indexPaths), 1)
+            # Closed with what was received, the empty files removed
+            self.assertEqual(sorted(os.listdir(indexPaths[0])), ['dump.txt', 'imu.csv'])
+            with open(os.path.join(indexPaths[0], 'imu.csv')) as imuFile:
+                self.assertEqual(len(imuFile.readlines()), 5)
+        finally:
+            for sessionPath in glob.glob(os.path.join(recordPath, "*", "Session-{0}".format(sessionID))):
+                shutil.rmtree(sessionPath)
+                try:
+                    os.removedirs(os.path.dirname(sessionPath))
+                except OSError:
+                    pass
+
+    @unittest.skipUnless(os.name == "posix", "select on pipes requires POSIX")
+    def testUARTPollTimeout(self):
+        from neblinaUART import NeblinaUART
+        uart = NeblinaUART("/dev/null")
+        uart.sc = neblinaTestUtilities.PipeSerial()
+        # Polling callers return when the device goes quiet
+        startTime = time.monotonic()
+        self.assertIsNone(uart.receivePacket())
+        self.assertLess(time.monotonic() - startTime, 1)
+
+        packetString = neblinaTestUtilities.buildAckPacketString(SubSystem.Motion, Commands.Motion.IMU)
+        uart.sc.inject([packetString])
+        self.assertEqual(uart.receivePacket(), packetString)
+        uart.sc.close()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# Neblina unit testing framework
+# (C) 2015 Motsai Research Inc.
+
+import time
+import unittest
+
+from neblina import *
+from neblinaFleet import NeblinaFleet, decodePoolSupported
+import neblinasim as nebsim
+import neblinaTestUtilities
+
+def getSuite():
+    return unittest.TestLoader().loadTestsFromTestCase(fleetUnitTest)
+
+class FleetIMUDelegate(object):
+
+    def __init__(self):
+        self.imuList = []
+
+    def handleIMU(self, deviceId, data):
+        self.imuList.append((deviceId, data))
+
+# Unit testing class
+class fleetUnitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fleet = NeblinaFleet()
+        self.devices = {}
+        for deviceId in ('left', 'right'):
+            self.devices[deviceId] = neblinaTestUtilities.SocketDevice()
+            self.fleet.addDevice(deviceId, self.devices[deviceId])
+
+    def tearDown(self):
+        self.fleet.close()
+
+    def waitUntil(self, condition, timeout=2):
+        endTime = time.time() + timeout
+        while not condition() and time.time() < endTime:
+            time.sleep(0.01)
+        return condition()
+
+    def testBroadcast(self):
+        self.assertTrue(self.fleet.isRunning())
+        self.assertEqual(self.fleet.deviceIds(), ['left', 'right'])
+        acks = self.fleet.setDownsample(40)
+        self.assertEqual(list(acks), ['left', 'right'])
+        for deviceId, ack in acks.items():
+            self.assertTrue(ack.isPacketValid(PacketType.Ack, SubSystem.Motion, Commands.Motion.Downsample))
+            self.assertEqual(len(self.devices[deviceId].sentPackets), 1)
+
+        # A device not answering does not hold back the others
+        silent = neblinaTestUtilities.SocketDevice(acknowledge=False)
+        self.fleet.addDevice('silent', silent)
+        startTime = time.time()
+        acks = self.fleet.broadcast(SubSystem.Motion, Commands.Motion.IMU, True, timeout=0.2)
+        self.assertLess(time.time() - startTime, 1.0)
+        self.assertIsNone(acks['silent'])
+        self.assertIsNotNone(acks['left'])
+        self.assertIsNotNone(acks['right'])
+
+        # The acknowledge arriving after the timeout is not taken for the next one
+        silent.inject([neblinaTestUtilities.buildAckPacketString(SubSystem.Motion, Commands.Motion.IMU)])
+        self.assertTrue(self.waitUntil(lambda: self.fleet['silent'].core.getPacketBuffer(
+            SubSystem.Motion, Commands.Motion.IMU, PacketType.Ack)))
+        acks = self.fleet.broadcast(SubSystem.Motion, Commands.Motion.IMU, True, timeout=0.2)
+        self.assertIsNone(acks['silent'])
+
+        # Individual commands still work through the fleet thread
+        self.fleet['right'].streamIMU(False)
+        self.assertEqual(len(self.devices['right'].sentPackets), 4)
+
+    def testSettingElision(self):
+        self.fleet.setDownsample(40)
+        self.fleet['left'].setDownsample(60)
+        acks = self.fleet.setDownsample(40)
+        self.assertEqual(list(acks), ['left'])
+        self.assertEqual(self.fleet.setDownsample(40), {})
+        self.assertEqual(len(self.devices['left'].sentPackets), 3)
+        self.assertEqual(len(self.devices['right'].sentPackets), 1)
+
+        self.fleet.streamIMU(True)
+        self.fleet.streamDisableAll()
+        self.assertEqual(self.fleet.streamIMU(False), {})
+        self.assertEqual(len(self.devices['right'].sentPackets), 3)
+
+    def testRefusedCommand(self):
+        self.devices['left'].refuse = True
+        acks = self.fleet.setDownsample(40)
+        self.assertTrue(acks['left'].isPacketError())
+        self.assertIsNone(self.fleet['left'].core.streamPeriod)
+        self.assertEqual(self.fleet['right'].core.streamPeriod, 40000)
+
+        self.fleet['left'].core.clockSync.update(20000, 1.0)
+        self.fleet['right'].core.clockSync.update(20000, 1.0)
+        self.fleet.resetTimestamp()
+        self.assertEqual(self.fleet['left'].core.clockSync.sampleCount, 1)
+        self.assertEqual(self.fleet['right'].core.clockSync.sampleCount, 0)
+
+    def testTaggedStreams(self):
+        delegate = FleetIMUDelegate()
+        self.fleet.setDelegate(delegate)
+        self.fleet.streamIMU(True)
+
+        imuPackets = {}
+        for deviceId, device in self.devices.items():
+            imuPackets[deviceId] = nebsim.createRandomIMUDataPacketList(50.0, 10, 1.0)
+            device.inject([packet.stringEncode() for packet in imuPackets[deviceId]])
+        self.assertTrue(self.waitUntil(lambda: len(delegate.imuList) == 20))
+
+        for deviceId in self.devices:
+            received = [data for imuDeviceId, data in delegate.imuList if imuDeviceId == deviceId]
+            self.assertEqual([data.csvString() for data in received],
+                             [packet.data.csvString() for packet in imuPackets[deviceId]])
+
+    def testRemoveDevice(self):
+        self.fleet.removeDevice('left')
+        self.assertEqual(self.fleet.deviceIds(), ['right'])
+        self.assertFalse(self.devices['left'].isConnected())
+        self.assertIsNotNone(self.fleet.streamDisableAll()['right'])
+
+    @unittest.skipUnless(decodePoolSupported, "NebDecodePool requires numpy")
+    def testDecodePool(self):
+        from neblinaDecodePool import NebDecodePool
+        self.fleet.close()
+        batches = []
+        pool = NebDecodePool(batches.append, workers=1, batchSize=4, latency=0.01)
+        self.fleet = NeblinaFleet(pool)
+        for deviceId in self.devices:
+            self.devices[deviceId] = neblinaTestUtilities.SocketDevice()
+            self.fleet.addDevice(deviceId, self.devices[deviceId])
+        # Acknowledges are not decoded by the pool
+        self.assertIsNotNone(self.fleet.streamIMU(True)['left'])
+
+        imuPackets = nebsim.createRandomIMUDataPacketList(50.0, 10, 1.0)
+        self.devices['left'].inject([packet.stringEncode() for packet in imuPackets])
+        self.assertTrue(self.waitUntil(lambda: pool.frameCount == len(imuPackets)))
+        telemetry = self.fleet['left'].core.getTelemetry()
+        self.assertEqual(telemetry.packetCounts[(PacketType.RegularResponse, SubSystem.Motion, Commands.Motion.IMU)],
+                         len(imuPackets))
+        pool.close()
+        samples = [sample for batch in batches for sample in batch.streams[Commands.Motion.IMU]]
+        self.assertEqual([batch.deviceId for batch in batches], ['left'] * len(batches))
+        self.assertEqual([sample['timestamp'] for sample in samples],
+                         [packet.data.timestamp for packet in imuPackets])
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# Neblina unit testing framework
+# (C) 2015 Motsai Research Inc.
+
+import unittest
+
+from neblina import *
+from neblinaAPI import NeblinaAPI
+from neblinaLoss import NebLossDetector, PeriodEstimationCount
+from neblinaResponsePacket import NebResponsePacket
+import neblinaTestUtilities
+
+def getSuite():
+    return unittest.TestLoader().loadTestsFromTestCase(lossUnitTest)
+
+# Unit testing class
+class lossUnitTest(unittest.TestCase):
+
+    def buildTimestamps(self, count, period, lost):
+        return [sample * period for sample in range(count) if sample not in lost]
+
+    def testConfiguredPeriod(self):
+        lossDetector = NebLossDetector(20000)
+        # One burst of 3, two single losses; jitter does not count
+        for timestamp in self.buildTimestamps(100, 20000, {10, 11, 12, 50, 70}):
+            lossDetector.update(timestamp + (timestamp // 20000) % 3 * 1000)
+        statistics = lossDetector.getStatistics()
+        self.assertEqual(statistics['sampleCount'], 95)
+        self.assertEqual(statistics['missingCount'], 5)
+        self.assertEqual(statistics['gapCount'], 3)
+        self.assertEqual(statistics['longestBurst'], 3)
+        self.assertEqual(statistics['burstHistogram'], {3: 1, 1: 2})
+        self.assertAlmostEqual(statistics['lossRatio'], 0.05)
+        self.assertAlmostEqual(statistics['longestGap'], 3 * 20000, delta=2000)
+
+        lossDetector.update(0)
+        self.assertEqual(lossDetector.outOfOrderCount, 1)
+
+    def testEstimatedPeriod(self):
+        lossDetector = NebLossDetector()
+        # A loss while the period is learnt is ignored, not the one after
+        for timestamp in self.buildTimestamps(100, 40000, {5, 60}):
+            lossDetector.update(timestamp)
+        self.assertEqual(lossDetector.getPeriod(), 40000)
+        self.assertEqual(lossDetector.missingCount, 1)
+        self.assertGreater(lossDetector.sampleCount, PeriodEstimationCount)
+
+    def testAPI(self):
+        timestamps = self.buildTimestamps(50, 40000, {20, 21})
+        packetStrings = [NebResponsePacket.createIMUResponsePacket(timestamp, (0, 0, 0), (0, 0, 0)).stringEncode()
+                         for timestamp in timestamps]
+        api = NeblinaAPI(Interface.UART)
+        api.core.device = neblinaTestUtilities.PacketListDevice([
+            neblinaTestUtilities.buildAckPacketString(SubSystem.Motion, Commands.Motion.Downsample)] + packetStrings)
+        api.setDownsample(40)
+        for timestamp in timestamps:
+            api.core.readPacket()
+
+        statistics = api.getSampleLoss(Commands.Motion.IMU)
+        self.assertEqual(statistics['period'], 40000)
+        self.assertEqual(statistics['missingCount'], 2)
+        self.assertEqual(api.getTelemetry().sampleLoss[Commands.Motion.IMU]['gapCount'], 1)
+        self.assertIsNone(api.getSampleLoss(Commands.Motion.MAG))
+
+    def testCorruptedFrame(self):
+        timestamps = self.buildTimestamps(50, 20000, {})
+        packetStrings = [NebResponsePacket.createIMUResponsePacket(timestamp, (0, 0, 0), (0, 0, 0)).stringEncode()
+                         for timestamp in timestamps]
+        # One timestamp byte flipped, the CRC no longer matches
+        corrupted = packetStrings[25][:7] + bytes([packetStrings[25][7] ^ 0x40]) + packetStrings[25][8:]
+        api = NeblinaAPI(Interface.UART)
+        api.core.setStreamPeriod(20000)
+        api.core.device = neblinaTestUtilities.PacketListDevice(packetStrings[:25] + [corrupted] + packetStrings[25:])
+        for packetString in packetStrings + [corrupted]:
+            api.core.readPacket()
+        self.assertEqual(api.getTelemetry().crcErrorCount, 1)
+
+        statistics = api.getSampleLoss(Commands.Motion.IMU)
+        self.assertEqual(statistics['sampleCount'], len(timestamps))
+        self.assertEqual(statistics['missingCount'], 0)
+        self.assertEqual(statistics['gapCount'], 0)
+        self.assertEqual(statistics['outOfOrderCount'], 0)
@@ -4,11 +4,27 @@
 
 import unittest
 
+from unit import asyncUnitTest
+from unit import batchUnitTest
+from unit import clockUnitTest
+from unit import coreUnitTest
+from unit import fleetUnitTest
+from unit import lossUnitTest
 from unit import packetsUnitTest
+from unit import retryUnitTest
+from unit import stateUnitTest
 
 def getSuite():  
     suite = unittest.TestSuite()
     suite.addTest( packetsUnitTest.getSuite() )    
+    suite.addTest( batchUnitTest.getSuite() )
+    suite.addTest( coreUnitTest.getSuite() )
+    suite.addTest( asyncUnitTest.getSuite() )
+    suite.addTest( fleetUnitTest.getSuite() )
+    suite.addTest( clockUnitTest.getSuite() )
+    suite.addTest( lossUnitTest.getSuite() )
+    suite.addTest( retryUnitTest.getSuite() )
+    suite.addTest( stateUnitTest.getSuite() )
     return suite
   
         
@@ -5,16 +5,31 @@
 import os
 import unittest
 import binascii
+import glob
+import random
 import struct
 from pyslip import slip
 
 from neblina import *
 from neblinaError import *
 from neblinaCommandPacket import NebCommandPacket
+from neblinaData import IMUData
 from neblinaResponsePacket import NebResponsePacket
+from neblinaUtilities import NebUtilities as nebUtilities
 import neblinasim as nebsim
 import neblinaTestUtilities
 
+# Reference (bitwise) implementation of the Neblina CRC
+def referenceCRC8(packetBytes, skipCRC):
+    crc = 0
+    for idx, byte in enumerate(packetBytes):
+        if skipCRC and idx == 2:
+            byte = 255
+        ee = (crc) ^ (byte)
+        ff = (ee) ^ (ee>>4) ^ (ee>>7)
+        crc = ((ff<<1)%256) ^ ((ff<<4) % 256)
+    return crc
+
 def getSuite():
     return unittest.TestLoader().loadTestsFromTestCase(packetsUnitTest)
 
@@ -99,6 +114,81 @@ class packetsUnitTest(unittest.TestCase):
         print('roll = {0}'.format( roll ))
         print('garbage = {0}'.format( garbage ))
 
+    def testCRC8Table(self):
+        packetList = []
+        for filepath in glob.glob(neblinaTestUtilities.getDataFilepath("*.bin")):
+            packetList += self.getTestStream(filepath)
+        random.seed(0)
+        packetList += [bytes(random.getrandbits(8) for ii in range(20)) for jj in range(1000)]
+        for packetString in packetList:
+            packetBytes = bytearray(packetString)
+            self.assertEqual(nebUtilities.crc8(packetBytes), referenceCRC8(packetBytes, False))
+            if len(packetBytes) >= 3:
+                self.assertEqual(nebUtilities.genNebCRC8(packetString), referenceCRC8(packetBytes, True))
+                self.assertEqual(nebUtilities.genNebCRC8(packetBytes), referenceCRC8(packetBytes, True))
+                # The packet is left untouched
+                self.assertEqual(packetBytes, bytearray(packetString))
+
+    def testFormattingStruct(self):
+        for layouts, structs in ((Formatting.Data, Formatting.Struct.Data),
+                                 (Formatting.CommandData, Formatting.Struct.CommandData)):
+            for name, layout in vars(layouts).items():
+                if name.startswith('__') or '{' in layout:
+                    continue
+                self.assertEqual(getattr(structs, name).format, layout)
+
+        # Decoding in place gives the same result as decoding the data slice
+        packets = nebsim.createRandomIMUDataPacketList(50.0, 10, 1.0)
+        for packet in packets:
+            packetString = packet.stringEncode()
+            imuData = IMUData.decode(packetString, 4)
+            self.assertEqual(imuData.csvString(), IMUData.decode(packetString[4:]).csvString())
+
+    def testLazyDecoding(self):
+        packets, errorList = self.buildPacketListFromSLIP("IMUStream.bin")
+        for packet in packets:
+            lazyPacket = NebResponsePacket(packet.stringEncode(), lazy=True)
+            self.assertIsNotNone(lazyPacket.dataConstructor)
+            self.assertTrue(lazyPacket.isPacketValid(PacketType.RegularResponse, SubSystem.Motion, Commands.Motion.IMU))
+            self.assertEqual(lazyPacket.data.csvString(), packet.data.csvString())
+            # Decoded once, then cached
+            self.assertIsNone(lazyPacket.dataConstructor)
+            self.assertIs(lazyPacket.data, lazyPacket.data)
+
+        # Unknown commands are still detected when the packet is built
+        commandBytes = b'\x01\x10\x00\x7f' + b'\x00'*16
+        packet = NebResponsePacket(commandBytes, checkCRC=False, lazy=True)
+        self.assertTrue(packet.isPacketUnknown())
+        self.assertIsNone(packet.data)
+        self.assertFalse(lazyPacket.isPacketUnknown())
+
+    def testDispatchTable(self):
+        from neblinaResponsePacket import ResponsePacketDispatch, ResponsePacketDataConstructors
+        self.assertEqual(len(ResponsePacketDispatch), 256*256)
+        for subSystem, constructors in ResponsePacketDataConstructors.items():
+            for command, dataConstructor in constructors.items():
+                for packetType in (PacketType.RegularResponse, PacketType.ErrorLogResp):
+                    ctrlByte = (packetType << BitPosition.PacketType) | subSystem
+                    self.assertEqual(ResponsePacketDispatch[(ctrlByte << 8) | command][0], dataConstructor)
+        # Command packets are never dispatched
+        self.assertIsNone(ResponsePacketDispatch[(PacketType.Command << (BitPosition.PacketType + 8)) | 0x0102])
+
+        # Unknown combinations take the sentinel path instead of raising
+        commandBytes = b'\x01\x10\x00\x7f' + b'\x00'*16
+        self.assertIsNone(NebResponsePacket.fromString(commandBytes, checkCRC=False))
+        ackBytes = b'\x21\x10\x00\x7f' + b'\x00'*16
+        self.assertIsNotNone(NebResponsePacket.fromString(ackBytes, checkCRC=False))
+        # A corrupted command byte is a CRC error, not an unknown command
+        corrupted = bytearray(nebsim.createRandomIMUDataPacketList(50.0, 1, 1.0)[0].stringEncode())
+        corrupted[3] = 0x7f
+        with self.assertRaises(CRCError):
+            NebResponsePacket.fromString(bytes(corrupted))
+
+        # Truncated packets are rejected before decoding, even lazily
+        packet = nebsim.createRandomIMUDataPacketList(50.0, 1, 1.0)[0]
+        with self.assertRaises(InvalidPacketFormatError):
+            NebResponsePacket.fromString(packet.stringEncode()[:12], checkCRC=False, lazy=True)
+
     def testDebugCommandDecoding(self):
         commandHeaderBytes = b'\x00\x10\xbc\x02'
         commandDataBytes= b'\xde\xea\xbe\xef\xa5\x01\x11\x01\x02\xba\xbe\x00\x01\x02\x03\x04'
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# Neblina unit testing framework
+# (C) 2015 Motsai Research Inc.
+
+import unittest
+
+from neblina import *
+from neblinaAPI import NeblinaAPI
+from neblinaError import *
+from neblinaRetry import RetryPolicy
+import neblinaTestUtilities
+
+def getSuite():
+    return unittest.TestLoader().loadTestsFromTestCase(retryUnitTest)
+
+# Unit testing class
+class retryUnitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.api = NeblinaAPI(Interface.UART)
+        self.api.core.defaultRetryPolicy = RetryPolicy(timeout=0.05, retries=2, backoff=0.01)
+        self.sendCount = 0
+        # Number of commands sent before the device starts answering
+        self.lostCount = 0
+        self.errorResponse = False
+
+    def tearDown(self):
+        self.api.close()
+
+    def respond(self, packet):
+        subSystem, command = packet[0] & 0x1F, packet[3]
+        self.sendCount += 1
+        if self.sendCount <= self.lostCount:
+            return []
+        if self.errorResponse:
+            return [neblinaTestUtilities.buildPacketString(PacketType.ErrorLogResp, subSystem, command)]
+        return [neblinaTestUtilities.buildAckPacketString(subSystem, command),
+                neblinaTestUtilities.buildPacketString(PacketType.RegularResponse, subSystem, command)]
+
+    def attach(self):
+        self.api.core.device = neblinaTestUtilities.ResponderDevice(self.respond)
+        return self.api.core.device
+
+    def testRetryOnLostAck(self):
+        device = self.attach()
+        self.lostCount = 2
+        self.api.setDownsample(40)
+        self.assertEqual(len(device.sentPackets), 3)
+
+        result = self.api.core.execute(SubSystem.Power, Commands.Power.GetTemperature, response=True)
+        self.assertTrue(result)
+        self.assertEqual(result.status, CommandStatus.Success)
+        self.assertEqual(result.attempts, 1)
+        self.assertEqual(result.packet.header.packetType, PacketType.RegularResponse)
+
+    def testTimeout(self):
+        device = self.attach()
+        self.lostCount = 100
+        result = self.api.core.execute(SubSystem.Motion, Commands.Motion.IMU, True)
+        self.assertFalse(result)
+        self.assertEqual(result.status, CommandStatus.Timeout)
+        self.assertEqual(result.attempts, 3)
+        self.assertFalse(result.ambiguous)
+        self.assertGreaterEqual(result.elapsed, 0.15)
+
+        self.api.setRetryPolicy(SubSystem.Debug, Commands.Debug.SetInterface, RetryPolicy(timeout=0.05, retries=1))
+        device.sentPackets.clear()
+        with self.assertRaises(CommandTimeoutError) as context:
+            self.api.setInterface(Interface.UART)
+        # Still a TimeoutError for the callers catching it, instead of exiting
+        self.assertIsInstance(context.exception, TimeoutError)
+        self.assertEqual(context.exception.result.attempts, 2)
+        self.assertEqual(len(device.sentPackets), 2)
+
+    def testNonIdempotent(self):
+        device = self.attach()
+        self.lostCount = 1
+        with self.assertRaises(CommandTimeoutError) as context:
+            self.api.sessionRecord(True)
+        self.assertTrue(context.exception.result.ambiguous)
+        self.assertEqual(len(device.sentPackets), 1)
+
+        result = self.api.core.execute(SubSystem.Storage, Commands.Storage.Record, True, response=True)
+        self.assertTrue(result)
+        self.assertEqual(result.attempts, 1)
+
+    def testErrorResponse(self):
+        device = self.attach()
+        self.errorResponse = True
+        # Flash full, not retried
+        self.assertEqual(self.api.sessionRecord(True), 0)
+        self.assertEqual(len(device.sentPackets), 1)
+        result = self.api.core.execute(SubSystem.EEPROM, Commands.EEPROM.Read, response=True, pageNumber=1)
+        self.assertEqual(result.status, CommandStatus.ErrorResponse)
+        self.assertEqual(result.attempts, 1)
+        with self.assertRaises(CommandError) as context:
+            self.api.eepromRead(1)
+        self.assertNotIsInstance(context.exception, TimeoutError)
+
+    def testStaleAck(self):
+        self.attach()
+        self.lostCount = 100
+        # Acknowledge of an earlier attempt, arrived too late
+        packet = self.api.core.decodePacket(neblinaTestUtilities.buildAckPacketString(SubSystem.Motion,
+                                                                                      Commands.Motion.IMU))
+        self.api.core.dispatchPacket(packet)
+        with self.assertRaises(TimeoutError):
+            self.api.streamIMU(True)
+
+    def testBackoff(self):
+        policy = RetryPolicy(backoff=0.1, backoffFactor=2.0, maxBackoff=0.3, jitter=0)
+        self.assertEqual([policy.getDelay(attempt) for attempt in range(1, 5)], [0.1, 0.2, 0.3, 0.3])
+        policy.jitter = 0.5
+        for attempt in range(100):
+            self.assertTrue(0.05 <= policy.getDelay(1) <= 0.1)
+            self.assertTrue(0.15 <= policy.getDelay(4) <= 0.3)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# Neblina unit testing framework
+# (C) 2015 Motsai Research Inc.
+
+import unittest
+
+from neblina import *
+from neblinaAPI import NeblinaAPI
+from neblinaCommandPacket import NebCommandPacket
+from neblinaRetry import RetryPolicy
+import neblinaTestUtilities
+
+def getSuite():
+    return unittest.TestLoader().loadTestsFromTestCase(stateUnitTest)
+
+# Unit testing class
+class stateUnitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.api = NeblinaAPI(Interface.UART)
+        self.api.core.defaultRetryPolicy = RetryPolicy(timeout=0.05, retries=0)
+        self.device = neblinaTestUtilities.ResponderDevice(self.respond)
+        self.api.core.device = self.device
+        self.silent = False
+        # IMU and quaternion streaming
+        self.motionStatus = bytes([0x18, 0x00, 0x00, 0x00])
+        self.ledState = bytes([1, 0, 0, 0, 0, 0, 0, 0])
+
+    def tearDown(self):
+        self.api.close()
+
+    def respond(self, packet):
+        subSystem, command = packet[0] & 0x1F, packet[3]
+        if self.silent:
+            return []
+        if subSystem == SubSystem.LED:
+            # Set or not, the LED values are sent back
+            response = [neblinaTestUtilities.buildPacketString(PacketType.RegularResponse, SubSystem.LED,
+                                                               Commands.LED.GetVal, self.ledState + bytes(8))]
+            if command == Commands.LED.SetVal:
+                response.insert(0, neblinaTestUtilities.buildAckPacketString(subSystem, command))
+            return response
+        response = [neblinaTestUtilities.buildAckPacketString(subSystem, command)]
+        if (subSystem, command) == (SubSystem.Debug, Commands.Debug.MotAndFlashRecState):
+            data = Formatting.Struct.Data.MotionAndFlash.pack(0, self.motionStatus, 0, bytes(7))
+            response.append(neblinaTestUtilities.buildPacketString(PacketType.RegularResponse, subSystem,
+                                                                   command, data))
+        return response
+
+    def getSentCommands(self):
+        return [packet[3] for packet in self.device.sentPackets]
+
+    def testElision(self):
+        for attempt in range(3):
+            self.api.setDownsample(40)
+            self.api.setAccelerometerRange(8)
+            self.api.streamIMU(True)
+            self.api.setLED(2, True)
+        self.assertEqual(self.getSentCommands(), [Commands.Motion.Downsample, Commands.Motion.AccRange,
+                                                  Commands.Motion.IMU, Commands.LED.SetVal])
+        self.assertEqual(self.api.state.elidedCount, 8)
+
+        # A different value is sent
+        self.api.setDownsample(60)
+        self.api.streamIMU(False)
+        self.api.setLED(2, False)
+        self.assertEqual(self.getSentCommands()[4:], [Commands.Motion.Downsample, Commands.Motion.IMU,
+                                                      Commands.LED.SetVal])
+        self.assertEqual(self.api.core.streamPeriod, 60000)
+
+    def testSeed(self):
+        motionStatus = self.api.getMotionStatus()
+        self.assertTrue(motionStatus.imuData)
+        self.assertEqual(self.api.getLED(0), 1)
+        self.device.sentPackets.clear()
+
+        self.api.streamIMU(True)
+        self.api.streamQuaternion(True)
+        self.api.streamMAG(False)
+        self.api.setLED(0, True)
+        self.assertEqual(self.getSentCommands(), [])
+        # Not reported by the device
+        self.api.streamRotationInfo(False)
+        self.api.streamEulerAngle(True)
+        self.assertEqual(self.getSentCommands(), [Commands.Motion.RotationInfo, Commands.Motion.EulerAngle])
+
+    def testInvalidation(self):
+        self.api.streamIMU(True)
+        self.api.streamDisableAll()
+        self.api.streamIMU(False)
+        self.assertEqual(self.getSentCommands(), [Commands.Motion.IMU, Commands.Motion.DisableStreaming])
+
+        self.api.invalidateState()
+        self.api.streamIMU(False)
+        self.assertEqual(self.getSentCommands()[-1], Commands.Motion.IMU)
+
+        # Sent without tracking
+        self.api.sendCommands([NebCommandPacket(SubSystem.Motion, Commands.Motion.DisableStreaming, True)])
+        self.api.streamIMU(False)
+        self.assertEqual(self.getSentCommands()[-1], Commands.Motion.IMU)
+
+        # A failure leaves the value unknown
+        self.silent = True
+        with self.assertRaises(TimeoutError):
+            self.api.streamIMU(True)
+        self.silent = False
+        self.api.streamIMU(False)
+        self.assertEqual(self.getSentCommands()[-2:], [Commands.Motion.IMU, Commands.Motion.IMU])
+
+        # Forgotten on reconnection
+        self.api.close()
+        self.api.core.device = self.device
+        self.api.streamIMU(False)
+        self.assertEqual(self.getSentCommands()[-1], Commands.Motion.IMU)